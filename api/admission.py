@@ -0,0 +1,197 @@
+"""
+Admission Control
+무거운 설치 파일 생성 라우트의 요청 수 제한과 부하 차단(load shedding)
+
+- 라우트별 토큰 버킷: 초당 rate 개, 최대 burst 개까지 몰려도 허용. 초과하면 429 + Retry-After.
+- 라우트별 동시 실행 수: concurrency 개를 넘으면 503 + Retry-After.
+- 우선순위: 프로세스 전체 처리 중 요청이 ADMISSION_SHED_INFLIGHT 개를 넘으면
+  제한 대상(무거운) 라우트부터 503으로 돌려보내고, /health, /worker/status 같은
+  가벼운 조회는 계속 받습니다. 롱폴링 요청(`?wait=` > 0, 예: /nodes/changes, /jobs/{id})은
+  대부분 할 일 없이 기다리므로 처리 중 요청 수에 넣지 않습니다.
+
+제한은 프로세스 단위입니다 (API_WORKERS 개 프로세스면 전체 허용량도 그 배수).
+ADMISSION_LIMITS 환경변수(JSON)로 라우트별 값을 바꾸거나 추가할 수 있습니다:
+    ADMISSION_LIMITS='{"/worker/generate-qr": {"rate": 10, "burst": 30, "concurrency": 8}}'
+"""
+from math import ceil
+from time import monotonic
+from urllib.parse import parse_qs
+import json
+import os
+import logging
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+ADMISSION_SHED_INFLIGHT = int(os.getenv('ADMISSION_SHED_INFLIGHT', '64'))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '2'))
+
+# 라우트 경로 템플릿 -> 제한 (rate: 초당 토큰, burst: 버킷 크기, concurrency: 동시 실행 수)
+DEFAULT_LIMITS = {
+    "/worker/generate-qr": {"rate": 5, "burst": 20, "concurrency": 4},
+    "/worker/process-installation/{token}": {"rate": 2, "burst": 10, "concurrency": 2},
+    "/api/download/{node_id}/setup-gui": {"rate": 10, "burst": 40, "concurrency": 4},
+    "/central/docker-runner/{node_id}": {"rate": 2, "burst": 5, "concurrency": 2},
+}
+
+ADMISSION_REJECTED = Counter(
+    "worker_api_admission_rejected_total",
+    "Requests rejected by admission control by route and reason (rate, concurrency, shed)",
+    ("route", "reason"),
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "worker_api_admission_in_flight",
+    "Requests currently executing on rate-limited routes",
+    ("route",),
+)
+
+
+def load_limits() -> dict:
+    """기본 제한 + ADMISSION_LIMITS 환경변수 덮어쓰기"""
+    limits = {path: dict(values) for path, values in DEFAULT_LIMITS.items()}
+    override = os.getenv('ADMISSION_LIMITS')
+    if override:
+        try:
+            for path, values in json.loads(override).items():
+                limits.setdefault(path, {}).update(values)
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Invalid ADMISSION_LIMITS, using defaults: {e}")
+    return limits
+
+
+def is_long_poll(scope) -> bool:
+    """?wait= 값이 0보다 큰 롱폴링 요청인지 확인"""
+    query = scope.get("query_string") or b""
+    if b"wait=" not in query:
+        return False
+    try:
+        return float(parse_qs(query.decode("latin-1")).get("wait", ["0"])[0]) > 0
+    except ValueError:
+        return False
+
+
+class TokenBucket:
+    """초당 rate 개씩 채워지는 토큰 버킷 (이벤트 루프 스레드에서만 사용)"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = monotonic()
+
+    def take(self) -> float:
+        """토큰을 하나 쓰고 0을 반환, 부족하면 다음 토큰까지 남은 초를 반환"""
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _RouteLimit:
+    __slots__ = ("path", "route", "bucket", "concurrency", "in_flight", "gauge")
+
+    def __init__(self, path: str, route, rate, burst, concurrency):
+        self.path = path
+        self.route = route
+        self.bucket = TokenBucket(rate, burst or rate) if rate else None
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.gauge = ADMISSION_IN_FLIGHT.labels(path)
+
+
+class AdmissionMiddleware:
+    """라우트별 토큰 버킷 / 동시 실행 제한 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+        self.limits = load_limits()
+        self._rules = None
+        self._in_flight = 0
+
+    def _build_rules(self, app) -> list:
+        """제한이 설정된 라우트만 골라 둠 (요청마다 전체 라우트를 훑지 않도록)"""
+        rules = []
+        for route in app.routes:
+            values = self.limits.get(getattr(route, "path", None))
+            if values:
+                rules.append(_RouteLimit(route.path, route, values.get("rate"),
+                                         values.get("burst"), values.get("concurrency")))
+        unknown = set(self.limits) - {rule.path for rule in rules}
+        if unknown:
+            logger.warning(f"Admission limits configured for unknown routes: {', '.join(sorted(unknown))}")
+        return rules
+
+    def _match(self, scope):
+        for rule in self._rules:
+            match, _ = rule.route.matches(scope)
+            if match == Match.FULL:
+                return rule
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        if self._rules is None:
+            self._rules = self._build_rules(scope["app"])
+
+        rule = self._match(scope) if self._rules else None
+        if rule is None:
+            if is_long_poll(scope):
+                # 롱폴링은 기다리는 동안 자원을 거의 쓰지 않으므로 처리 중 요청 수에서 제외
+                await self.app(scope, receive, send)
+                return
+            # 가벼운 라우트는 제한 없이 통과 (전체 처리 중 요청 수에만 반영)
+            self._in_flight += 1
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self._in_flight -= 1
+            return
+
+        reason, retry_after = self._admit(rule)
+        if reason is not None:
+            ADMISSION_REJECTED.labels(rule.path, reason).inc()
+            # 메트릭 미들웨어가 라우트 이름으로 기록하도록
+            scope["route"] = rule.route
+            status = 429 if reason == "rate" else 503
+            response = JSONResponse(
+                {"detail": "Too many requests, please retry later"},
+                status_code=status,
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        rule.in_flight += 1
+        rule.gauge.inc()
+        self._in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rule.in_flight -= 1
+            rule.gauge.dec()
+            self._in_flight -= 1
+
+    def _admit(self, rule: _RouteLimit):
+        """(거절 사유, Retry-After 초) - 허용이면 사유가 None"""
+        if self._in_flight >= ADMISSION_SHED_INFLIGHT:
+            return "shed", ADMISSION_RETRY_AFTER
+        if rule.concurrency and rule.in_flight >= rule.concurrency:
+            return "concurrency", ADMISSION_RETRY_AFTER
+        if rule.bucket is not None:
+            wait = rule.bucket.take()
+            if wait > 0:
+                return "rate", max(1, ceil(wait))
+        return None, 0
@@ -0,0 +1,233 @@
+"""
+Installer Artifact Store
+생성된 설치 파일(.bat 등)을 디스크에 보관하는 캐시
+
+- 파일 이름은 생성 입력값(노드 정보, 설정, 생성기 소스)의 다이제스트라서
+  입력이 바뀌면 자동으로 새 파일이 만들어지고, 같은 노드의 이전 파일은 정리됩니다.
+- 임시 파일에 쓴 뒤 os.replace로 교체하므로 여러 프로세스가 동시에 만들어도 안전합니다.
+- 다운로드는 파일을 그대로 내보내고, 없을 때는 생성하는 조각을 응답으로 보내면서 동시에 저장합니다.
+- 저장할 때 gzip 사본({파일}.gz)도 함께 써 두므로 gzip을 받는 클라이언트에도 압축 없이 파일을 그대로 보냅니다.
+"""
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+import logging
+
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = Path(os.getenv('ARTIFACT_DIR', '/tmp/worker-manager/artifacts'))
+
+# 파일 읽기 / 응답 조각 크기
+CHUNK_SIZE = 64 * 1024
+
+# 저장 시 gzip 사본 작성 (다운로드 응답의 INSTALLER_GZIP과 같은 설정)
+INSTALLER_GZIP = os.getenv('INSTALLER_GZIP', 'true').lower() in ('1', 'true', 'yes')
+GZIP_LEVEL = 6
+
+
+def source_digest(*directories: str) -> str:
+    """디렉터리 아래 .py 파일 내용의 다이제스트 (생성기 코드가 바뀌면 캐시 무효화)"""
+    digest = hashlib.sha256()
+    for directory in directories:
+        for path in sorted(Path(directory).rglob("*.py")):
+            digest.update(str(path.relative_to(directory)).encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def artifact_digest(kind: str, inputs: dict) -> str:
+    """생성 입력값 다이제스트"""
+    encoded = json.dumps({"kind": kind, **inputs}, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _owner_prefix(owner: str) -> str:
+    # 노드 ID에 파일 이름으로 쓸 수 없는 문자가 있을 수 있으므로 해시 사용
+    return hashlib.sha1(owner.encode("utf-8")).hexdigest()[:16]
+
+
+def artifact_path(kind: str, owner: str, digest: str, suffix: str = ".bat") -> Path:
+    return ARTIFACT_DIR / kind / f"{_owner_prefix(owner)}-{digest[:32]}{suffix}"
+
+
+def find_artifact(kind: str, owner: str, digest: str, suffix: str = ".bat") -> Optional[Path]:
+    """저장된 아티팩트 경로 (없으면 None)"""
+    path = artifact_path(kind, owner, digest, suffix)
+    found = path.is_file()
+    record_cache(f"{kind}_artifact", found)
+    return path if found else None
+
+
+def gzip_path(path: Path) -> Path:
+    """아티팩트의 gzip 사본 경로"""
+    return path.with_name(path.name + ".gz")
+
+
+class _ArtifactWriter:
+    """임시 파일에 원본과 gzip 사본을 함께 쓰고 commit()에서 둘 다 확정 (다른 프로세스에는 완성된 파일만 보임)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        self._file = os.fdopen(fd, "wb")
+        self._gz_file = self._gz_tmp_path = self._compressor = None
+        if INSTALLER_GZIP:
+            gz_fd, self._gz_tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            self._gz_file = os.fdopen(gz_fd, "wb")
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31: gzip 헤더 포함
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        if self._compressor is not None:
+            self._gz_file.write(self._compressor.compress(data))
+
+    def commit(self):
+        self._file.close()
+        if self._compressor is not None:
+            self._gz_file.write(self._compressor.flush())
+            self._gz_file.close()
+            # 원본이 보이면 사본도 있도록 사본을 먼저 교체
+            os.replace(self._gz_tmp_path, gzip_path(self.path))
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        for f, tmp_path in ((self._file, self._tmp_path), (self._gz_file, self._gz_tmp_path)):
+            if f is not None:
+                f.close()
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+def store_artifact(kind: str, owner: str, digest: str, content: Union[bytes, Iterable[bytes]],
+                   suffix: str = ".bat") -> Path:
+    """아티팩트(+gzip 사본) 저장 후 같은 owner의 이전 버전 삭제 (content는 bytes 또는 bytes 조각 이터러블)"""
+    path = artifact_path(kind, owner, digest, suffix)
+    writer = _ArtifactWriter(path)
+    try:
+        if isinstance(content, (bytes, bytearray)):
+            writer.write(content)
+        else:
+            for piece in content:
+                writer.write(piece)
+        writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+
+    _remove_old_versions(path, owner, suffix)
+    return path
+
+
+def _remove_old_versions(path: Path, owner: str, suffix: str):
+    keep = {path, gzip_path(path)}
+    for pattern in (f"{_owner_prefix(owner)}-*{suffix}", f"{_owner_prefix(owner)}-*{suffix}.gz"):
+        for old in path.parent.glob(pattern):
+            if old not in keep:
+                try:
+                    old.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+def encode_chunks(pieces: Iterable[str], size: int = CHUNK_SIZE, encoding: str = "utf-8") -> Iterator[bytes]:
+    """문자열 조각을 인코딩해 size 바이트 이상씩 묶어서 반환 (작은 조각이 많을 때 응답 쓰기 횟수 절감)"""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece.encode(encoding)
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def read_chunks(path: Path, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _tee_to_store(kind: str, owner: str, digest: str, chunks: Iterable[bytes], suffix: str) -> Iterator[bytes]:
+    """조각을 그대로 내보내면서 임시 파일에 쓰고, 끝까지 생성되면 아티팩트(+gzip 사본)로 확정"""
+    path = artifact_path(kind, owner, digest, suffix)
+    writer = _ArtifactWriter(path)
+    completed = False
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+        writer.commit()
+        completed = True
+        _remove_old_versions(path, owner, suffix)
+        logger.info(f"Rendered {kind} artifact for {owner} while streaming ({path.stat().st_size} bytes)")
+    finally:
+        # 클라이언트가 중간에 끊으면 미완성 파일은 버림
+        if not completed:
+            writer.discard()
+
+
+def open_artifact(kind: str, owner: str, inputs: dict, render: Callable[[], Iterable[bytes]],
+                  suffix: str = ".bat") -> Tuple[Optional[Path], Iterator[bytes]]:
+    """(저장된 파일 경로 또는 None, 내용 조각 이터레이터)
+
+    저장된 파일이 없으면 render() 조각을 바로 돌려주면서 동시에 저장하므로
+    첫 다운로드도 생성이 끝나기 전에 전송을 시작할 수 있습니다.
+    """
+    digest = artifact_digest(kind, inputs)
+    path = find_artifact(kind, owner, digest, suffix)
+    if path is not None:
+        return path, read_chunks(path)
+    return None, _tee_to_store(kind, owner, digest, render(), suffix)
+
+
+def get_or_render(kind: str, owner: str, inputs: dict, render: Callable[[], Union[bytes, Iterable[bytes]]],
+                  suffix: str = ".bat") -> Path:
+    """캐시된 아티팩트 경로를 반환하고, 없으면 render()로 만들어 저장 (조각 단위로 바로 파일에 씀)"""
+    digest = artifact_digest(kind, inputs)
+    path = find_artifact(kind, owner, digest, suffix)
+    if path is not None:
+        return path
+    path = store_artifact(kind, owner, digest, render(), suffix)
+    logger.info(f"Rendered {kind} artifact for {owner} ({path.stat().st_size} bytes)")
+    return path
+
+
+def invalidate_artifacts(owner: str, kind: Optional[str] = None) -> int:
+    """owner(노드)의 아티팩트 삭제, 삭제한 파일 수 반환"""
+    if not ARTIFACT_DIR.is_dir():
+        return 0
+    pattern = f"{kind or '*'}/{_owner_prefix(owner)}-*"
+    removed = 0
+    for path in ARTIFACT_DIR.glob(pattern):
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def invalidate_owners(owners: Iterable[str]) -> int:
+    """여러 owner의 아티팩트를 디렉터리 한 번 훑어서 삭제, 삭제한 파일 수 반환"""
+    prefixes = {_owner_prefix(owner) for owner in owners}
+    if not prefixes or not ARTIFACT_DIR.is_dir():
+        return 0
+    removed = 0
+    for path in ARTIFACT_DIR.glob("*/*"):
+        if path.name.split("-", 1)[0] in prefixes:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
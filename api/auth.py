@@ -0,0 +1,25 @@
+"""
+API Authentication
+Bearer 토큰 검증 (관리용 엔드포인트 공용)
+"""
+from fastapi import HTTPException, Depends, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import os
+
+security = HTTPBearer()
+API_TOKEN = os.getenv("API_TOKEN", "test-token-123")
+
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """API 토큰 검증"""
+    if credentials.credentials != API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication token"
+        )
+    return credentials.credentials
+
+
+def is_admin_authorization(authorization: str) -> bool:
+    """Authorization 헤더 값이 관리자 토큰인지 확인 (미들웨어용)"""
+    return authorization == f"Bearer {API_TOKEN}"
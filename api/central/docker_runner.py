@@ -5,13 +5,12 @@ Central Server Docker Runner Generator
 
 import json
 from models import Node
+from metrics import track_render
+from settings import get_setting
 import base64
 import os
 
-# Global configuration - 환경변수에서 한 번만 로드
-LOCAL_SERVER_IP = os.getenv('LOCAL_SERVER_IP', '192.168.0.88')
-CENTRAL_SERVER_URL = os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000')
-
+@track_render("central_docker_runner")
 def generate_central_docker_runner(node: Node) -> str:
     """중앙서버 전용 Docker Runner 생성 (GUI 프로그레스바 버전)"""
     
@@ -19,6 +18,9 @@ def generate_central_docker_runner(node: Node) -> str:
     
     # 중앙서버 IP (사용자 지정 또는 기본값)
     local_ip = metadata.get('server_ip', '192.168.0.88')
+
+    # Worker Manager IP (공유 설정)
+    worker_manager_ip = get_setting("LOCAL_SERVER_IP")
     
     # JWT 키 생성 (보안)
     jwt_key = metadata.get('jwt_secret_key', '2Yw1k3J8v3Qk1n2p5l6s7d3f9g0h1j2k3l4m5n6o7p3q9r0s1t2u3v4w5x6y7z3A9')
@@ -344,7 +346,7 @@ services:
       - NEXT_PUBLIC_WS_URL=ws://{local_ip}:{metadata.get('api_port', 8000)}
       - NEXT_PUBLIC_FL_API_URL=http://{local_ip}:{metadata.get('fl_port', 5002)}
       - NEXT_PUBLIC_FL_WS_URL=ws://{local_ip}:{metadata.get('fl_port', 5002)}
-      - NEXT_PUBLIC_WORKER_MANAGER_IP={metadata.get('worker_manager_ip', LOCAL_SERVER_IP)}
+      - NEXT_PUBLIC_WORKER_MANAGER_IP={metadata.get('worker_manager_ip', worker_manager_ip)}
     depends_on:
       - api
       - fl-api
@@ -412,7 +414,7 @@ DB_PORT={metadata.get('db_port', 5432)}
 MONGO_PORT={metadata.get('mongo_port', 27017)}
 
 # Worker Manager Configuration
-WORKER_MANAGER_IP={metadata.get('worker_manager_ip', LOCAL_SERVER_IP)}
+WORKER_MANAGER_IP={metadata.get('worker_manager_ip', worker_manager_ip)}
 
 # Security
 JWT_SECRET_KEY={jwt_key}
@@ -3,31 +3,30 @@ Central Server API Routes
 중앙서버 등록과 Docker 설정을 위한 엔드포인트
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from database import SessionLocal
-from models import Node, QRToken
+from models import Node
 from typing import Optional
+from utils import render_qr_data_uri, download_response
+from settings import public_server_host
+from artifacts import encode_chunks
+from webhooks import emit_event, NODE_INSTALLED
+from tokens import issue_install_token, load_install_token, record_issued_token, consume_install_token
+from node_cache import get_node
+from static_assets import split_inline_assets, compile_page, html_response, register_asset, PAGE_CACHE_CONTROL
 import json
 import logging
-import qrcode
-import io
-import base64
 from datetime import datetime, timedelta, timezone
-import secrets
+import codecs
 import os
-import tempfile
 from .docker_runner import generate_central_docker_runner
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Global configuration - 환경변수에서 한 번만 로드
-LOCAL_SERVER_IP = os.getenv('LOCAL_SERVER_IP', '192.168.0.88')
-CENTRAL_SERVER_URL = os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000')
-
 def get_db():
     db = SessionLocal()
     try:
@@ -45,10 +44,7 @@ class CentralEnvironmentRequest(BaseModel):
     db_port: Optional[int] = 5432
     mongo_port: Optional[int] = 27017
 
-@router.get("/central/setup")
-async def central_setup_page():
-    """중앙서버 설정 페이지"""
-    html_content = """
+CENTRAL_SETUP_TEMPLATE = """
     <!DOCTYPE html>
     <html lang="ko">
     <head>
@@ -410,7 +406,15 @@ async def central_setup_page():
     </body>
     </html>
     """
-    return HTMLResponse(content=html_content)
+
+# CSS/JS를 정적 파일로 분리하고 페이지는 미리 압축 (요청마다 다른 값이 없음)
+CENTRAL_SETUP_PAGE = compile_page(split_inline_assets("central-setup", CENTRAL_SETUP_TEMPLATE))
+
+
+@router.get("/central/setup")
+async def central_setup_page(request: Request):
+    """중앙서버 설정 페이지"""
+    return CENTRAL_SETUP_PAGE.response(request, {"Cache-Control": PAGE_CACHE_CONTROL})
 
 @router.post("/central/generate-qr")
 async def generate_central_qr(
@@ -419,19 +423,12 @@ async def generate_central_qr(
 ):
     """중앙서버용 QR 코드 및 설치 링크 생성"""
     try:
-        # 토큰 생성
-        token = secrets.token_urlsafe(32)
+        # 서명 토큰 생성 (설치 시 DB 조회 없이 확인)
         expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
-        
-        # 토큰 정보를 DB에 저장
-        qr_token = QRToken(
-            token=token,
-            node_id=request.node_id,
-            node_type="central",
-            expires_at=expires_at,
-            used=False
-        )
-        db.add(qr_token)
+        token = issue_install_token(request.node_id, "central", expires_at)
+
+        # 발급 감사 기록 (INSTALL_TOKEN_AUDIT)
+        record_issued_token(db, token, request.node_id, "central", expires_at)
         
         # 중앙서버 메타데이터 저장
         metadata = {
@@ -472,27 +469,18 @@ async def generate_central_qr(
         db.commit()
         
         # 설치 URL 생성
-        server_host = os.getenv('SERVERURL', 'localhost')
-        if server_host == 'auto' or not server_host or server_host == 'localhost':
-            server_host = LOCAL_SERVER_IP
+        server_host = public_server_host()
 
         server_url = f"http://{server_host}:5000"
         install_url = f"{server_url}/central/install/{token}"
         
         # QR 코드 생성
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(install_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode()
+        qr_code = render_qr_data_uri(install_url)
         
         return {
             "token": token,
             "install_url": install_url,
-            "qr_code": f"data:image/png;base64,{qr_base64}",
+            "qr_code": qr_code,
             "expires_at": expires_at.isoformat(),
             "node_id": node_id
         }
@@ -503,76 +491,34 @@ async def generate_central_qr(
 
 # VPN 관련 엔드포인트 제거 - 중앙서버는 VPN 불필요
 
+def _docker_runner_chunks(node: Node):
+    """Docker Runner 배치 파일 조각 (UTF-8 BOM + CRLF) - 스트리밍 응답에서 스레드풀로 실행됨"""
+    yield codecs.BOM_UTF8
+    content = generate_central_docker_runner(node).replace('\n', '\r\n')
+    yield from encode_chunks([content])
+
 @router.get("/central/docker-runner/{node_id}")
-async def get_docker_runner(node_id: str, db: Session = Depends(get_db)):
+async def get_docker_runner(node_id: str, request: Request, db: Session = Depends(get_db)):
     """Docker Runner 배치 파일 다운로드"""
-    node = db.query(Node).filter(Node.node_id == node_id).first()
+    node = get_node(node_id, db)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     
-    # Docker Runner 생성
-    docker_runner = generate_central_docker_runner(node)
-    
-    # Create a temporary file with proper encoding for Windows batch files
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.bat', delete=False, encoding='utf-8-sig', newline='\r\n') as tmp_file:
-        tmp_file.write(docker_runner)
-        temp_path = tmp_file.name
-    
-    try:
-        # Return file response
-        return FileResponse(
-            path=temp_path,
-            filename=f"docker-runner-{node_id}.bat",
-            media_type="application/x-bat",
-            headers={
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
-            }
-        )
-    finally:
-        # Schedule file deletion after response is sent
-        import asyncio
-        asyncio.create_task(delete_temp_file(temp_path))
-        
-async def delete_temp_file(path: str):
-    """Delete temporary file after a delay"""
-    import asyncio
-    await asyncio.sleep(5)  # Wait 5 seconds for download to complete
-    try:
-        os.unlink(path)
-    except:
-        pass
+    # BOM을 먼저 보내고 생성은 스트리밍 중에 진행 (임시 파일 없음)
+    return download_response(
+        request, _docker_runner_chunks(node), f"docker-runner-{node_id}.bat",
+        media_type="application/x-bat",
+        headers={
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+            "Pragma": "no-cache",
+            "Expires": "0"
+        }
+    )
 
-@router.get("/central/install/{token}")
-async def central_install_page(token: str, db: Session = Depends(get_db)):
-    """중앙서버 Docker 설치 페이지 (VPN 없음)"""
-    
-    # 토큰 확인
-    qr_token = db.query(QRToken).filter(QRToken.token == token).first()
-    if not qr_token:
-        return HTMLResponse(content="<h1>❌ 유효하지 않은 토큰입니다</h1>", status_code=404)
-    
-    if datetime.now(timezone.utc) > qr_token.expires_at:
-        return HTMLResponse(content="<h1>⏰ 만료된 토큰입니다</h1>", status_code=400)
-    
-    # 노드 정보 가져오기
-    node = db.query(Node).filter(Node.node_id == qr_token.node_id).first()
-    if not node:
-        return HTMLResponse(content="<h1>❌ 노드 정보를 찾을 수 없습니다</h1>", status_code=404)
-    
-    metadata = json.loads(node.docker_env_vars) if node.docker_env_vars else {}
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="ko">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>중앙서버 자동 설치</title>
-        <style>
-            * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-            body {{
+# 설치 페이지 스타일 (노드마다 같으므로 정적 파일로 분리, 스크립트는 노드 값이 들어가므로 인라인 유지)
+CENTRAL_INSTALL_CSS = """
+            * { margin: 0; padding: 0; box-sizing: border-box; }
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
                 background: linear-gradient(135deg, #f8fafc 0%, #e0f2fe 50%, #c7d2fe 100%);
                 min-height: 100vh;
@@ -580,8 +526,8 @@ async def central_install_page(token: str, db: Session = Depends(get_db)):
                 align-items: center;
                 justify-content: center;
                 padding: 20px;
-            }}
-            .container {{
+            }
+            .container {
                 background: white;
                 border-radius: 16px;
                 box-shadow: 0 20px 60px rgba(0,0,0,0.1);
@@ -589,8 +535,8 @@ async def central_install_page(token: str, db: Session = Depends(get_db)):
                 max-width: 700px;
                 width: 100%;
                 padding: 48px;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #1e293b;
                 margin-bottom: 24px;
                 font-size: 32px;
@@ -598,43 +544,43 @@ async def central_install_page(token: str, db: Session = Depends(get_db)):
                 -webkit-background-clip: text;
                 -webkit-text-fill-color: transparent;
                 background-clip: text;
-            }}
-            .info-card {{
+            }
+            .info-card {
                 background: #f8fafc;
                 border: 1px solid #e2e8f0;
                 border-radius: 12px;
                 padding: 24px;
                 margin-bottom: 24px;
-            }}
-            .info-row {{
+            }
+            .info-row {
                 display: flex;
                 justify-content: space-between;
                 margin-bottom: 10px;
                 padding-bottom: 10px;
                 border-bottom: 1px solid #e0e0e0;
-            }}
-            .info-row:last-child {{
+            }
+            .info-row:last-child {
                 border-bottom: none;
                 margin-bottom: 0;
                 padding-bottom: 0;
-            }}
-            .info-label {{
+            }
+            .info-label {
                 font-weight: 600;
                 color: #64748b;
-            }}
-            .info-value {{
+            }
+            .info-value {
                 color: #1e293b;
                 font-weight: 500;
-            }}
-            .status {{
+            }
+            .status {
                 text-align: center;
                 margin: 30px 0;
-            }}
-            .status-icon {{
+            }
+            .status-icon {
                 font-size: 48px;
                 margin-bottom: 10px;
-            }}
-            .btn {{
+            }
+            .btn {
                 width: 100%;
                 padding: 14px 24px;
                 background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
@@ -649,32 +595,32 @@ async def central_install_page(token: str, db: Session = Depends(get_db)):
                 display: inline-block;
                 text-align: center;
                 box-shadow: 0 4px 15px rgba(99, 102, 241, 0.3);
-            }}
-            .btn:hover {{
+            }
+            .btn:hover {
                 transform: translateY(-3px);
                 box-shadow: 0 8px 25px rgba(99, 102, 241, 0.4);
-            }}
-            .btn-success {{
+            }
+            .btn-success {
                 background: linear-gradient(135deg, #10b981 0%, #059669 100%);
                 box-shadow: 0 4px 15px rgba(16, 185, 129, 0.3);
-            }}
-            .steps {{
+            }
+            .steps {
                 margin: 30px 0;
-            }}
-            .step {{
+            }
+            .step {
                 display: flex;
                 align-items: center;
                 margin-bottom: 15px;
                 opacity: 0.5;
                 transition: opacity 0.3s;
-            }}
-            .step.active {{
+            }
+            .step.active {
                 opacity: 1;
-            }}
-            .step.completed {{
+            }
+            .step.completed {
                 opacity: 1;
-            }}
-            .step-icon {{
+            }
+            .step-icon {
                 width: 30px;
                 height: 30px;
                 border-radius: 50%;
@@ -684,22 +630,22 @@ async def central_install_page(token: str, db: Session = Depends(get_db)):
                 justify-content: center;
                 margin-right: 15px;
                 font-size: 14px;
-            }}
-            .step.active .step-icon {{
+            }
+            .step.active .step-icon {
                 background: #6366f1;
                 color: white;
                 animation: pulse 1.5s infinite;
-            }}
-            .step.completed .step-icon {{
+            }
+            .step.completed .step-icon {
                 background: #10b981;
                 color: white;
-            }}
-            @keyframes pulse {{
-                0% {{ transform: scale(1); }}
-                50% {{ transform: scale(1.1); }}
-                100% {{ transform: scale(1); }}
-            }}
-            .code-block {{
+            }
+            @keyframes pulse {
+                0% { transform: scale(1); }
+                50% { transform: scale(1.1); }
+                100% { transform: scale(1); }
+            }
+            .code-block {
                 background: #2d2d2d;
                 color: #f8f8f2;
                 padding: 20px;
@@ -710,8 +656,37 @@ async def central_install_page(token: str, db: Session = Depends(get_db)):
                 overflow-x: auto;
                 max-height: 400px;
                 overflow-y: auto;
-            }}
-        </style>
+            }
+"""
+CENTRAL_INSTALL_CSS_URL = register_asset("central-install", CENTRAL_INSTALL_CSS, "css")
+
+@router.get("/central/install/{token}")
+async def central_install_page(token: str, request: Request, db: Session = Depends(get_db)):
+    """중앙서버 Docker 설치 페이지 (VPN 없음)"""
+    
+    # 토큰 확인 (서명 검증, DB 조회 없음)
+    qr_token = load_install_token(db, token, "central")
+    if not qr_token:
+        return HTMLResponse(content="<h1>❌ 유효하지 않은 토큰입니다</h1>", status_code=404)
+    
+    if datetime.now(timezone.utc) > qr_token.expires_at:
+        return HTMLResponse(content="<h1>⏰ 만료된 토큰입니다</h1>", status_code=400)
+    
+    # 노드 정보 가져오기
+    node = get_node(qr_token.node_id, db)
+    if not node:
+        return HTMLResponse(content="<h1>❌ 노드 정보를 찾을 수 없습니다</h1>", status_code=404)
+    
+    metadata = json.loads(node.docker_env_vars) if node.docker_env_vars else {}
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="ko">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>중앙서버 자동 설치</title>
+        <link rel="stylesheet" href="{CENTRAL_INSTALL_CSS_URL}">
     </head>
     <body>
         <div class="container">
@@ -899,7 +874,7 @@ async def central_install_page(token: str, db: Session = Depends(get_db)):
     </html>
     """
     
-    return HTMLResponse(content=html_content)
+    return html_response(request, html_content)
 
 @router.post("/central/process-installation/{token}")
 async def process_central_installation(
@@ -908,8 +883,8 @@ async def process_central_installation(
 ):
     """중앙서버 Docker 설정 처리 (VPN 없음)"""
     
-    # 토큰 확인
-    qr_token = db.query(QRToken).filter(QRToken.token == token).first()
+    # 토큰 확인 (서명 검증, DB 조회 없음)
+    qr_token = load_install_token(db, token, "central")
     if not qr_token:
         raise HTTPException(status_code=404, detail="Invalid token")
     
@@ -920,8 +895,15 @@ async def process_central_installation(
     node = db.query(Node).filter(Node.node_id == qr_token.node_id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
-    
+
     try:
+        # 이미 등록된 경우 - 이 토큰으로 처음 처리할 때만 사용 기록과 설치 이벤트, 재시도/새로고침이면 결과만 반환
+        if node.status != "pending":
+            if consume_install_token(db, qr_token):
+                emit_event(db, NODE_INSTALLED, node.node_id, {"node_type": "central", "lan_ip": node.vpn_ip})
+                db.commit()
+            return _installation_result(node)
+
         # 노드 정보 업데이트 (VPN 없이)
         node.status = "registered"
         node.updated_at = datetime.now(timezone.utc)
@@ -930,29 +912,37 @@ async def process_central_installation(
         metadata = json.loads(node.docker_env_vars) if node.docker_env_vars else {}
         # server_ip가 이미 저장되어 있으므로 그대로 사용
         node.docker_env_vars = json.dumps(metadata)
+
+        # 설치 완료로 바뀌는 트랜잭션에서만 토큰 사용 기록
+        if not consume_install_token(db, qr_token):
+            # 같은 토큰의 다른 요청이 먼저 설치를 끝냄
+            db.rollback()
+            db.refresh(node)
+            return _installation_result(node)
         
-        # 토큰을 사용됨으로 표시
-        qr_token.used = True
+        emit_event(db, NODE_INSTALLED, node.node_id, {"node_type": "central", "lan_ip": node.vpn_ip})
         db.commit()
         
-        # Docker 실행 스크립트만 생성
-        docker_runner = generate_central_docker_runner(node)
-        
-        return {
-            "status": "success",
-            "node_id": node.node_id,
-            "docker_runner": docker_runner,
-            "install_script": docker_runner  # Docker runner를 설치 스크립트로 사용
-        }
+        return _installation_result(node)
         
     except Exception as e:
         logger.error(f"Installation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _installation_result(node: Node) -> dict:
+    """process-installation 응답 (Docker 실행 스크립트만 생성)"""
+    docker_runner = generate_central_docker_runner(node)
+    return {
+        "status": "success",
+        "node_id": node.node_id,
+        "docker_runner": docker_runner,
+        "install_script": docker_runner  # Docker runner를 설치 스크립트로 사용
+    }
+
 @router.get("/central/status/{node_id}")
 async def get_central_status(node_id: str, db: Session = Depends(get_db)):
     """중앙서버 상태 조회"""
-    node = db.query(Node).filter(Node.node_id == node_id).first()
+    node = get_node(node_id, db)
     
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
@@ -6,23 +6,61 @@ import json
 import os
 import logging
 import base64
+from typing import Iterable, Iterator
 import sys
 import os
 # 상위 디렉토리를 Python 경로에 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models import Node
+from metrics import track_render
+from settings import get_setting
 # VPN 기능 제거됨 - LAN IP 사용
 from gui.modules import get_docker_runner_orchestrator
 
 logger = logging.getLogger(__name__)
 
-# Global configuration - 환경변수에서 한 번만 로드
-LOCAL_SERVER_IP = os.getenv('LOCAL_SERVER_IP', '192.168.0.88')
-CENTRAL_SERVER_URL = os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000')
+# 배치 파일 한 줄에 넣는 Base64 길이 (3750 bytes -> 5000 chars)
+BASE64_LINE_CHARS = 5000
+_BASE64_LINE_BYTES = BASE64_LINE_CHARS // 4 * 3
+# UTF-16 인코딩을 나눠 하는 문자 단위 (전체 바이트 사본을 만들지 않도록)
+_ENCODE_SLICE_CHARS = 16384
+
 
 def generate_worker_setup_gui_modular(node: Node) -> str:
     """워커 노드 통합 설치 GUI 생성 - 모듈화된 버전"""
+    return ''.join(iter_worker_setup_gui_modular(node))
+
+
+@track_render("setup_gui")
+def iter_worker_setup_gui_modular(node: Node) -> Iterator[str]:
+    """설치 GUI 배치 파일을 조각 단위로 생성 (이어 붙이면 generate_worker_setup_gui_modular 결과와 동일)
+
+    PowerShell 스크립트의 UTF-16/Base64 인코딩과 배치 파일 조립을 조금씩 진행하므로
+    응답이나 파일에 바로 쓰면 전체 결과를 메모리에 여러 벌 만들지 않습니다.
+    """
+    lines = _setup_gui_lines(node)
+    yield next(lines)
+    for line in lines:
+        yield '\r\n' + line
+
+
+def _iter_base64_chunks(texts: Iterable[str]) -> Iterator[str]:
+    """texts를 이어 붙인 문자열의 UTF-16LE Base64 인코딩을 BASE64_LINE_CHARS 길이 조각으로 생성"""
+    buffer = bytearray()
+    for text in texts:
+        for start in range(0, len(text), _ENCODE_SLICE_CHARS):
+            buffer += text[start:start + _ENCODE_SLICE_CHARS].encode('utf-16le')
+            whole = len(buffer) - len(buffer) % _BASE64_LINE_BYTES
+            for offset in range(0, whole, _BASE64_LINE_BYTES):
+                yield base64.b64encode(buffer[offset:offset + _BASE64_LINE_BYTES]).decode('ascii')
+            del buffer[:whole]
+    if buffer:
+        yield base64.b64encode(buffer).decode('ascii')
+
+
+def _setup_gui_lines(node: Node) -> Iterator[str]:
+    """PowerShell GUI 스크립트를 만든 뒤 배치 파일을 줄 단위로 생성"""
 
     # JSON 파싱 시 에러 처리 추가
     metadata = {}
@@ -36,7 +74,7 @@ def generate_worker_setup_gui_modular(node: Node) -> str:
             logger.warning(f"Failed to parse docker_env_vars for node {node.node_id}: {e}. Using empty metadata.")
             metadata = {}
 
-    server_ip = LOCAL_SERVER_IP
+    server_ip = get_setting("LOCAL_SERVER_IP")
 
     # 네트워크 설정 함수 (LAN IP 사용)
     vpn_install_function = """
@@ -53,7 +91,7 @@ function Install-VPN {
     else:
         central_url = (metadata.get('central_server_url') or 
                       node.central_server_url or 
-                      os.getenv("CENTRAL_SERVER_URL", "http://192.168.0.88:8000"))
+                      get_setting("CENTRAL_SERVER_URL"))
         import re
         central_ip_match = re.search(r'://([^:]+)', central_url)
         central_ip = central_ip_match.group(1) if central_ip_match else "192.168.0.88"
@@ -67,8 +105,8 @@ function Install-VPN {
         metadata=metadata
     )
     
-    # GUI PowerShell 스크립트
-    gui_script = """
+    # GUI PowerShell 스크립트 (Docker Runner 함수 앞/뒤를 따로 만들어 전체를 한 문자열로 합치지 않음)
+    gui_script_head = """
 # 디버깅을 위한 초기 메시지
 Write-Host "====================================" -ForegroundColor Cyan
 Write-Host "Starting Worker Setup GUI v2.0 (Modular)" -ForegroundColor Green
@@ -528,7 +566,13 @@ function Update-Progress {{
 {vpn_install_function}
 
 # 모듈화된 Docker Runner 함수 로드
-{docker_runner_function}
+""".format(
+        node=node,
+        server_ip=server_ip,
+        central_ip=central_ip,
+        vpn_install_function=vpn_install_function
+    )
+    gui_script_tail = """
 
 # WSL/Ubuntu 설정 함수 로드 (Docker Runner에서 사용될 수 있음)
 # 이 함수들은 실제로 사용되지 않을 수 있지만, 참조 오류 방지를 위해 포함
@@ -995,154 +1039,138 @@ try {{
     # 강제 종료
     Stop-Process -Id $PID -Force -ErrorAction SilentlyContinue
 }}
-""".format(
-        node=node,
-        server_ip=server_ip,
-        central_ip=central_ip,
-        vpn_install_function=vpn_install_function,
-        docker_runner_function=docker_runner_function
-    )
-    
-    # 전체 스크립트를 Base64로 인코딩
-    full_script = gui_script
-    ps_script_bytes = full_script.encode('utf-16le')
-    ps_script_base64 = base64.b64encode(ps_script_bytes).decode('ascii')
-    
-    # Base64를 여러 줄로 나누기
-    chunk_size = 5000
-    ps_script_base64_chunks = [ps_script_base64[i:i+chunk_size] for i in range(0, len(ps_script_base64), chunk_size)]
-    
-    # 배치 스크립트 생성
-    batch_lines = ['@echo off']
-    batch_lines.append('setlocal')
-    batch_lines.append('')
+""".format()  # 치환할 값 없음 ({{ }}만 풀기)
+
+    yield from _batch_lines(node, (gui_script_head, docker_runner_function, gui_script_tail))
+
+
+def _batch_lines(node: Node, gui_script: Iterable[str]) -> Iterator[str]:
+    """배치 파일 줄 단위 생성 (PowerShell 스크립트는 Base64 청크 줄로 포함)"""
+    yield '@echo off'
+    yield 'setlocal'
+    yield ''
     
     # 로그 파일 설정
-    batch_lines.append('REM 로그 파일 설정')
-    batch_lines.append('if "%1"=="ADMIN_RUN" goto :UseExistingLog')
-    batch_lines.append('')
+    yield 'REM 로그 파일 설정'
+    yield 'if "%1"=="ADMIN_RUN" goto :UseExistingLog'
+    yield ''
     
     # 첫 실행 - 새 로그 파일 생성
-    batch_lines.append(':FirstRun')
-    batch_lines.append('for /f "tokens=*" %%a in (\'powershell -NoProfile -Command "Get-Date -Format yyyyMMdd_HHmmss"\') do set "TIMESTAMP=%%a"')
-    batch_lines.append('if not defined TIMESTAMP set "TIMESTAMP=%RANDOM%"')
-    batch_lines.append(f'set "LOGFILE=%~dp0worker_setup_modular_{node.node_id}_%TIMESTAMP%.log"')
-    batch_lines.append('echo ===================================== > "%LOGFILE%"')
-    batch_lines.append(f'echo Worker Setup (Modular) - Node {node.node_id} >> "%LOGFILE%"')
-    batch_lines.append('echo Started at %date% %time% >> "%LOGFILE%"')
-    batch_lines.append('echo ===================================== >> "%LOGFILE%"')
-    batch_lines.append('echo. >> "%LOGFILE%"')
-    batch_lines.append('goto :LogReady')
-    batch_lines.append('')
+    yield ':FirstRun'
+    yield 'for /f "tokens=*" %%a in (\'powershell -NoProfile -Command "Get-Date -Format yyyyMMdd_HHmmss"\') do set "TIMESTAMP=%%a"'
+    yield 'if not defined TIMESTAMP set "TIMESTAMP=%RANDOM%"'
+    yield f'set "LOGFILE=%~dp0worker_setup_modular_{node.node_id}_%TIMESTAMP%.log"'
+    yield 'echo ===================================== > "%LOGFILE%"'
+    yield f'echo Worker Setup (Modular) - Node {node.node_id} >> "%LOGFILE%"'
+    yield 'echo Started at %date% %time% >> "%LOGFILE%"'
+    yield 'echo ===================================== >> "%LOGFILE%"'
+    yield 'echo. >> "%LOGFILE%"'
+    yield 'goto :LogReady'
+    yield ''
     
     # 기존 로그 파일 사용
-    batch_lines.append(':UseExistingLog')
-    batch_lines.append('set "LOGFILE="')
-    batch_lines.append(f'for /f "delims=" %%F in (\'dir /b /o-d "%~dp0worker_setup_modular_{node.node_id}_*.log" 2^>nul\') do (')
-    batch_lines.append('    if not defined LOGFILE set "LOGFILE=%~dp0%%F"')
-    batch_lines.append(')')
-    batch_lines.append('if not defined LOGFILE (')
-    batch_lines.append(f'    set "LOGFILE=%~dp0worker_setup_modular_{node.node_id}_fallback.log"')
-    batch_lines.append(')')
-    batch_lines.append('if "%1"=="ADMIN_RUN" echo [%time%] Running with administrator privileges... >> "%LOGFILE%"')
-    batch_lines.append('')
+    yield ':UseExistingLog'
+    yield 'set "LOGFILE="'
+    yield f'for /f "delims=" %%F in (\'dir /b /o-d "%~dp0worker_setup_modular_{node.node_id}_*.log" 2^>nul\') do ('
+    yield '    if not defined LOGFILE set "LOGFILE=%~dp0%%F"'
+    yield ')'
+    yield 'if not defined LOGFILE ('
+    yield f'    set "LOGFILE=%~dp0worker_setup_modular_{node.node_id}_fallback.log"'
+    yield ')'
+    yield 'if "%1"=="ADMIN_RUN" echo [%time%] Running with administrator privileges... >> "%LOGFILE%"'
+    yield ''
     
-    batch_lines.append(':LogReady')
-    batch_lines.append('')
+    yield ':LogReady'
+    yield ''
     
     # 관리자 권한 확인
-    batch_lines.append('REM Check for admin privileges')
-    batch_lines.append('if "%1"=="ADMIN_RUN" goto :StartMain')
-    batch_lines.append('')
-    batch_lines.append('net session >nul 2>&1')
-    batch_lines.append('if %errorLevel% neq 0 (')
-    batch_lines.append('    echo [%time%] Requesting administrator privileges... >> "%LOGFILE%"')
-    batch_lines.append('    powershell -Command "Start-Process cmd -ArgumentList \'/c \\"%~f0\\" ADMIN_RUN\' -WindowStyle Hidden -Verb RunAs"')
-    batch_lines.append('    exit')
-    batch_lines.append(')')
-    batch_lines.append('')
-    batch_lines.append('REM If already admin, go to StartMain')
-    batch_lines.append('goto :StartMain')
-    batch_lines.append('')
+    yield 'REM Check for admin privileges'
+    yield 'if "%1"=="ADMIN_RUN" goto :StartMain'
+    yield ''
+    yield 'net session >nul 2>&1'
+    yield 'if %errorLevel% neq 0 ('
+    yield '    echo [%time%] Requesting administrator privileges... >> "%LOGFILE%"'
+    yield '    powershell -Command "Start-Process cmd -ArgumentList \'/c \\"%~f0\\" ADMIN_RUN\' -WindowStyle Hidden -Verb RunAs"'
+    yield '    exit'
+    yield ')'
+    yield ''
+    yield 'REM If already admin, go to StartMain'
+    yield 'goto :StartMain'
+    yield ''
     
-    batch_lines.append(':StartMain')
-    batch_lines.append('echo [%time%] Running modular setup script... >> "%LOGFILE%"')
-    batch_lines.append('echo Log file: %LOGFILE%')
-    batch_lines.append('echo Starting Worker Setup GUI v2.0 (Modular)...')
-    batch_lines.append('')
+    yield ':StartMain'
+    yield 'echo [%time%] Running modular setup script... >> "%LOGFILE%"'
+    yield 'echo Log file: %LOGFILE%'
+    yield 'echo Starting Worker Setup GUI v2.0 (Modular)...'
+    yield ''
     
     # 임시 파일 생성
-    batch_lines.append(f'set "PS_FILE=%TEMP%\\worker_gui_modular_{node.node_id}.txt"')
-    batch_lines.append('echo [%time%] Creating temporary PowerShell script... >> "%LOGFILE%"')
-    batch_lines.append('')
+    yield f'set "PS_FILE=%TEMP%\\worker_gui_modular_{node.node_id}.txt"'
+    yield 'echo [%time%] Creating temporary PowerShell script... >> "%LOGFILE%"'
+    yield ''
     
     # Base64 스크립트를 파일로 쓰기
-    batch_lines.append('echo Creating PowerShell script file...')
-    for i, chunk in enumerate(ps_script_base64_chunks):
+    yield 'echo Creating PowerShell script file...'
+    for i, chunk in enumerate(_iter_base64_chunks(gui_script)):
         if i == 0:
-            batch_lines.append(f'echo {chunk}> "%PS_FILE%"')
+            yield f'echo {chunk}> "%PS_FILE%"'
         else:
-            batch_lines.append(f'echo {chunk}>> "%PS_FILE%"')
+            yield f'echo {chunk}>> "%PS_FILE%"'
     
-    batch_lines.append('')
-    batch_lines.append('echo [%time%] Starting GUI (Modular Version)... >> "%LOGFILE%"')
-    batch_lines.append('echo Launching GUI window...')
-    batch_lines.append('')
+    yield ''
+    yield 'echo [%time%] Starting GUI (Modular Version)... >> "%LOGFILE%"'
+    yield 'echo Launching GUI window...'
+    yield ''
     
     # PowerShell GUI 실행 (콘솔 창 표시하여 디버깅)
-    batch_lines.append('echo [%time%] Launching PowerShell GUI... >> "%LOGFILE%"')
-    batch_lines.append('')
-    batch_lines.append('REM 디코드된 스크립트를 별도 PS1 파일로 저장')
-    batch_lines.append(f'set "PS_DECODED=%TEMP%\\worker_gui_decoded_{node.node_id}.ps1"')
-    batch_lines.append('')
-    batch_lines.append('powershell.exe -NoProfile -ExecutionPolicy Bypass -Command "chcp 65001 | Out-Null; [Console]::OutputEncoding = [System.Text.Encoding]::UTF8; $encoded = Get-Content \'%PS_FILE%\' -Raw; $bytes = [System.Convert]::FromBase64String($encoded); $script = [System.Text.Encoding]::Unicode.GetString($bytes); Set-Content -Path \'%PS_DECODED%\' -Value $script -Encoding UTF8"')
-    batch_lines.append('')
-    batch_lines.append('REM 디코드된 파일이 생성되었는지 확인')
-    batch_lines.append('if not exist "%PS_DECODED%" (')
-    batch_lines.append('    echo [%time%] ERROR: Failed to create decoded PowerShell script >> "%LOGFILE%"')
-    batch_lines.append('    echo ERROR: Failed to decode PowerShell script!')
-    batch_lines.append('    echo Please check if the Base64 encoding is correct.')
-    batch_lines.append('    pause')
-    batch_lines.append('    exit /b 1')
-    batch_lines.append(')')
-    batch_lines.append('')
-    batch_lines.append('echo [%time%] Running decoded PowerShell script... >> "%LOGFILE%"')
-    batch_lines.append('echo.')
-    batch_lines.append('echo Starting GUI... Please wait...')
-    batch_lines.append('echo.')
-    batch_lines.append('REM PowerShell 실행 시 출력을 로그 파일로 리디렉션')
-    batch_lines.append('powershell.exe -NoProfile -ExecutionPolicy Bypass -WindowStyle Hidden -STA -File "%PS_DECODED%" >> "%LOGFILE%" 2>&1')
-    batch_lines.append('')
-    batch_lines.append('if %ERRORLEVEL% NEQ 0 (')
-    batch_lines.append('    echo [%time%] PowerShell execution failed with error code %ERRORLEVEL% >> "%LOGFILE%"')
-    batch_lines.append('    echo ERROR: PowerShell execution failed with error code %ERRORLEVEL%')
-    batch_lines.append('    echo Check the log file: %LOGFILE%')
-    batch_lines.append('    echo.')
-    batch_lines.append('    echo Decoded script saved at: %PS_DECODED%')
-    batch_lines.append('    echo You can open it with Notepad to check for errors.')
-    batch_lines.append('    echo.')
-    batch_lines.append('    REM 에러 발생 시 임시 파일을 삭제하지 않음')
-    batch_lines.append('    pause')
-    batch_lines.append('    exit /b %ERRORLEVEL%')
-    batch_lines.append(')')
-    batch_lines.append('')
-    batch_lines.append('echo [%time%] PowerShell execution completed >> "%LOGFILE%"')
-    batch_lines.append('')
+    yield 'echo [%time%] Launching PowerShell GUI... >> "%LOGFILE%"'
+    yield ''
+    yield 'REM 디코드된 스크립트를 별도 PS1 파일로 저장'
+    yield f'set "PS_DECODED=%TEMP%\\worker_gui_decoded_{node.node_id}.ps1"'
+    yield ''
+    yield 'powershell.exe -NoProfile -ExecutionPolicy Bypass -Command "chcp 65001 | Out-Null; [Console]::OutputEncoding = [System.Text.Encoding]::UTF8; $encoded = Get-Content \'%PS_FILE%\' -Raw; $bytes = [System.Convert]::FromBase64String($encoded); $script = [System.Text.Encoding]::Unicode.GetString($bytes); Set-Content -Path \'%PS_DECODED%\' -Value $script -Encoding UTF8"'
+    yield ''
+    yield 'REM 디코드된 파일이 생성되었는지 확인'
+    yield 'if not exist "%PS_DECODED%" ('
+    yield '    echo [%time%] ERROR: Failed to create decoded PowerShell script >> "%LOGFILE%"'
+    yield '    echo ERROR: Failed to decode PowerShell script!'
+    yield '    echo Please check if the Base64 encoding is correct.'
+    yield '    pause'
+    yield '    exit /b 1'
+    yield ')'
+    yield ''
+    yield 'echo [%time%] Running decoded PowerShell script... >> "%LOGFILE%"'
+    yield 'echo.'
+    yield 'echo Starting GUI... Please wait...'
+    yield 'echo.'
+    yield 'REM PowerShell 실행 시 출력을 로그 파일로 리디렉션'
+    yield 'powershell.exe -NoProfile -ExecutionPolicy Bypass -WindowStyle Hidden -STA -File "%PS_DECODED%" >> "%LOGFILE%" 2>&1'
+    yield ''
+    yield 'if %ERRORLEVEL% NEQ 0 ('
+    yield '    echo [%time%] PowerShell execution failed with error code %ERRORLEVEL% >> "%LOGFILE%"'
+    yield '    echo ERROR: PowerShell execution failed with error code %ERRORLEVEL%'
+    yield '    echo Check the log file: %LOGFILE%'
+    yield '    echo.'
+    yield '    echo Decoded script saved at: %PS_DECODED%'
+    yield '    echo You can open it with Notepad to check for errors.'
+    yield '    echo.'
+    yield '    REM 에러 발생 시 임시 파일을 삭제하지 않음'
+    yield '    pause'
+    yield '    exit /b %ERRORLEVEL%'
+    yield ')'
+    yield ''
+    yield 'echo [%time%] PowerShell execution completed >> "%LOGFILE%"'
+    yield ''
     
     # 정리
-    batch_lines.append('echo [%time%] Cleaning up temporary files... >> "%LOGFILE%"')
-    batch_lines.append('del "%PS_FILE%" 2>nul')
-    batch_lines.append('del "%PS_DECODED%" 2>nul')
-    batch_lines.append('')
-    batch_lines.append('echo [%time%] Worker setup (modular) completed. >> "%LOGFILE%"')
-    batch_lines.append('echo ===================================== >> "%LOGFILE%"')
-    batch_lines.append('echo.')
-    batch_lines.append('echo Setup completed.')
-    batch_lines.append('echo This window will close in 3 seconds...')
-    batch_lines.append('timeout /t 3 /nobreak >nul')
-    batch_lines.append('exit')
-    
-    # 줄바꿈으로 연결
-    batch_script = '\r\n'.join(batch_lines)
-    
-    return batch_script
\ No newline at end of file
+    yield 'echo [%time%] Cleaning up temporary files... >> "%LOGFILE%"'
+    yield 'del "%PS_FILE%" 2>nul'
+    yield 'del "%PS_DECODED%" 2>nul'
+    yield ''
+    yield 'echo [%time%] Worker setup (modular) completed. >> "%LOGFILE%"'
+    yield 'echo ===================================== >> "%LOGFILE%"'
+    yield 'echo.'
+    yield 'echo Setup completed.'
+    yield 'echo This window will close in 3 seconds...'
+    yield 'timeout /t 3 /nobreak >nul'
+    yield 'exit'
@@ -0,0 +1,281 @@
+"""
+Idempotency Keys
+Idempotency-Key 헤더를 보낸 POST 요청의 응답을 저장해 두고, 같은 키로 다시 오면 처리하지 않고 그대로 돌려줌
+
+- 클라이언트가 타임아웃/연결 끊김 뒤 같은 키로 재시도해도 등록 등이 두 번 실행되지 않습니다.
+- 처리 전에 키를 "처리 중"(status_code=0) 행으로 먼저 저장하므로, 처음 요청이 끝나기 전에 같은 키로 온 요청은
+  실행되지 않고 IDEMPOTENCY_WAIT 초까지 기다렸다가 저장된 응답을 돌려받습니다 (그래도 안 끝나면 409 + Retry-After).
+- 2xx 응답만 저장합니다 (오류 응답이면 키를 지워서 재시도하면 다시 처리). 재생한 응답에는 Idempotent-Replayed: true 헤더가 붙습니다.
+- 같은 키를 다른 경로나 다른 본문(SHA-256)에 쓰면 422를 반환합니다. 키는 요청마다(재시도는 같은 키) 새로 만들어야 합니다.
+- 저장된 응답은 IDEMPOTENCY_KEY_TTL_HOURS 시간 동안 유효하고, 주기 작업이 지난 키를 지웁니다.
+  IDEMPOTENCY_PROCESSING_TIMEOUT 초가 지나도 처리 중인 키(처리하던 프로세스가 죽은 경우)는 다음 요청이 이어받습니다.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import os
+import logging
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from jobs import enqueue, job_handler
+from models import IdempotencyKey
+from scheduler import periodic_task
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+# 이보다 큰 응답은 저장하지 않음 (재시도하면 다시 처리)
+IDEMPOTENCY_MAX_BODY = int(os.getenv('IDEMPOTENCY_MAX_BODY', str(1024 * 1024)))
+IDEMPOTENCY_CLEANUP_INTERVAL = float(os.getenv('IDEMPOTENCY_CLEANUP_INTERVAL', '3600'))
+# 같은 키의 처음 요청이 끝나기를 기다리는 최대 시간 (넘으면 409)
+IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', '10'))
+# 이보다 오래 처리 중인 키는 처리하던 프로세스가 죽은 것으로 보고 이어받음
+IDEMPOTENCY_PROCESSING_TIMEOUT = float(os.getenv('IDEMPOTENCY_PROCESSING_TIMEOUT', '300'))
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+_MAX_KEY_LENGTH = 255
+# status_code가 이 값이면 처리 중
+PROCESSING = 0
+_POLL_INTERVAL = 0.1
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite는 tz 정보 없이 돌려주므로 UTC로 간주"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _expired(record: IdempotencyKey) -> bool:
+    age = _utcnow() - _as_utc(record.created_at)
+    if record.status_code == PROCESSING:
+        return age > timedelta(seconds=IDEMPOTENCY_PROCESSING_TIMEOUT)
+    return age > timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def _load(key: str) -> Optional[IdempotencyKey]:
+    db = SessionLocal()
+    try:
+        record = db.get(IdempotencyKey, key)
+        if record is None:
+            return None
+        db.expunge(record)
+        return record
+    finally:
+        db.close()
+
+
+def _reserve(key: str, request: str) -> Optional[IdempotencyKey]:
+    """키를 처리 중으로 저장. 이 요청이 처리하게 되면 None, 이미 있으면 기존 행"""
+    db = SessionLocal()
+    try:
+        for _ in range(2):
+            values = {"key": key, "request": request, "status_code": PROCESSING, "created_at": _utcnow()}
+            dialect = db.get_bind().dialect.name
+            if dialect in ("postgresql", "sqlite"):
+                insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+                result = db.execute(insert(IdempotencyKey).values(**values).on_conflict_do_nothing(index_elements=["key"]))
+                inserted = result.rowcount == 1
+                db.commit()
+            else:
+                db.add(IdempotencyKey(**values))
+                try:
+                    db.commit()
+                    inserted = True
+                except IntegrityError:
+                    db.rollback()
+                    inserted = False
+            if inserted:
+                return None
+
+            record = db.get(IdempotencyKey, key)
+            if record is None:
+                continue  # 그 사이 지워짐 - 다시 저장
+            if not _expired(record):
+                db.expunge(record)
+                return record
+            # 만료된 응답이나 멈춘 처리 중 키는 지우고 이 요청이 이어받음
+            # (같은 created_at일 때만 지워서 동시에 이어받으려는 다른 요청과 겹치지 않게 함)
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key, IdempotencyKey.created_at == record.created_at
+            ).delete(synchronize_session=False)
+            db.commit()
+        return _load(key)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _store(key: str, status_code: int, content_type: Optional[str], body: bytes):
+    """처리 중인 키에 응답 저장 (저장할 수 없는 응답이면 키를 지움)"""
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        _release(key)  # 텍스트가 아닌 응답은 저장하지 않음
+        return
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.key == key, IdempotencyKey.status_code == PROCESSING
+        ).update({
+            "status_code": status_code,
+            "content_type": content_type,
+            "body": text,
+            "created_at": _utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to store idempotent response for key {key}: {e}")
+    finally:
+        db.close()
+
+
+def _release(key: str):
+    """응답을 저장하지 않는 경우 처리 중 키를 지워서 재시도하면 다시 처리되게 함"""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.key == key, IdempotencyKey.status_code == PROCESSING
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to release idempotency key {key}: {e}")
+    finally:
+        db.close()
+
+
+async def _read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    return bytes(body)
+
+
+class IdempotencyMiddleware:
+    """Idempotency-Key 헤더가 있는 POST 요청의 응답 저장/재생 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        key = dict(scope.get("headers", [])).get(IDEMPOTENCY_HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+
+        key = key.decode("latin-1")
+        if len(key) > _MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be at most {_MAX_KEY_LENGTH} characters"})
+            return
+
+        # 같은 키로 다른 본문을 보내면 거부하도록 본문 해시를 요청 식별값에 포함
+        body = await _read_body(receive)
+        request = f"{scope['method']} {scope['path']} sha256={hashlib.sha256(body).hexdigest()}"
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + IDEMPOTENCY_WAIT
+        while True:
+            record = await run_in_threadpool(_reserve, key, request)
+            if record is None:
+                break
+            if record.request != request:
+                await _send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+                return
+            if record.status_code != PROCESSING:
+                headers = [(b"idempotent-replayed", b"true")]
+                if record.content_type:
+                    headers.append((b"content-type", record.content_type.encode("latin-1")))
+                await _send(send, record.status_code, headers, (record.body or "").encode("utf-8"))
+                return
+            if loop.time() >= deadline:
+                await _send(send, 409, [(b"content-type", b"application/json"), (b"retry-after", b"1")],
+                            json.dumps({"detail": "A request with this Idempotency-Key is still being processed"}).encode("utf-8"))
+                return
+            # 처음 요청이 끝나면 그 응답을 재생
+            await asyncio.sleep(_POLL_INTERVAL)
+
+        body_sent = False
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "content_type": None, "body": bytearray(), "stored": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        response["content_type"] = value.decode("latin-1")
+            elif (message["type"] == "http.response.body" and response["body"] is not None
+                  and 200 <= response["status"] < 300):
+                response["body"] += message.get("body", b"")
+                if len(response["body"]) > IDEMPOTENCY_MAX_BODY:
+                    response["body"] = None
+                elif not message.get("more_body", False):
+                    # 클라이언트가 응답을 받은 직후 재시도해도 재생되도록 마지막 조각을 보내기 전에 저장
+                    await run_in_threadpool(_store, key, response["status"],
+                                            response["content_type"], bytes(response["body"]))
+                    response["stored"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_wrapper)
+        finally:
+            if not response["stored"]:
+                # 오류 응답/너무 큰 응답/처리 중 예외 - 키를 풀어서 재시도하면 다시 처리
+                await run_in_threadpool(_release, key)
+
+
+async def _send(send, status: int, headers: list, body: bytes):
+    headers = headers + [(b"content-length", str(len(body)).encode("latin-1"))]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, content: dict):
+    await _send(send, status, [(b"content-type", b"application/json")], json.dumps(content).encode("utf-8"))
+
+
+# ==================== 정리 ====================
+
+@job_handler("purge_idempotency_keys")
+def purge_idempotency_keys(db, payload: dict):
+    """IDEMPOTENCY_KEY_TTL_HOURS 시간이 지난 저장 응답 삭제"""
+    cutoff = _utcnow() - timedelta(hours=float(payload.get("ttl_hours", IDEMPOTENCY_KEY_TTL_HOURS)))
+    deleted = (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.created_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    logger.info(f"Purged {deleted} expired idempotency keys")
+    return {"deleted": deleted}
+
+
+@periodic_task("idempotency-cleanup", interval=IDEMPOTENCY_CLEANUP_INTERVAL)
+def schedule_idempotency_cleanup(db):
+    enqueue(db, "purge_idempotency_keys")
@@ -0,0 +1,442 @@
+"""
+Background Jobs
+DB 테이블 기반 백그라운드 작업 큐
+
+- enqueue()로 jobs 테이블에 작업을 넣으면 각 API 프로세스의 JobWorker가 가져가 실행합니다.
+- PostgreSQL에서는 `FOR UPDATE SKIP LOCKED`로 가져오므로 여러 프로세스/레플리카가
+  같은 작업을 중복 실행하지 않습니다.
+- 실패한 작업은 지수 백오프로 max_attempts 번까지 재시도합니다.
+- JOB_LOCK_TIMEOUT 초 넘게 running 상태인 작업(프로세스 종료 등)은 다시 가져갑니다.
+
+작업 종류는 @job_handler("kind")로 등록합니다. 핸들러는 (db, payload)를 받아
+JSON으로 직렬화 가능한 결과를 반환하고, 예외를 던지면 재시도됩니다.
+오래 걸리는 핸들러는 report_progress()로 진행 상황을 남길 수 있습니다 (실행 중 result에 보임).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from time import monotonic, perf_counter
+from typing import Any, Dict, Optional
+import asyncio
+import json
+import os
+import random
+import socket
+import threading
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from auth import verify_token
+from database import SessionLocal, begin_write
+from metrics import Counter, Gauge, Histogram
+from models import Job, QRToken
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+JOB_WORKER_ENABLED = os.getenv('JOB_WORKER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', '2'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE_DELAY = float(os.getenv('JOB_RETRY_BASE_DELAY', '2'))
+JOB_RETRY_MAX_DELAY = float(os.getenv('JOB_RETRY_MAX_DELAY', '300'))
+JOB_LOCK_TIMEOUT = float(os.getenv('JOB_LOCK_TIMEOUT', '600'))
+JOB_WAIT_MAX = 30.0
+JOB_WAIT_POLL = 0.5
+
+QR_TOKEN_RETENTION_HOURS = float(os.getenv('QR_TOKEN_RETENTION_HOURS', '24'))
+JOB_RETENTION_DAYS = float(os.getenv('JOB_RETENTION_DAYS', '7'))
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+# 작업을 가져간 프로세스 식별자
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+JOBS_PROCESSED = Counter(
+    "worker_api_jobs_total",
+    "Background jobs executed by kind and outcome (succeeded, retry, failed)",
+    ("kind", "outcome"),
+)
+JOB_DURATION = Histogram(
+    "worker_api_job_duration_seconds",
+    "Background job execution time",
+    ("kind",),
+)
+JOBS_RUNNING = Gauge(
+    "worker_api_jobs_running",
+    "Background jobs currently executing in this process",
+)
+
+# kind -> (handler, 기본 max_attempts)
+_handlers = {}
+
+# 현재 스레드에서 실행 중인 작업 ID (report_progress용)
+_current_job = threading.local()
+
+
+def job_handler(kind: str, max_attempts: int = JOB_MAX_ATTEMPTS):
+    """작업 종류 등록 데코레이터"""
+    def decorator(func):
+        _handlers[kind] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(db: Session, kind: str, payload: Optional[Dict[str, Any]] = None,
+            delay: float = 0, max_attempts: Optional[int] = None) -> Job:
+    """작업 추가 (commit은 호출자가 수행, 커밋되면 이 프로세스의 워커를 바로 깨움)"""
+    if kind not in _handlers:
+        raise KeyError(kind)
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or _handlers[kind][1],
+        run_after=_utcnow() + timedelta(seconds=delay),
+    )
+    db.add(job)
+    db.flush()
+    db.info["jobs_enqueued"] = True
+    return job
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_worker(session: Session):
+    # 커밋 전에 깨우면 워커가 아직 보이지 않는 작업을 찾지 못하고 poll 주기만큼 기다림
+    if session.info.pop("jobs_enqueued", False) and _worker is not None:
+        _worker.wake()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_wake(session: Session):
+    session.info.pop("jobs_enqueued", None)
+
+
+def retry_delay(attempts: int) -> float:
+    """재시도 대기 시간 (지수 백오프 + 지터)"""
+    delay = min(JOB_RETRY_MAX_DELAY, JOB_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim_jobs(limit: int, worker_id: str = WORKER_ID) -> list:
+    """실행할 작업을 최대 limit 개 가져와 running으로 표시하고 ID 목록을 반환"""
+    now = _utcnow()
+    stale_before = now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    db = SessionLocal()
+    try:
+        begin_write(db)
+        jobs = (
+            db.query(Job)
+            .filter(or_(
+                and_(Job.status == "queued", Job.run_after <= now),
+                and_(Job.status == "running", Job.locked_at < stale_before),
+            ))
+            .order_by(Job.run_after, Job.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        claimed = []
+        for job in jobs:
+            if job.status == "running":
+                logger.warning(f"Reclaiming job #{job.id} ({job.kind}) abandoned by {job.locked_by}")
+                if job.attempts >= job.max_attempts:
+                    job.status = "failed"
+                    job.last_error = f"Abandoned by {job.locked_by} after {job.attempts} attempts"
+                    job.locked_by = None
+                    job.finished_at = now
+                    continue
+            job.status = "running"
+            job.locked_by = worker_id
+            job.locked_at = now
+            job.attempts += 1
+            claimed.append(job.id)
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def report_progress(progress: Dict[str, Any]):
+    """실행 중인 작업의 진행 상황을 result에 기록 (별도 트랜잭션으로 바로 커밋)
+
+    locked_at도 갱신하므로 JOB_LOCK_TIMEOUT보다 오래 걸리는 작업도 다른 프로세스가 다시 가져가지 않습니다.
+    작업 핸들러 밖에서 호출하면 아무것도 하지 않습니다.
+    """
+    job_id = getattr(_current_job, "id", None)
+    if job_id is None:
+        return
+    db = SessionLocal()
+    try:
+        (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.status == "running")
+            .update({Job.result: json.dumps(progress), Job.locked_at: _utcnow()}, synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_job(job_id: int):
+    """가져온 작업 하나를 실행하고 결과/재시도 상태를 기록"""
+    db = SessionLocal()
+    start = perf_counter()
+    kind = "<unknown>"
+    JOBS_RUNNING.inc()
+    try:
+        job = db.get(Job, job_id)
+        if job is None:
+            return
+        kind = job.kind
+        payload = json.loads(job.payload or "{}")
+        entry = _handlers.get(kind)
+        try:
+            if entry is None:
+                raise LookupError(f"No handler registered for job kind '{kind}'")
+            _current_job.id = job_id
+            try:
+                result = entry[0](db, payload)
+            finally:
+                _current_job.id = None
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            job = db.get(Job, job_id)
+            job.last_error = f"{type(e).__name__}: {e}"
+            job.locked_by = None
+            if entry is not None and job.attempts < job.max_attempts:
+                delay = retry_delay(job.attempts)
+                job.status = "queued"
+                job.run_after = _utcnow() + timedelta(seconds=delay)
+                outcome = "retry"
+                logger.warning(f"Job #{job_id} ({kind}) attempt {job.attempts}/{job.max_attempts} failed, "
+                               f"retrying in {delay:.1f}s: {e}")
+            else:
+                job.status = "failed"
+                job.finished_at = _utcnow()
+                outcome = "failed"
+                logger.error(f"Job #{job_id} ({kind}) failed after {job.attempts} attempts: {e}")
+        else:
+            job.status = "succeeded"
+            job.result = json.dumps(result) if result is not None else None
+            job.last_error = None
+            job.locked_by = None
+            job.finished_at = _utcnow()
+            outcome = "succeeded"
+        db.commit()
+        JOBS_PROCESSED.labels(kind, outcome).inc()
+    except Exception as e:
+        logger.error(f"Failed to record result of job #{job_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+        JOBS_RUNNING.dec()
+        JOB_DURATION.labels(kind).observe(perf_counter() - start)
+
+
+class JobWorker:
+    """작업을 가져와 스레드 풀에서 실행하는 사이드 스레드 (프로세스당 하나)"""
+
+    def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        self._thread = threading.Thread(target=self._run, name="job-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Job worker {WORKER_ID} started (concurrency={self.concurrency})")
+
+    def stop(self):
+        """워커 스레드를 멈추고 실행 중인 작업이 끝날 때까지 대기"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        # 가져온 작업만 제출하므로 대기 중인 작업은 없음 (실행 중인 작업은 끝까지 기록)
+        self._executor.shutdown(wait=True)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._inflight_lock:
+                free = self.concurrency - self._inflight
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = claim_jobs(free)
+                except Exception as e:
+                    logger.warning(f"Failed to claim jobs: {e}")
+                for job_id in claimed:
+                    with self._inflight_lock:
+                        self._inflight += 1
+                    self._executor.submit(self._execute, job_id)
+            # 슬롯이 남았는데 더 가져올 작업이 없거나 슬롯이 가득 찼으면 대기
+            if len(claimed) < free or free <= 0:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _execute(self, job_id: int):
+        try:
+            run_job(job_id)
+        finally:
+            with self._inflight_lock:
+                self._inflight -= 1
+            self._wake.set()
+
+
+_worker = None
+
+
+def start_job_worker():
+    """작업 워커 시작 (startup 이벤트에서 호출)"""
+    global _worker
+    if not JOB_WORKER_ENABLED or _worker is not None:
+        return
+    _worker = JobWorker()
+    _worker.start()
+
+
+def stop_job_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
+
+
+# ==================== 기본 작업 ====================
+
+@job_handler("sweep_expired_tokens")
+def sweep_expired_tokens(db: Session, payload: dict):
+    """만료 후 QR_TOKEN_RETENTION_HOURS 시간이 지난 QR 토큰 삭제"""
+    retention = float(payload.get("retention_hours", QR_TOKEN_RETENTION_HOURS))
+    cutoff = _utcnow() - timedelta(hours=retention)
+    deleted = db.query(QRToken).filter(QRToken.expires_at < cutoff).delete(synchronize_session=False)
+    logger.info(f"Swept {deleted} expired QR tokens")
+    return {"deleted": deleted}
+
+
+@job_handler("purge_finished_jobs")
+def purge_finished_jobs(db: Session, payload: dict):
+    """끝난 지 JOB_RETENTION_DAYS 일이 지난 작업 삭제"""
+    retention = float(payload.get("retention_days", JOB_RETENTION_DAYS))
+    cutoff = _utcnow() - timedelta(days=retention)
+    deleted = (
+        db.query(Job)
+        .filter(Job.status.in_(FINISHED_STATUSES), Job.finished_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    logger.info(f"Purged {deleted} finished jobs")
+    return {"deleted": deleted}
+
+
+# ==================== API ====================
+
+class JobRequest(BaseModel):
+    """작업 추가 요청"""
+    kind: str
+    payload: Dict[str, Any] = {}
+    delay: float = 0
+    max_attempts: Optional[int] = None
+
+
+def job_to_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "payload": json.loads(job.payload) if job.payload else {},
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after,
+        "locked_by": job.locked_by,
+        "result": json.loads(job.result) if job.result else None,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def _load_job(job_id: int) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("/jobs")
+def create_job(
+    request: JobRequest,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_token)
+):
+    """작업 추가 (등록된 kind만 허용)"""
+    if request.kind not in _handlers:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {request.kind}")
+    job = enqueue(db, request.kind, request.payload, delay=request.delay, max_attempts=request.max_attempts)
+    db.commit()
+    return job_to_dict(job)
+
+
+@router.get("/jobs")
+def list_jobs(
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_token)
+):
+    """최근 작업 목록 (최신순)"""
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status == status)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    jobs = query.order_by(Job.id.desc()).limit(min(max(limit, 1), 200)).all()
+    return {
+        "kinds": sorted(_handlers),
+        "jobs": [job_to_dict(job) for job in jobs]
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, wait: float = 0, token: str = Depends(verify_token)):
+    """작업 상태 조회
+
+    wait > 0 이면 작업이 끝나거나 wait 초(최대 30초)가 지날 때까지 기다렸다가 응답합니다 (롱폴링).
+    """
+    deadline = monotonic() + min(max(wait, 0), JOB_WAIT_MAX)
+    while True:
+        job = await run_in_threadpool(_load_job, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["status"] in FINISHED_STATUSES or monotonic() >= deadline:
+            return job
+        await asyncio.sleep(JOB_WAIT_POLL)
@@ -0,0 +1,183 @@
+"""
+Event Loop Watchdog
+이벤트 루프 지연(lag) 측정과 멈춤(stall) 감지
+
+루프 안의 하트비트 태스크가 LOOP_WATCHDOG_INTERVAL 마다 깨어나 지연을 기록하고,
+사이드 스레드가 하트비트가 LOOP_STALL_THRESHOLD 초 이상 끊긴 것을 발견하면
+루프 스레드의 현재 스택을 잡아 라우트 이름과 함께 로그/메트릭으로 남깁니다.
+async 핸들러 안의 블로킹 호출(SQLAlchemy, subprocess, QR 렌더링 등)을 찾는 용도입니다.
+METRICS_MULTIPROC_DIR을 지정하면 /admin/loop-stalls에 모든 워커 프로세스의 기록이 함께 나옵니다.
+"""
+from collections import deque
+from datetime import datetime, timezone
+from time import perf_counter
+import asyncio
+import os
+import sys
+import threading
+import traceback
+import logging
+
+from fastapi import APIRouter, Depends
+
+import process_files
+from auth import verify_token
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+LOOP_WATCHDOG_ENABLED = os.getenv('LOOP_WATCHDOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LOOP_WATCHDOG_INTERVAL = float(os.getenv('LOOP_WATCHDOG_INTERVAL', '0.1'))
+LOOP_STALL_THRESHOLD = float(os.getenv('LOOP_STALL_THRESHOLD', '0.25'))
+LOOP_STALL_HISTORY = int(os.getenv('LOOP_STALL_HISTORY', '50'))
+LOOP_STALL_STACK_DEPTH = 20
+
+LOOP_LAG = Histogram(
+    "worker_api_event_loop_lag_seconds",
+    "Event loop scheduling lag measured by the watchdog heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = Counter(
+    "worker_api_event_loop_stalls_total",
+    "Event loop stalls above LOOP_STALL_THRESHOLD by route",
+    ("route",),
+)
+LOOP_STALL_DURATION = Histogram(
+    "worker_api_event_loop_stall_seconds",
+    "Duration of detected event loop stalls",
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+_stalls = deque(maxlen=LOOP_STALL_HISTORY)
+_stalls_lock = threading.Lock()
+
+
+class LoopWatchdog:
+    """이벤트 루프 하트비트 + 스택 캡처 스레드"""
+
+    def __init__(self, loop, route_index, interval: float = LOOP_WATCHDOG_INTERVAL,
+                 threshold: float = LOOP_STALL_THRESHOLD):
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self.route_index = route_index
+        self.interval = interval
+        self.threshold = threshold
+        self.last_beat = perf_counter()
+        self._current_stall = None
+        self._task = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+
+    def start(self):
+        self._task = self.loop.create_task(self._heartbeat())
+        self._thread.start()
+        logger.info(f"Event loop watchdog started (interval={self.interval}s, threshold={self.threshold}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            before = perf_counter()
+            await asyncio.sleep(self.interval)
+            now = perf_counter()
+            LOOP_LAG.observe(max(0.0, now - before - self.interval))
+            self.last_beat = now
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval / 2):
+            blocked_for = perf_counter() - self.last_beat
+            if blocked_for >= self.threshold:
+                if self._current_stall is None:
+                    self._capture(blocked_for)
+            elif self._current_stall is not None:
+                self._finish_stall()
+
+    def _resolve_route(self, frame) -> str:
+        """스택에서 라우트 엔드포인트 함수를 찾아 라우트 경로를 반환"""
+        while frame is not None:
+            route = self.route_index.get(frame.f_code)
+            if route is not None:
+                return route
+            frame = frame.f_back
+        return "<no-route>"
+
+    def _capture(self, blocked_for: float):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+        route = self._resolve_route(frame)
+        stack = traceback.format_stack(frame, limit=LOOP_STALL_STACK_DEPTH)
+        # 블로킹이 일어난 가장 안쪽 프레임
+        location = f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        self._current_stall = {
+            "route": route,
+            "location": location,
+            "detected_at": datetime.now(timezone.utc).isoformat(),
+            "started": self.last_beat,
+            "stack": "".join(stack),
+        }
+        LOOP_STALLS.labels(route).inc()
+        logger.warning(
+            f"Event loop blocked for {blocked_for:.3f}s+ in route {route} at {location}\n"
+            + "".join(stack)
+        )
+
+    def _finish_stall(self):
+        stall = self._current_stall
+        self._current_stall = None
+        duration = self.last_beat - stall.pop("started")
+        stall["duration_seconds"] = round(duration, 3)
+        LOOP_STALL_DURATION.observe(duration)
+        with _stalls_lock:
+            _stalls.append(stall)
+            if process_files.enabled():
+                process_files.write_process_file("loop-stalls", list(_stalls))
+        logger.warning(f"Event loop stall in route {stall['route']} lasted {duration:.3f}s")
+
+
+def _build_route_index(app) -> dict:
+    """엔드포인트 코드 객체 -> 라우트 경로"""
+    index = {}
+    for route in app.routes:
+        endpoint = getattr(route, "endpoint", None)
+        code = getattr(endpoint, "__code__", None)
+        if code is not None:
+            index[code] = route.path
+    return index
+
+
+_watchdog = None
+
+
+def start_loop_watchdog(app):
+    """현재 이벤트 루프에 워치독 시작 (startup 이벤트에서 호출)"""
+    global _watchdog
+    if not LOOP_WATCHDOG_ENABLED or _watchdog is not None:
+        return
+    _watchdog = LoopWatchdog(asyncio.get_running_loop(), _build_route_index(app))
+    _watchdog.start()
+
+
+def stop_loop_watchdog():
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
+
+
+@router.get("/admin/loop-stalls")
+async def list_loop_stalls(token: str = Depends(verify_token)):
+    """최근 감지된 이벤트 루프 멈춤 목록 (최신순, 모든 워커 프로세스)"""
+    with _stalls_lock:
+        stalls = list(_stalls)
+    stalls = process_files.gather_process_lists("loop-stalls", stalls)
+    return {
+        "enabled": LOOP_WATCHDOG_ENABLED,
+        "threshold_seconds": LOOP_STALL_THRESHOLD,
+        "stalls": sorted(stalls, key=lambda stall: stall["detected_at"], reverse=True)
+    }
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import JSONResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import OperationalError
 from typing import List, Optional
@@ -18,10 +18,26 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-from database import SessionLocal, engine, Base
+from database import SessionLocal, engine, Base, startup_lock, replica_engines
 from models import Node, NodeCreate, NodeResponse, NodeStatus
 from worker_integration import router as worker_router
 from central.routes import router as central_router
+from metrics import router as metrics_router, MetricsMiddleware, instrument_engine, start_metrics_flusher, stop_metrics_flusher
+from auth import verify_token
+from profiling import router as profiling_router, ProfilingMiddleware
+from admission import AdmissionMiddleware
+from loop_watchdog import router as loop_watchdog_router, start_loop_watchdog, stop_loop_watchdog
+from settings import router as settings_router
+from jobs import router as jobs_router, start_job_worker, stop_job_worker
+from scheduler import router as scheduler_router, start_scheduler, stop_scheduler
+from static_assets import router as static_router
+from node_changes import router as node_changes_router
+from node_bulk import router as node_bulk_router
+from webhooks import router as webhooks_router, start_webhook_dispatcher, stop_webhook_dispatcher
+from node_cache import start_node_cache, stop_node_cache
+from replicas import router as replicas_router, ReadYourWritesMiddleware, get_read_db, start_replica_monitor, stop_replica_monitor
+from serialization import FastJSONResponse
+from idempotency import IdempotencyMiddleware
 
 # DB 연결 재시도 함수
 def wait_for_db(max_retries=30):
@@ -40,50 +56,96 @@ def wait_for_db(max_retries=30):
 # DB 연결 대기
 wait_for_db()
 
-# 데이터베이스 초기화
-Base.metadata.create_all(bind=engine)
-logger.info("Database tables created")
+# DB 풀/쿼리 계측
+instrument_engine(engine)
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine)
 
-# 마이그레이션: vpn_ip UNIQUE 제약조건 제거
-try:
-    from sqlalchemy import text, inspect
-    with engine.connect() as conn:
-        # 인덱스 정보 확인
-        inspector = inspect(engine)
-        indexes = inspector.get_indexes('nodes')
+def init_database():
+    """테이블 생성 및 마이그레이션 (멱등)"""
+    # 데이터베이스 초기화
+    Base.metadata.create_all(bind=engine)
+    logger.info("Database tables created")
 
-        # ix_nodes_vpn_ip가 UNIQUE인지 확인
-        vpn_ip_index = next((idx for idx in indexes if idx['name'] == 'ix_nodes_vpn_ip'), None)
+    # 마이그레이션: vpn_ip UNIQUE 제약조건 제거
+    try:
+        from sqlalchemy import text, inspect
+        with engine.connect() as conn:
+            # 인덱스 정보 확인
+            inspector = inspect(engine)
+            indexes = inspector.get_indexes('nodes')
+
+            # ix_nodes_vpn_ip가 UNIQUE인지 확인
+            vpn_ip_index = next((idx for idx in indexes if idx['name'] == 'ix_nodes_vpn_ip'), None)
 
-        if vpn_ip_index and vpn_ip_index.get('unique', False):
-            logger.info("Removing UNIQUE constraint from vpn_ip column...")
+            if vpn_ip_index and vpn_ip_index.get('unique', False):
+                logger.info("Removing UNIQUE constraint from vpn_ip column...")
 
-            # UNIQUE 인덱스 삭제
-            conn.execute(text("DROP INDEX IF EXISTS ix_nodes_vpn_ip"))
-            conn.commit()
+                # UNIQUE 인덱스 삭제
+                conn.execute(text("DROP INDEX IF EXISTS ix_nodes_vpn_ip"))
+                conn.commit()
 
-            # 일반 인덱스로 재생성
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_nodes_vpn_ip ON nodes(vpn_ip)"))
-            conn.commit()
+                # 일반 인덱스로 재생성
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_nodes_vpn_ip ON nodes(vpn_ip)"))
+                conn.commit()
 
-            logger.info("✓ Migration completed: vpn_ip UNIQUE constraint removed")
-        else:
-            logger.info("vpn_ip column already configured correctly (no UNIQUE constraint)")
-except Exception as e:
-    logger.warning(f"Migration check failed (this is normal on first run): {e}")
+                logger.info("✓ Migration completed: vpn_ip UNIQUE constraint removed")
+            else:
+                logger.info("vpn_ip column already configured correctly (no UNIQUE constraint)")
+    except Exception as e:
+        logger.warning(f"Migration check failed (this is normal on first run): {e}")
+
+# 여러 워커 프로세스가 동시에 시작해도 초기화는 한 번에 하나씩만 실행
+with startup_lock("worker-manager:init-database"):
+    init_database()
 
 app = FastAPI(
     title="Worker Manager API",
     description="워커 노드 환경 설정 및 컨테이너 배포 시스템",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson 인코딩 (없으면 표준 JSONResponse)
+    default_response_class=FastJSONResponse
 )
 
+# 노드 변경 피드 (/nodes/{node_id}보다 먼저 등록되어야 함)
+app.include_router(node_changes_router, tags=["nodes"])
+
+# 노드 일괄 처리 (조건부 삭제, 내보내기 등)
+app.include_router(node_bulk_router, tags=["nodes"])
+
 # Worker Integration 라우터 포함
 app.include_router(worker_router, tags=["worker-integration"])
 
 # Central Server 라우터 포함
 app.include_router(central_router, tags=["central-server"])
 
+# Prometheus 메트릭
+app.include_router(metrics_router, tags=["metrics"])
+
+# 요청 프로파일링 (관리자용)
+app.include_router(profiling_router, tags=["admin"])
+
+# 이벤트 루프 멈춤 감지 (관리자용)
+app.include_router(loop_watchdog_router, tags=["admin"])
+
+# 런타임 설정 라우터 포함 (DB 저장, 모든 워커 프로세스 공유)
+app.include_router(settings_router, tags=["settings"])
+
+# 백그라운드 작업 라우터 포함
+app.include_router(jobs_router, tags=["jobs"])
+
+# 주기 작업 스케줄러 라우터 포함
+app.include_router(scheduler_router, tags=["admin"])
+
+# 노드 이벤트 웹훅 (outbox 상태 / 테스트 이벤트)
+app.include_router(webhooks_router, tags=["webhooks"])
+
+# 읽기 레플리카 상태 (관리자용)
+app.include_router(replicas_router, tags=["admin"])
+
+# 설정/설치 페이지에서 분리한 CSS/JS (내용 해시 이름, 장기 캐시)
+app.include_router(static_router, tags=["static"])
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -93,18 +155,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 보안
-security = HTTPBearer()
-API_TOKEN = os.getenv("API_TOKEN", "test-token-123")
-
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """API 토큰 검증"""
-    if credentials.credentials != API_TOKEN:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token"
-        )
-    return credentials.credentials
+# 쓰기 후 조회가 지연된 레플리카로 가지 않도록 쓰기 WAL 위치 전달
+app.add_middleware(ReadYourWritesMiddleware)
+
+# 요청 프로파일링 (X-Profile 헤더 또는 자동 샘플링)
+app.add_middleware(ProfilingMiddleware)
+
+# 설치 파일 생성 라우트 요청 수 제한 / 과부하 시 차단 (거절된 요청도 메트릭에 기록되도록 메트릭 안쪽)
+app.add_middleware(AdmissionMiddleware)
+
+# Idempotency-Key 요청 응답 저장/재생 (재생은 수요 제한에 걸리지 않도록 admission 바깥쪽)
+app.add_middleware(IdempotencyMiddleware)
+
+# 요청 계측 (가장 바깥쪽 미들웨어)
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def on_startup():
+    """백그라운드 작업 시작"""
+    start_metrics_flusher()
+    start_loop_watchdog(app)
+    start_job_worker()
+    start_scheduler()
+    start_webhook_dispatcher()
+    start_node_cache()
+    start_replica_monitor()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """백그라운드 작업 정리"""
+    stop_loop_watchdog()
+    stop_replica_monitor()
+    stop_node_cache()
+    stop_webhook_dispatcher()
+    stop_scheduler()
+    stop_job_worker()
+    stop_metrics_flusher()
 
 def get_db():
     """데이터베이스 세션 생성"""
@@ -155,17 +241,29 @@ async def create_node(
 
 @app.get("/nodes", response_model=List[NodeResponse])
 async def list_nodes(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token: str = Depends(verify_token)
 ):
-    """모든 노드 목록 조회"""
-    nodes = db.query(Node).all()
-    return nodes
+    """모든 노드 목록 조회
+
+    노드가 많을 때를 위해 필요한 컬럼만 읽어 바로 인코딩합니다 (응답 모델 검증 생략, 형식은 NodeResponse와 같음).
+    """
+    rows = db.query(Node.node_id, Node.vpn_ip, Node.status, Node.description, Node.central_server_url).all()
+    return FastJSONResponse([
+        {
+            "node_id": row.node_id,
+            "lan_ip": row.vpn_ip,
+            "status": row.status,
+            "description": row.description,
+            "central_server_url": row.central_server_url,
+        }
+        for row in rows
+    ])
 
 @app.get("/nodes/{node_id}", response_model=NodeResponse)
 async def get_node(
     node_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token: str = Depends(verify_token)
 ):
     """특정 노드 상세 정보"""
@@ -236,20 +334,17 @@ async def update_node_status(
 
 @app.get("/stats")
 async def get_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     token: str = Depends(verify_token)
 ):
-    """시스템 통계"""
-    total_nodes = db.query(Node).count()
-    active_nodes = db.query(Node).filter(Node.status == NodeStatus.ACTIVE).count()
-    pending_nodes = db.query(Node).filter(Node.status == NodeStatus.PENDING).count()
-    failed_nodes = db.query(Node).filter(Node.status == NodeStatus.FAILED).count()
+    """시스템 통계 (상태별 노드 수를 한 번에 집계)"""
+    counts = dict(db.query(Node.status, func.count(Node.node_id)).group_by(Node.status).all())
 
     return {
-        "total_nodes": total_nodes,
-        "active_nodes": active_nodes,
-        "pending_nodes": pending_nodes,
-        "failed_nodes": failed_nodes
+        "total_nodes": sum(counts.values()),
+        "active_nodes": counts.get("active", 0),
+        "pending_nodes": counts.get("pending", 0),
+        "failed_nodes": counts.get("failed", 0)
     }
 
 if __name__ == "__main__":
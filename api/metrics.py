@@ -0,0 +1,558 @@
+"""
+Prometheus Metrics
+/metrics 엔드포인트와 요청·DB·설치 파일 생성기 계측
+
+외부 의존성 없이 Prometheus 텍스트 포맷을 직접 출력합니다.
+핫패스(observe/inc)는 미리 만들어 둔 자식 객체의 리스트 슬롯만 갱신하므로
+요청마다 새 객체를 거의 만들지 않습니다.
+
+METRICS_MULTIPROC_DIR을 지정하면 각 워커 프로세스가 METRICS_FLUSH_INTERVAL 초마다(그리고 스크레이프 때)
+자기 값을 공유 디렉터리에 쓰고, /metrics는 모든 프로세스의 값을 합쳐서 출력합니다.
+카운터/히스토그램은 종료된 프로세스 값도 유지하고, 게이지는 살아 있는 프로세스 값만 더합니다.
+"""
+from bisect import bisect_left
+from functools import wraps
+from inspect import isgeneratorfunction
+from time import perf_counter
+import os
+import threading
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+import process_files
+import query_log
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 기본 지연시간 버킷 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 요청당 쿼리 수 버킷
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+# 생성 결과 크기 버킷 (bytes)
+SIZE_BUCKETS = (1024, 8192, 65536, 262144, 524288, 1048576, 2097152, 4194304, 8388608)
+
+# 공유 디렉터리에 현재 프로세스 값을 쓰는 주기 (초, METRICS_MULTIPROC_DIR 지정 시)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    """라벨 값 이스케이프"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """라벨별 자식 객체를 관리하는 메트릭 베이스"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """라벨 값에 해당하는 자식 반환 (핫패스에서는 결과를 캐시해서 사용)"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _samples(self, children):
+        raise NotImplementedError
+
+    def _child_state(self, child):
+        """공유 파일에 쓰는 자식 값 (JSON)"""
+        raise NotImplementedError
+
+    def _merge_state(self, merged, state):
+        """여러 프로세스의 자식 값 합산"""
+        raise NotImplementedError
+
+    def snapshot(self) -> list:
+        return [[list(values), self._child_state(child)] for values, child in list(self._children.items())]
+
+    def merge(self, snapshots) -> dict:
+        """프로세스별 snapshot() 결과를 라벨 값별로 합산"""
+        merged = {}
+        for snapshot in snapshots:
+            for values, state in snapshot:
+                values = tuple(values)
+                merged[values] = self._merge_state(merged.get(values), state)
+        return merged
+
+    def render(self, children=None) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples(self._children if children is None else children))
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    """스레드풀 라우트, 작업 워커, 웹훅 전송 스레드에서 동시에 갱신하므로 자식마다 잠금 사용"""
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        with self.lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def _child_state(self, child):
+        return child.value
+
+    def _merge_state(self, merged, state):
+        return state if merged is None else merged + state
+
+    def _samples(self, children):
+        for values, child in list(children.items()):
+            value = child.value if isinstance(child, _CounterChild) else child
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # 마지막 슬롯은 +Inf 버킷
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def state(self):
+        """(버킷별 개수, 합계) - 개수와 합계가 어긋나지 않게 함께 읽음"""
+        with self.lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(float(b) for b in buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _child_state(self, child):
+        return list(child.state())
+
+    def _merge_state(self, merged, state):
+        if merged is None:
+            return [list(state[0]), state[1]]
+        merged[0] = [a + b for a, b in zip(merged[0], state[0])]
+        merged[1] += state[1]
+        return merged
+
+    def _samples(self, children):
+        bounds = self.buckets + (float("inf"),)
+        for values, child in list(children.items()):
+            counts, total = child.state() if isinstance(child, _HistogramChild) else child
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def _registered():
+    with _registry_lock:
+        return list(_registry)
+
+
+def flush_metrics():
+    """현재 프로세스의 메트릭 값을 공유 디렉터리에 기록 (METRICS_MULTIPROC_DIR 지정 시)"""
+    if process_files.enabled():
+        process_files.write_process_file("metrics", {metric.name: metric.snapshot() for metric in _registered()})
+
+
+def render_latest() -> str:
+    """등록된 모든 메트릭을 Prometheus 텍스트 포맷으로 출력 (멀티 프로세스면 모든 프로세스 값 합산)"""
+    metrics = _registered()
+    if not process_files.enabled():
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    # 스크레이프한 프로세스도 파일 값을 쓰므로, 어느 프로세스가 응답해도 카운터가 줄어들지 않음
+    flush_metrics()
+    snapshots = {metric.name: [] for metric in metrics}
+    for pid, data in process_files.read_process_files("metrics"):
+        alive = process_files.pid_alive(pid)
+        for metric in metrics:
+            if metric.name in data and (alive or metric.type_name != "gauge"):
+                snapshots[metric.name].append(data[metric.name])
+    return "\n".join(metric.render(metric.merge(snapshots[metric.name])) for metric in metrics) + "\n"
+
+
+class _MetricsFlusher:
+    """METRICS_FLUSH_INTERVAL 초마다 현재 프로세스 값을 공유 디렉터리에 쓰는 스레드"""
+
+    def __init__(self, interval: float = METRICS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._flush()
+
+    def _flush(self):
+        try:
+            flush_metrics()
+        except Exception as e:
+            logger.warning(f"Failed to flush metrics: {e}")
+
+    def start(self):
+        self._flush()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._flush()
+
+
+_flusher = None
+
+
+def start_metrics_flusher():
+    """startup 이벤트에서 호출 (METRICS_MULTIPROC_DIR 미지정 시 아무 것도 하지 않음)"""
+    global _flusher
+    if not process_files.enabled() or _flusher is not None:
+        return
+    _flusher = _MetricsFlusher()
+    _flusher.start()
+    logger.info(f"Sharing metrics in {process_files.METRICS_MULTIPROC_DIR} every {METRICS_FLUSH_INTERVAL}s")
+
+
+def stop_metrics_flusher():
+    global _flusher
+    if _flusher is not None:
+        _flusher.stop()
+        _flusher = None
+
+
+# ==================== 메트릭 정의 ====================
+
+HTTP_REQUESTS = Counter(
+    "worker_api_http_requests_total",
+    "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "worker_api_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route"),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "worker_api_http_requests_in_flight",
+    "HTTP requests currently being processed",
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "worker_api_db_queries_per_request",
+    "SQL statements executed per HTTP request",
+    ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_POOL_CHECKOUTS = Counter(
+    "worker_api_db_pool_checkouts_total",
+    "Connections checked out from the SQLAlchemy pool",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "worker_api_db_pool_checked_out",
+    "Connections currently checked out from the SQLAlchemy pool",
+)
+DB_POOL_WAIT = Histogram(
+    "worker_api_db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+INSTALLER_RENDER = Histogram(
+    "worker_api_installer_render_seconds",
+    "Installer script render time by generator",
+    ("generator",),
+)
+INSTALLER_OUTPUT = Histogram(
+    "worker_api_installer_output_bytes",
+    "Installer script size by generator",
+    ("generator",),
+    buckets=SIZE_BUCKETS,
+)
+QR_RENDER = Histogram(
+    "worker_api_qr_render_seconds",
+    "QR code PNG render time",
+)
+SLOW_QUERIES = Counter(
+    "worker_api_db_slow_queries_total",
+    "Queries slower than SLOW_QUERY_THRESHOLD",
+)
+HEAVY_QUERY_REQUESTS = Counter(
+    "worker_api_db_query_heavy_requests_total",
+    "Requests that issued more than QUERY_COUNT_WARN queries",
+    ("method", "route"),
+)
+CACHE_REQUESTS = Counter(
+    "worker_api_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ("cache", "result"),
+)
+
+
+# ==================== 요청 계측 ====================
+
+_UNMATCHED_ROUTE = "<unmatched>"
+
+
+class _RouteMetrics:
+    """라우트별 자식 메트릭 캐시"""
+    __slots__ = ("method", "path", "latency", "queries", "statuses")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.latency = HTTP_LATENCY.labels(method, path)
+        self.queries = DB_QUERIES_PER_REQUEST.labels(method, path)
+        self.statuses = {}
+
+    def count_status(self, status: int):
+        child = self.statuses.get(status)
+        if child is None:
+            child = HTTP_REQUESTS.labels(self.method, self.path, str(status))
+            self.statuses[status] = child
+        child.inc()
+
+
+# 라우트 경로 -> {method: _RouteMetrics}
+_route_metrics = {}
+
+
+def _metrics_for(method: str, route) -> _RouteMetrics:
+    path = route.path if route is not None else _UNMATCHED_ROUTE
+    by_method = _route_metrics.get(path)
+    if by_method is None:
+        by_method = _route_metrics.setdefault(path, {})
+    entry = by_method.get(method)
+    if entry is None:
+        entry = by_method.setdefault(method, _RouteMetrics(method, path))
+    return entry
+
+
+class MetricsMiddleware:
+    """라우트 템플릿 기준으로 지연시간·상태코드·쿼리 수를 기록하는 ASGI 미들웨어
+
+    라벨에는 실제 URL이 아닌 라우트 경로(/worker/status/{node_id})를 사용하므로
+    노드 수가 늘어도 시계열 수는 라우트 수로 고정됩니다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+        stats, token = query_log.start_request()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            entry = _metrics_for(scope["method"], scope.get("route"))
+            query_log.finish_request(stats, token, entry.method, entry.path)
+            entry.latency.observe(elapsed)
+            entry.queries.observe(stats.count)
+            entry.count_status(status_holder[0])
+
+
+# ==================== DB 계측 ====================
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKOUTS.inc()
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+class TimedQueuePool(QueuePool):
+    """커넥션을 얻기까지 기다린 시간을 기록하는 QueuePool (create_engine의 poolclass로 지정)
+
+    풀 이벤트는 커넥션을 얻은 뒤(checkout)에만 발생하고 기다리기 시작할 때는 없으므로,
+    Engine이 커넥션을 얻을 때 부르는 공개 메서드 Pool.connect()에서 잽니다 (새 커넥션 생성, pool_pre_ping 포함).
+    engine.dispose()가 만드는 새 풀도 같은 클래스(recreate)이므로 계측이 유지됩니다.
+    """
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_WAIT.observe(perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """엔진에 풀 체크아웃 계측을 연결 (대기시간은 TimedQueuePool, 요청당 쿼리 수는 query_log에서 집계)
+
+    엔진에 건 풀 이벤트는 dispose() 후 새 풀에도 적용됩니다.
+    """
+    event.listen(engine, "checkout", _on_checkout)
+    event.listen(engine, "checkin", _on_checkin)
+
+
+# ==================== 생성기 / 캐시 계측 ====================
+
+def _utf8_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+
+
+def track_render(generator: str):
+    """설치 스크립트 생성 함수의 소요시간과 결과 크기를 기록하는 데코레이터"""
+    render_child = INSTALLER_RENDER.labels(generator)
+    output_child = INSTALLER_OUTPUT.labels(generator)
+
+    def decorator(func):
+        if isgeneratorfunction(func):
+            # 조각 단위 생성기: 끝까지 소비됐을 때 생성기 안에서 보낸 시간의 합과 크기 기록
+            # (yield 이후 소비자가 조각을 전송하는 시간은 제외)
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                pieces = func(*args, **kwargs)
+                elapsed = 0.0
+                size = 0
+                while True:
+                    start = perf_counter()
+                    try:
+                        piece = next(pieces)
+                    except StopIteration:
+                        elapsed += perf_counter() - start
+                        break
+                    elapsed += perf_counter() - start
+                    size += _utf8_length(piece) if isinstance(piece, str) else len(piece)
+                    yield piece
+                render_child.observe(elapsed)
+                output_child.observe(size)
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = func(*args, **kwargs)
+            render_child.observe(perf_counter() - start)
+            if isinstance(result, str):
+                output_child.observe(_utf8_length(result))
+            elif isinstance(result, (bytes, bytearray)):
+                output_child.observe(len(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    """캐시 조회 결과 기록 (hit ratio = hit / (hit + miss)), 여러 건을 한 번에 조회했으면 count"""
+    if count:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus 스크레이프 엔드포인트"""
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
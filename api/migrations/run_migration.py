@@ -12,7 +12,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from database import engine
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 
 def run_migration():
     """마이그레이션 실행"""
@@ -22,14 +22,16 @@ def run_migration():
     print("=" * 60)
     print("Database Migration: Remove vpn_ip UNIQUE constraint")
     print("=" * 60)
+    print(f"Database: {engine.dialect.name}")
     print()
 
     # SQL 파일 읽기
     with open(migration_file, 'r', encoding='utf-8') as f:
         sql_content = f.read()
 
-    # SQL 명령어 분리 (세미콜론 기준)
-    sql_commands = [cmd.strip() for cmd in sql_content.split(';') if cmd.strip() and not cmd.strip().startswith('--')]
+    # 주석 줄 제거 후 SQL 명령어 분리 (세미콜론 기준)
+    sql_content = "\n".join(line for line in sql_content.splitlines() if not line.strip().startswith('--'))
+    sql_commands = [cmd.strip() for cmd in sql_content.split(';') if cmd.strip()]
 
     try:
         with engine.connect() as conn:
@@ -41,22 +43,19 @@ def run_migration():
                     print(f"[{i}/{len(sql_commands)}] Executing:")
                     print(f"  {cmd[:80]}..." if len(cmd) > 80 else f"  {cmd}")
 
-                    result = conn.execute(text(cmd))
+                    conn.execute(text(cmd))
                     conn.commit()
-
-                    # SELECT 결과 출력
-                    if cmd.strip().upper().startswith('SELECT'):
-                        rows = result.fetchall()
-                        if rows:
-                            print("  Result:")
-                            for row in rows:
-                                print(f"    {row}")
-                        else:
-                            print("  (no results)")
-                    else:
-                        print("  ✓ Success")
+                    print("  ✓ Success")
                     print()
 
+        # 확인 (pg_indexes / sqlite_master 대신 DB 종류와 무관한 inspector 사용)
+        index = next((idx for idx in inspect(engine).get_indexes('nodes') if idx['name'] == 'ix_nodes_vpn_ip'), None)
+        print("Verifying index:")
+        print(f"  {index}" if index else "  (no results)")
+        if index is None or index.get('unique', False):
+            raise RuntimeError("ix_nodes_vpn_ip is missing or still UNIQUE")
+        print()
+
         print("=" * 60)
         print("✅ Migration completed successfully!")
         print("=" * 60)
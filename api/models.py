@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Text, Boolean, Integer
+from sqlalchemy import Column, String, DateTime, Text, Boolean, Integer, Index
 from sqlalchemy.sql import func
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional
 
@@ -10,6 +10,8 @@ from database import Base
 class Node(Base):
     """노드 정보 DB 모델"""
     __tablename__ = "nodes"
+    # flush 시 created_at/updated_at 서버 값을 바로 읽어옴 (노드 캐시 write-through용)
+    __mapper_args__ = {"eager_defaults": True}
 
     node_id = Column(String, primary_key=True, index=True)
     node_type = Column(String)  # central, worker
@@ -36,6 +38,87 @@ class QRToken(Base):
     expires_at = Column(DateTime(timezone=True), nullable=False)
     used = Column(Boolean, default=False)
 
+class AppSetting(Base):
+    """프로세스 간 공유 설정 (환경변수 기본값을 덮어씀)"""
+    __tablename__ = "app_settings"
+
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class Job(Base):
+    """백그라운드 작업 큐 (jobs.py)"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False, index=True)
+    payload = Column(Text)  # JSON
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime(timezone=True), nullable=False)  # 이 시각 이후 실행 (재시도 백오프)
+    locked_by = Column(String)  # 실행 중인 프로세스 (host:pid)
+    locked_at = Column(DateTime(timezone=True))
+    result = Column(Text)  # JSON
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    # 작업 가져오기(claim) 쿼리용
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+class SchedulerLease(Base):
+    """주기 작업별 리더 프로세스 기록 (scheduler.py)"""
+    __tablename__ = "scheduler_leases"
+
+    task = Column(String, primary_key=True)
+    owner = Column(String)  # 리더 프로세스 (host:pid)
+    acquired_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    last_run_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+
+class IdempotencyKey(Base):
+    """Idempotency-Key 헤더로 보낸 POST 요청의 저장된 응답 (idempotency.py, 재시도 시 그대로 재생)"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    request = Column(String, nullable=False)  # "POST /api/worker/setup sha256=..." (다른 요청에 같은 키 재사용 방지)
+    status_code = Column(Integer, nullable=False)  # 0이면 아직 처리 중
+    content_type = Column(String)
+    body = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class NodeChange(Base):
+    """노드 변경 기록 (node_changes.py 변경 피드, 삭제는 op="delete" tombstone)"""
+    __tablename__ = "node_changes"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)  # 단조 증가 변경 번호 (커서)
+    node_id = Column(String, nullable=False, index=True)
+    op = Column(String, nullable=False)  # upsert, delete
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class WebhookOutbox(Base):
+    """웹훅 전송 대기열 (webhooks.py, 엔드포인트마다 한 줄)"""
+    __tablename__ = "webhook_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    endpoint = Column(String, nullable=False)
+    event = Column(String, nullable=False)  # node.registered, node.installed, node.deleted ...
+    node_id = Column(String)
+    payload = Column(Text)  # JSON
+    status = Column(String, nullable=False, default="pending")  # pending, sending, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    locked_by = Column(String)
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    delivered_at = Column(DateTime(timezone=True))
+
+    # 전송할 이벤트 가져오기 쿼리용
+    __table_args__ = (Index("ix_webhook_outbox_status_next", "status", "next_attempt_at"),)
+
 # Pydantic 모델
 class NodeCreate(BaseModel):
     """노드 생성 요청 모델"""
@@ -46,36 +129,35 @@ class NodeCreate(BaseModel):
     description: Optional[str] = Field(None, description="워커노드 설명")
     central_server_url: Optional[str] = Field(None, description="중앙서버 공개 URL")
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "node_id": "NODE-20250710-865",
-                "node_type": "worker",
-                "hostname": "worker01.example.com",
-                "public_ip": "203.0.113.1",
-                "description": "2080-test",
-                "central_server_url": "http://192.168.0.88:8000"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "node_id": "NODE-20250710-865",
+            "node_type": "worker",
+            "hostname": "worker01.example.com",
+            "public_ip": "203.0.113.1",
+            "description": "2080-test",
+            "central_server_url": "http://192.168.0.88:8000"
         }
+    })
 
 class NodeResponse(BaseModel):
     """노드 등록 응답 모델"""
     node_id: str
-    lan_ip: Optional[str] = None  # 워커의 LAN IP
+    # 워커의 LAN IP (Node에서 만들 때는 vpn_ip 컬럼 값)
+    lan_ip: Optional[str] = Field(None, validation_alias=AliasChoices("lan_ip", "vpn_ip"))
     status: str
     description: Optional[str] = None
     central_server_url: Optional[str] = None
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "node_id": "worker-node-1",
-                "lan_ip": "192.168.0.100",
-                "status": "registered",
-                "description": "Worker Node 1",
-                "central_server_url": "http://192.168.0.88:8000"
-            }
+    model_config = ConfigDict(from_attributes=True, json_schema_extra={
+        "example": {
+            "node_id": "worker-node-1",
+            "lan_ip": "192.168.0.100",
+            "status": "registered",
+            "description": "Worker Node 1",
+            "central_server_url": "http://192.168.0.88:8000"
         }
+    })
 
 class NodeStatus(BaseModel):
     """노드 상태 정보 모델"""
@@ -89,17 +171,16 @@ class NodeStatus(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime]
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "node_id": "worker-node-1",
-                "node_type": "worker",
-                "hostname": "worker01.example.com",
-                "public_ip": "203.0.113.1",
-                "lan_ip": "192.168.0.100",
-                "status": "registered",
-                "description": "Worker Node 1",
-                "created_at": "2024-01-01T10:00:00Z",
-                "updated_at": "2024-01-01T12:00:00Z"
-            }
-        }
\ No newline at end of file
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "node_id": "worker-node-1",
+            "node_type": "worker",
+            "hostname": "worker01.example.com",
+            "public_ip": "203.0.113.1",
+            "lan_ip": "192.168.0.100",
+            "status": "registered",
+            "description": "Worker Node 1",
+            "created_at": "2024-01-01T10:00:00Z",
+            "updated_at": "2024-01-01T12:00:00Z"
+        }
+    })
\ No newline at end of file
@@ -0,0 +1,383 @@
+"""
+Node Bulk Operations
+조건에 맞는 노드를 한 번에 처리하는 API
+
+- DELETE /nodes 는 필터(상태, node_id 패턴, 마지막 갱신 시각, 노드 타입)에 맞는 노드와
+  그 노드들의 QR 토큰을 한 트랜잭션에서 집합 단위 DELETE로 지웁니다.
+- ORM flush를 거치지 않으므로 변경 피드 tombstone, 웹훅 node.deleted 이벤트, 노드 캐시 무효화는
+  같은 트랜잭션에서 직접 기록하고, 커밋 후 미리 생성한 설치 파일을 지웁니다.
+- POST /nodes/refresh-configs 는 워커 노드들의 central_server_url과 docker_env_vars의 중앙서버 주소를
+  현재 설정(CENTRAL_SERVER_URL)으로 다시 쓰는 백그라운드 작업(refresh_node_configs)을 추가합니다.
+  중앙서버 주소 설정을 바꾸면 자동으로 추가됩니다. NODE_CONFIG_CHUNK 개씩 node_id 순서로 나눠
+  청크마다 짧은 트랜잭션에서 한 번의 UPDATE로 쓰므로 테이블 전체를 오래 잠그지 않고,
+  진행 상황은 GET /jobs/{id}의 result에 보입니다.
+- GET /nodes/export 는 노드 테이블 전체(또는 필터 결과)를 NDJSON/CSV로 스트리밍합니다.
+  서버 측 커서로 NODE_EXPORT_BATCH 행씩 읽어 바로 내보내므로 노드 수와 관계없이 메모리 사용이 일정합니다.
+"""
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+from urllib.parse import urlparse
+import csv
+import io
+import json
+import os
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from auth import verify_token
+from artifacts import invalidate_artifacts, invalidate_owners
+from database import SessionLocal, begin_write
+from jobs import enqueue, job_handler, job_to_dict, report_progress
+from models import Job, Node, QRToken
+from node_cache import invalidate_nodes
+from node_changes import record_node_changes
+from replicas import open_read_session
+from serialization import dumps
+from settings import get_setting
+from webhooks import emit_event, NODE_DELETED
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+NODE_CONFIG_CHUNK = int(os.getenv('NODE_CONFIG_CHUNK', '500'))
+
+NODE_EXPORT_BATCH = int(os.getenv('NODE_EXPORT_BATCH', '1000'))
+
+# SQLite 바인드 변수 수 제한 (IN 목록을 나눠서 실행)
+_SQLITE_IN_CHUNK = 900
+
+REFRESH_CONFIGS_JOB = "refresh_node_configs"
+_FAILED_IDS_KEPT = 100
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _glob_to_like(pattern: str) -> str:
+    """* / ? 글롭을 LIKE 패턴으로 변환 (%, _ 는 문자 그대로)"""
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+def node_filters(
+    node_ids: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    name: Optional[str] = None,
+    stale_since: Optional[datetime] = None,
+    node_type: Optional[str] = None,
+) -> list:
+    """노드 선택 조건 목록 (조건끼리는 AND, 같은 조건의 여러 값은 OR)"""
+    filters = []
+    if node_ids:
+        filters.append(Node.node_id.in_(node_ids))
+    if status:
+        filters.append(Node.status.in_(status))
+    if name:
+        filters.append(Node.node_id.like(_glob_to_like(name), escape="\\"))
+    if stale_since is not None:
+        if stale_since.tzinfo is None:
+            stale_since = stale_since.replace(tzinfo=timezone.utc)
+        # 한 번도 갱신되지 않은 노드는 생성 시각 기준
+        filters.append(func.coalesce(Node.updated_at, Node.created_at) < stale_since)
+    if node_type:
+        filters.append(Node.node_type == node_type)
+    return filters
+
+
+def _id_batches(db: Session, node_ids: List[str]) -> list:
+    """IN 조건에 넣을 node_id 묶음 (PostgreSQL은 한 번에, SQLite는 변수 수 제한 때문에 나눔)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return [node_ids]
+    return [node_ids[start:start + _SQLITE_IN_CHUNK] for start in range(0, len(node_ids), _SQLITE_IN_CHUNK)]
+
+
+def delete_nodes(db: Session, filters: list, dry_run: bool = False) -> dict:
+    """조건에 맞는 노드와 QR 토큰 삭제 (commit은 호출자가 수행)"""
+    # 대상 행을 잠그고 잠근 node_id로만 삭제 (SQLite는 BEGIN IMMEDIATE)
+    # 조건을 다시 쓰면 READ COMMITTED에서 SELECT 뒤 커밋된 행까지 지워져 tombstone/웹훅/캐시 무효화가 빠짐
+    begin_write(db)
+    rows = db.execute(
+        select(Node.node_id, Node.node_type).where(*filters).order_by(Node.node_id).with_for_update()
+    ).all()
+    node_ids = [row.node_id for row in rows]
+    if dry_run or not node_ids:
+        return {"deleted": 0 if dry_run else len(node_ids), "matched": len(node_ids),
+                "tokens_deleted": 0, "node_ids": node_ids, "dry_run": dry_run}
+
+    tokens_deleted = deleted = 0
+    for batch in _id_batches(db, node_ids):
+        tokens_deleted += db.execute(
+            delete(QRToken).where(QRToken.node_id.in_(batch)).execution_options(synchronize_session=False)
+        ).rowcount
+        deleted += db.execute(
+            delete(Node).where(Node.node_id.in_(batch)).execution_options(synchronize_session=False)
+        ).rowcount
+
+    # flush 이벤트를 거치지 않으므로 직접 기록
+    record_node_changes(db, [(node_id, "delete") for node_id in node_ids])
+    invalidate_nodes(db, node_ids)
+    for row in rows:
+        emit_event(db, NODE_DELETED, row.node_id, {"node_id": row.node_id, "node_type": row.node_type})
+
+    return {"deleted": deleted, "matched": len(node_ids), "tokens_deleted": tokens_deleted,
+            "node_ids": node_ids, "dry_run": False}
+
+
+# ==================== 내보내기 ====================
+
+_EXPORT_COLUMNS = tuple(column.key for column in Node.__table__.columns)
+
+# 응답 쓰기 횟수를 줄이기 위해 이 크기 이상 모아서 내보냄
+_EXPORT_FLUSH_BYTES = 64 * 1024
+
+
+def _export_rows(db: Session, filters: list) -> Iterator:
+    """node_id 순서로 서버 측 커서에서 NODE_EXPORT_BATCH 행씩 읽음 (끝나면 세션을 닫음)"""
+    try:
+        stmt = (
+            select(*(getattr(Node, key) for key in _EXPORT_COLUMNS))
+            .where(*filters)
+            .order_by(Node.node_id)
+            .execution_options(yield_per=NODE_EXPORT_BATCH)
+        )
+        for partition in db.execute(stmt).partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _iter_ndjson(db: Session, filters: list) -> Iterator[bytes]:
+    buffer = bytearray()
+    for partition in _export_rows(db, filters):
+        for row in partition:
+            buffer += dumps(dict(zip(_EXPORT_COLUMNS, row)))
+            buffer += b"\n"
+        if len(buffer) >= _EXPORT_FLUSH_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _iter_csv(db: Session, filters: list) -> Iterator[bytes]:
+    text_buffer = io.StringIO()
+    writer = csv.writer(text_buffer)
+    writer.writerow(_EXPORT_COLUMNS)
+    for partition in _export_rows(db, filters):
+        writer.writerows([_csv_value(value) for value in row] for row in partition)
+        if text_buffer.tell() >= _EXPORT_FLUSH_BYTES:
+            yield text_buffer.getvalue().encode("utf-8")
+            text_buffer.seek(0)
+            text_buffer.truncate()
+    if text_buffer.tell():
+        yield text_buffer.getvalue().encode("utf-8")
+
+
+@router.get("/nodes/export")
+def export_nodes(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson / csv"),
+    status: Optional[List[str]] = Query(None, description="노드 상태 (여러 번 지정 가능)"),
+    name: Optional[str] = Query(None, description="node_id 글롭 패턴 (예: auto-node-*)"),
+    node_type: Optional[str] = Query(None, description="central / worker"),
+    token: str = Depends(verify_token)
+):
+    """노드 목록 전체 내보내기 (NDJSON 또는 CSV 스트리밍, 모든 컬럼, node_id 순서)
+
+    조회 전용이므로 읽기 레플리카를 사용할 수 있습니다.
+    """
+    filters = node_filters(status=status, name=name, node_type=node_type)
+    # 응답을 보내는 동안 계속 읽으므로 의존성 세션이 아닌 별도 세션 (스트림이 끝나면 닫힘)
+    db = open_read_session(request)
+    if format == "csv":
+        body, media_type = _iter_csv(db, filters), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _iter_ndjson(db, filters), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="nodes.{format}"'},
+    )
+
+
+@router.delete("/nodes")
+def bulk_delete_nodes(
+    node_id: Optional[List[str]] = Query(None, description="삭제할 node_id (여러 번 지정 가능)"),
+    status: Optional[List[str]] = Query(None, description="노드 상태 (여러 번 지정 가능)"),
+    name: Optional[str] = Query(None, description="node_id 글롭 패턴 (예: auto-node-*)"),
+    stale_since: Optional[datetime] = Query(None, description="이 시각 이후 갱신되지 않은 노드"),
+    node_type: Optional[str] = Query(None, description="central / worker"),
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_token)
+):
+    """조건에 맞는 노드 일괄 삭제 (QR 토큰 포함, 한 트랜잭션)
+
+    조건이 하나도 없으면 400을 반환합니다 (전체 삭제 방지).
+    dry_run=true면 삭제하지 않고 대상 노드만 반환합니다.
+    """
+    filters = node_filters(node_id, status, name, stale_since, node_type)
+    if not filters:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+
+    try:
+        result = delete_nodes(db, filters, dry_run)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Bulk node delete failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not dry_run:
+        for deleted_id in result["node_ids"]:
+            invalidate_artifacts(deleted_id)
+        logger.info(f"Deleted {result['deleted']} nodes and {result['tokens_deleted']} QR tokens")
+    return result
+
+
+# ==================== 중앙서버 주소 일괄 갱신 ====================
+
+def _rewrite_env_vars(raw: Optional[str], central_url: str, central_ip: str) -> str:
+    """docker_env_vars JSON의 중앙서버 주소 키를 새 값으로 교체 (JSON 객체가 아니면 ValueError)
+
+    등록 메타데이터(central_server_url/ip)와 설치 후 Docker 환경변수(CENTRAL_SERVER_URL) 두 형식 모두 처리합니다.
+    """
+    env = json.loads(raw) if raw else {}
+    if not isinstance(env, dict):
+        raise ValueError("docker_env_vars is not a JSON object")
+    if "CENTRAL_SERVER_URL" in env or "CENTRAL_SERVER_IP" in env:
+        env["CENTRAL_SERVER_URL"] = central_url
+        if "CENTRAL_SERVER_IP" in env:
+            env["CENTRAL_SERVER_IP"] = central_ip
+    else:
+        env["central_server_url"] = central_url
+        env["central_server_ip"] = central_ip
+    return json.dumps(env)
+
+
+def _refresh_chunk(after: str, central_url: str, central_ip: str, force: bool) -> tuple:
+    """node_id가 after보다 큰 대상 노드 한 청크 갱신 (자체 트랜잭션), (마지막 node_id, 갱신 ID 목록, 실패 ID 목록)"""
+    filters = [func.coalesce(Node.node_type, "worker") == "worker", Node.node_id > after]
+    if not force:
+        filters.append(or_(Node.central_server_url.is_(None), Node.central_server_url != central_url))
+
+    db = SessionLocal()
+    try:
+        # 청크의 행만 잠그고 읽은 값 그대로 다시 씀 (SQLite는 BEGIN IMMEDIATE)
+        begin_write(db)
+        rows = db.execute(
+            select(Node.node_id, Node.docker_env_vars)
+            .where(*filters).order_by(Node.node_id).limit(NODE_CONFIG_CHUNK).with_for_update()
+        ).all()
+        if not rows:
+            return None, [], []
+
+        now = datetime.now(timezone.utc)
+        params, failed = [], []
+        for row in rows:
+            try:
+                env_vars = _rewrite_env_vars(row.docker_env_vars, central_url, central_ip)
+            except ValueError as e:
+                logger.warning(f"Skipping config refresh for node {row.node_id}: {e}")
+                failed.append(row.node_id)
+                continue
+            params.append({"node_id": row.node_id, "central_server_url": central_url,
+                           "docker_env_vars": env_vars, "updated_at": now})
+
+        updated = [param["node_id"] for param in params]
+        if params:
+            # 기본 키 기준 ORM bulk UPDATE (executemany 한 번)
+            db.execute(update(Node), params)
+            record_node_changes(db, [(node_id, "upsert") for node_id in updated])
+            invalidate_nodes(db, updated)
+        db.commit()
+        return rows[-1].node_id, updated, failed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@job_handler(REFRESH_CONFIGS_JOB)
+def refresh_node_configs(db: Session, payload: dict) -> dict:
+    """워커 노드들의 중앙서버 주소를 payload["central_server_url"](없으면 현재 설정)로 갱신
+
+    force가 아니면 이미 같은 주소인 노드는 건너뜁니다. 중간에 실패해 재시도되면
+    이미 갱신한 노드는 대상에서 빠지므로 남은 노드부터 이어서 처리합니다.
+    """
+    central_url = payload.get("central_server_url") or get_setting("CENTRAL_SERVER_URL")
+    central_ip = urlparse(central_url).hostname or central_url
+    force = bool(payload.get("force"))
+
+    total_filters = [func.coalesce(Node.node_type, "worker") == "worker"]
+    if not force:
+        total_filters.append(or_(Node.central_server_url.is_(None), Node.central_server_url != central_url))
+    total = db.execute(select(func.count()).select_from(Node).where(*total_filters)).scalar()
+    db.commit()
+
+    progress = {"central_server_url": central_url, "total": total, "updated": 0, "failed": 0,
+                "artifacts_removed": 0, "failed_node_ids": []}
+    report_progress(progress)
+    after = ""
+    while True:
+        after, updated, failed = _refresh_chunk(after, central_url, central_ip, force)
+        if after is None:
+            break
+        # 커밋된 노드의 설치 파일 정리 (다음 다운로드에서 새 주소로 다시 생성)
+        progress["artifacts_removed"] += invalidate_owners(updated)
+        progress["updated"] += len(updated)
+        progress["failed"] += len(failed)
+        # 응답이 너무 커지지 않도록 실패 노드 ID는 일부만 보관
+        progress["failed_node_ids"].extend(failed[:max(0, _FAILED_IDS_KEPT - len(progress["failed_node_ids"]))])
+        report_progress(progress)
+
+    logger.info(f"Refreshed configs of {progress['updated']}/{total} nodes to {central_url} "
+                f"({progress['failed']} failed)")
+    return progress
+
+
+def enqueue_config_refresh(db: Session, central_server_url: str, force: bool = False) -> Job:
+    """같은 조건의 갱신 작업이 대기/실행 중이면 그 작업을, 아니면 새 작업을 반환 (commit은 호출자가 수행)"""
+    payload = {"central_server_url": central_server_url, "force": force}
+    pending = (
+        db.query(Job)
+        .filter(Job.kind == REFRESH_CONFIGS_JOB, Job.status.in_(("queued", "running")),
+                Job.payload == json.dumps(payload))
+        .order_by(Job.id.desc())
+        .first()
+    )
+    return pending or enqueue(db, REFRESH_CONFIGS_JOB, payload)
+
+
+@router.post("/nodes/refresh-configs")
+def refresh_configs(
+    central_server_url: Optional[str] = Query(None, description="새 중앙서버 URL (기본: 현재 CENTRAL_SERVER_URL 설정)"),
+    force: bool = Query(False, description="이미 같은 주소인 노드도 다시 씀"),
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_token)
+):
+    """워커 노드 설정(중앙서버 주소) 일괄 갱신 작업 추가
+
+    작업 정보를 바로 반환합니다. 진행 상황/결과는 GET /jobs/{id}?wait=30 으로 확인합니다.
+    """
+    central_server_url = central_server_url or get_setting("CENTRAL_SERVER_URL")
+    if urlparse(central_server_url).scheme not in ("http", "https"):
+        raise HTTPException(status_code=400, detail="central_server_url must be an http(s) URL")
+    job = enqueue_config_refresh(db, central_server_url, force)
+    db.commit()
+    return job_to_dict(job)
@@ -0,0 +1,347 @@
+"""
+Node Cache
+프로세스 안의 노드 스냅샷 LRU 캐시 (PostgreSQL NOTIFY로 프로세스 간 무효화)
+
+- get_node()는 캐시에 있으면 DB를 거치지 않고 스냅샷을 돌려주고, 없으면 조회 후 캐시에 넣습니다.
+  get_nodes()는 여러 노드를 같은 방식으로 조회하되, 캐시에 없는 노드들은 쿼리 한 번으로 읽습니다.
+- Node를 추가/수정/삭제한 트랜잭션이 커밋되면 이 프로세스의 캐시는 바로 새 값으로 바뀌고(write-through),
+  같은 트랜잭션에서 보낸 NOTIFY로 다른 프로세스/레플리카의 캐시 항목이 지워집니다.
+  NOTIFY는 커밋될 때만 전달되므로 롤백된 변경은 알리지 않습니다.
+- LISTEN 커넥션이 끊겨 있는 동안에는 알림을 놓칠 수 있으므로 캐시를 비우고 쓰지 않습니다.
+- 조회 도중 무효화가 일어나면 읽은 값을 캐시에 넣지 않아 오래된 값이 남지 않습니다.
+- NODE_CACHE_TTL 초가 지난 항목은 다시 읽습니다 (알림 유실 대비, 0이면 만료 없음).
+  PostgreSQL이 아니면(SQLite) 알림이 없으므로 기본 5초입니다.
+
+스냅샷은 읽기 전용입니다. 노드를 수정할 때는 세션에서 Node를 직접 조회합니다.
+"""
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import select
+import threading
+import logging
+
+from sqlalchemy import String, any_, bindparam, event, inspect, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+from jobs import WORKER_ID
+from metrics import Gauge, record_cache
+from models import Node
+
+logger = logging.getLogger(__name__)
+
+NODE_CACHE_ENABLED = os.getenv('NODE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+NODE_CACHE_SIZE = int(os.getenv('NODE_CACHE_SIZE', '10000'))
+# PostgreSQL이 아니면 다른 프로세스의 변경을 알 수 없으므로 짧게 유지
+NODE_CACHE_TTL = float(os.getenv('NODE_CACHE_TTL', '300' if engine.dialect.name == "postgresql" else '5'))
+
+NOTIFY_CHANNEL = "node_cache"
+# SQLite 바인드 변수 수 제한 아래로 IN 목록을 나눔
+_SQLITE_IN_CHUNK = 900
+# NOTIFY payload 최대 8000바이트 - 여러 노드면 나눠서 보냄
+_NOTIFY_MAX_PAYLOAD = 7000
+
+NODE_CACHE_ENTRIES = Gauge(
+    "worker_api_node_cache_entries",
+    "Node snapshots held in this process's cache",
+)
+
+_NODE_COLUMNS = tuple(column.key for column in Node.__table__.columns)
+
+
+class NodeSnapshot:
+    """Node 행의 읽기 전용 사본 (세션과 무관하게 어디서나 속성 접근 가능)"""
+
+    __slots__ = _NODE_COLUMNS
+
+    def __init__(self, node: Node):
+        for key in _NODE_COLUMNS:
+            setattr(self, key, getattr(node, key))
+
+    def __repr__(self):
+        return f"<NodeSnapshot {self.node_id} status={self.status}>"
+
+
+class NodeCache:
+    """크기 제한 LRU (node_id -> (스냅샷, 저장 시각))"""
+
+    def __init__(self, maxsize: int = NODE_CACHE_SIZE, ttl: float = NODE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # 다른 프로세스 알림을 받을 수 있는 상태일 때만 사용 (PostgreSQL이 아니면 항상 사용)
+        self.enabled = NODE_CACHE_ENABLED and engine.dialect.name != "postgresql"
+        # 무효화가 일어날 때마다 증가 (조회 중 무효화된 값을 넣지 않기 위해)
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, node_id: str) -> Optional[NodeSnapshot]:
+        with self._lock:
+            entry = self._entries.get(node_id)
+            if entry is None:
+                return None
+            if self.ttl and monotonic() - entry[1] > self.ttl:
+                del self._entries[node_id]
+                return None
+            self._entries.move_to_end(node_id)
+            return entry[0]
+
+    def put(self, snapshot: NodeSnapshot, generation: Optional[int] = None):
+        """저장 (generation이 주어졌는데 그 사이 무효화가 있었으면 저장하지 않음)"""
+        with self._lock:
+            if not self.enabled or (generation is not None and generation != self.generation):
+                return
+            self._store(snapshot)
+            NODE_CACHE_ENTRIES.set(len(self._entries))
+
+    def _store(self, snapshot: NodeSnapshot):
+        self._entries[snapshot.node_id] = (snapshot, monotonic())
+        self._entries.move_to_end(snapshot.node_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def apply_writes(self, drop: Iterable[str], snapshots: Iterable[Tuple[NodeSnapshot, int]]):
+        """커밋된 변경 반영: drop과 스냅샷의 노드를 무효화하고, 스냅샷은 flush 이후
+        (다른 프로세스 알림 등으로) 무효화가 없었을 때만 다시 저장"""
+        with self._lock:
+            current = self.generation
+            self.generation += 1
+            for node_id in drop:
+                self._entries.pop(node_id, None)
+            for snapshot, generation in snapshots:
+                self._entries.pop(snapshot.node_id, None)
+                if self.enabled and generation == current:
+                    self._store(snapshot)
+            NODE_CACHE_ENTRIES.set(len(self._entries))
+
+    def invalidate(self, node_ids: Iterable[str]):
+        with self._lock:
+            self.generation += 1
+            for node_id in node_ids:
+                self._entries.pop(node_id, None)
+            NODE_CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            NODE_CACHE_ENTRIES.set(0)
+
+
+node_cache = NodeCache()
+
+
+def get_node(node_id: str, db: Optional[Session] = None) -> Optional[NodeSnapshot]:
+    """노드 스냅샷 조회 (캐시 우선, 없으면 DB 조회 후 캐시에 저장)"""
+    snapshot = node_cache.get(node_id) if node_cache.enabled else None
+    record_cache("node", snapshot is not None)
+    if snapshot is not None:
+        return snapshot
+
+    generation = node_cache.generation
+    session = db if db is not None else SessionLocal()
+    try:
+        node = session.query(Node).filter(Node.node_id == node_id).first()
+        if node is None:
+            return None
+        snapshot = NodeSnapshot(node)
+    finally:
+        if db is None:
+            session.close()
+    node_cache.put(snapshot, generation)
+    return snapshot
+
+
+def _load_nodes(session: Session, node_ids: List[str]) -> List[Node]:
+    if session.get_bind().dialect.name == "postgresql":
+        # 배열 파라미터 하나로 조회 (ID 개수와 관계없이 같은 SQL)
+        ids = bindparam("node_ids", node_ids, type_=ARRAY(String))
+        return session.query(Node).filter(Node.node_id == any_(ids)).all()
+    nodes = []
+    for start in range(0, len(node_ids), _SQLITE_IN_CHUNK):
+        chunk = node_ids[start:start + _SQLITE_IN_CHUNK]
+        nodes.extend(session.query(Node).filter(Node.node_id.in_(chunk)).all())
+    return nodes
+
+
+def get_nodes(node_ids: Iterable[str], db: Optional[Session] = None) -> Dict[str, NodeSnapshot]:
+    """여러 노드 스냅샷 조회 (캐시에 없는 노드만 쿼리 한 번으로 읽어 캐시에 저장), 없는 노드는 결과에서 빠짐"""
+    found = {}
+    missing = []
+    for node_id in dict.fromkeys(node_ids):
+        snapshot = node_cache.get(node_id) if node_cache.enabled else None
+        if snapshot is None:
+            missing.append(node_id)
+        else:
+            found[node_id] = snapshot
+    record_cache("node", True, len(found))
+    record_cache("node", False, len(missing))
+    if not missing:
+        return found
+
+    generation = node_cache.generation
+    session = db if db is not None else SessionLocal()
+    try:
+        loaded = [NodeSnapshot(node) for node in _load_nodes(session, missing)]
+    finally:
+        if db is None:
+            session.close()
+    for snapshot in loaded:
+        node_cache.put(snapshot, generation)
+        found[snapshot.node_id] = snapshot
+    return found
+
+
+# ==================== 쓰기 반영 ====================
+
+def invalidate_nodes(db: Session, node_ids: Iterable[str]):
+    """Node ORM 이벤트를 거치지 않는 변경(bulk update/delete 등)을 커밋 시 캐시에 반영"""
+    _pending(db)["drop"].update(node_ids)
+    _notify(db, list(node_ids))
+
+
+def _pending(session: Session) -> dict:
+    return session.info.setdefault("node_cache", {"put": {}, "drop": set()})
+
+
+def _notify(session: Session, node_ids: list):
+    """같은 트랜잭션에서 NOTIFY (커밋될 때 다른 프로세스로 전달)"""
+    if not node_ids:
+        return
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return
+    chunk = []
+    size = 0
+    for node_id in node_ids:
+        if chunk and size + len(node_id) + 1 > _NOTIFY_MAX_PAYLOAD:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                               {"channel": NOTIFY_CHANNEL, "payload": f"{WORKER_ID}|" + ",".join(chunk)})
+            chunk, size = [], 0
+        chunk.append(node_id)
+        size += len(node_id) + 1
+    connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                       {"channel": NOTIFY_CHANNEL, "payload": f"{WORKER_ID}|" + ",".join(chunk)})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_node_writes(session: Session, flush_context):
+    """flush된 Node 변경을 모아 두고 NOTIFY 예약"""
+    changed = []
+    pending = None
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Node) or not (obj in session.new or session.is_modified(obj)):
+            continue
+        pending = pending or _pending(session)
+        changed.append(obj.node_id)
+        if inspect(obj).unloaded:
+            # onupdate/server default 값이 아직 안 읽혔으면 다음 조회에서 다시 읽음
+            pending["drop"].add(obj.node_id)
+            pending["put"].pop(obj.node_id, None)
+        else:
+            # flush 때의 세대를 함께 저장 (커밋 전에 도착한 무효화가 있으면 after_commit에서 넣지 않음)
+            pending["put"][obj.node_id] = (NodeSnapshot(obj), node_cache.generation)
+    for obj in session.deleted:
+        if isinstance(obj, Node):
+            pending = pending or _pending(session)
+            changed.append(obj.node_id)
+            pending["drop"].add(obj.node_id)
+            pending["put"].pop(obj.node_id, None)
+    if changed:
+        _notify(session, changed)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _apply_node_writes(session: Session):
+    pending = session.info.pop("node_cache", None)
+    if not pending:
+        return
+    node_cache.apply_writes(pending["drop"] - set(pending["put"]), pending["put"].values())
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_node_writes(session: Session):
+    session.info.pop("node_cache", None)
+
+
+# ==================== 프로세스 간 무효화 ====================
+
+class NodeCacheListener:
+    """LISTEN node_cache 사이드 스레드 (PostgreSQL에서만, 프로세스당 하나)"""
+
+    def __init__(self, retry_interval: float = 5.0):
+        self.retry_interval = retry_interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="node-cache-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # LISTEN 이전에 놓친 알림이 있을 수 있으므로 비우고 시작
+                node_cache.clear()
+                node_cache.enabled = True
+                logger.info(f"Node cache listening for invalidations on '{NOTIFY_CHANNEL}'")
+                self._listen(dbapi_connection)
+            except Exception as e:
+                logger.warning(f"Node cache listener disconnected, cache disabled: {e}")
+            finally:
+                node_cache.enabled = False
+                node_cache.clear()
+                if connection is not None:
+                    try:
+                        connection.invalidate()
+                    except Exception:
+                        pass
+            self._stop.wait(self.retry_interval)
+
+    def _listen(self, dbapi_connection):
+        while not self._stop.is_set():
+            if select.select([dbapi_connection], [], [], 5.0) == ([], [], []):
+                # 커넥션 확인 (끊겼으면 예외)
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                continue
+            dbapi_connection.poll()
+            node_ids = []
+            while dbapi_connection.notifies:
+                notify = dbapi_connection.notifies.pop(0)
+                sender, _, ids = notify.payload.partition("|")
+                if sender != WORKER_ID:
+                    node_ids.extend(ids.split(","))
+            if node_ids:
+                node_cache.invalidate(node_ids)
+
+
+_listener = None
+
+
+def start_node_cache():
+    """PostgreSQL이면 무효화 알림 수신 시작 (startup 이벤트에서 호출)"""
+    global _listener
+    if not NODE_CACHE_ENABLED or engine.dialect.name != "postgresql" or _listener is not None:
+        return
+    _listener = NodeCacheListener()
+    _listener.start()
+
+
+def stop_node_cache():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    node_cache.enabled = False
@@ -0,0 +1,269 @@
+"""
+Node Change Feed
+노드 변경 피드 (중앙서버/대시보드가 노드 목록 사본을 증분 동기화)
+
+- nodes 테이블이 바뀌면(추가/수정/삭제) 같은 트랜잭션에서 node_changes에 한 줄씩 기록합니다.
+  seq는 단조 증가하고, 삭제는 op="delete" tombstone으로 남습니다.
+- 변경은 트랜잭션 동안 모아 두었다가 커밋 직전(before_commit)에 기록합니다. PostgreSQL에서는 이때만
+  트랜잭션 advisory lock을 잡아 seq 순서와 커밋 순서를 맞춥니다 (늦게 커밋된 작은 seq를 커서가 건너뛰지 않도록).
+  잠금은 기록과 커밋 동안만 유지되므로 노드를 쓰는 트랜잭션 전체가 직렬화되지는 않습니다.
+- GET /nodes/changes?cursor=... 는 커서 이후 바뀐 노드만 반환하고, wait 초 동안
+  변경이 없으면 기다렸다가(롱폴링) 빈 목록과 같은 커서를 반환합니다.
+- 커서 없이 부르면 현재 전체 노드와 커서를 돌려주므로 처음 동기화에도 씁니다.
+- 주기 작업이 노드마다 마지막 기록만 남기고 압축하므로 테이블은 노드 수만큼만 커지고,
+  오래된 커서도 그대로 이어서 쓸 수 있습니다.
+"""
+from time import monotonic
+from typing import Optional
+import asyncio
+import base64
+import binascii
+import os
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from auth import verify_token
+from database import SessionLocal, advisory_lock_key
+from jobs import enqueue, job_handler
+from models import Node, NodeChange
+from scheduler import periodic_task
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+NODE_CHANGES_POLL = float(os.getenv('NODE_CHANGES_POLL', '1.0'))
+NODE_CHANGES_COMPACT_INTERVAL = float(os.getenv('NODE_CHANGES_COMPACT_INTERVAL', '3600'))
+NODE_CHANGES_WAIT_MAX = 30.0
+NODE_CHANGES_PAGE_MAX = 1000
+
+# seq 할당 순서 = 커밋 순서가 되도록 기록(커밋 직전 ~ 커밋)을 직렬화
+_CHANGE_LOCK_KEY = advisory_lock_key("worker-manager:node-changes")
+
+
+def node_to_dict(node: Node) -> dict:
+    return {
+        "node_id": node.node_id,
+        "node_type": node.node_type,
+        "hostname": node.hostname,
+        "lan_ip": node.vpn_ip,
+        "status": node.status,
+        "description": node.description,
+        "central_server_url": node.central_server_url,
+        "created_at": node.created_at,
+        "updated_at": node.updated_at,
+    }
+
+
+# ==================== 변경 기록 ====================
+
+@event.listens_for(SessionLocal, "before_flush")
+def _record_node_changes(session: Session, flush_context, instances):
+    """flush 직전 Node 추가/수정/삭제를 같은 트랜잭션의 node_changes 기록으로 남김"""
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Node):
+            changes.append((obj.node_id, "upsert"))
+    for obj in session.dirty:
+        if isinstance(obj, Node) and session.is_modified(obj, include_collections=False):
+            changes.append((obj.node_id, "upsert"))
+    for obj in session.deleted:
+        if isinstance(obj, Node):
+            changes.append((obj.node_id, "delete"))
+    if changes:
+        record_node_changes(session, changes)
+
+
+def record_node_changes(session: Session, changes: list):
+    """[(node_id, "upsert"|"delete")]를 이 트랜잭션이 커밋될 때 기록하도록 예약
+
+    ORM flush를 거치지 않는 변경(bulk update/delete)은 직접 호출합니다.
+    """
+    session.info.setdefault("node_changes", []).extend(changes)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _write_node_changes(session: Session):
+    """커밋 직전에 잠금을 잡고 모아 둔 변경 기록 (잠금은 커밋과 함께 풀림)"""
+    # 아직 flush되지 않은 Node 변경도 before_flush에서 예약되도록 먼저 flush
+    session.flush()
+    changes = session.info.get("node_changes")
+    if not changes:
+        return
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CHANGE_LOCK_KEY})
+    session.add_all(NodeChange(node_id=node_id, op=op) for node_id, op in changes)
+    session.flush()
+    changes.clear()
+    session.info["node_changes_written"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_waiters(session: Session):
+    session.info.pop("node_changes", None)
+    # 이 프로세스의 롱폴링 요청은 다음 DB 확인을 기다리지 않고 바로 응답
+    if session.info.pop("node_changes_written", False):
+        _watcher.checked_at = None
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_changes(session: Session):
+    session.info.pop("node_changes", None)
+    session.info.pop("node_changes_written", None)
+
+
+# ==================== 커서 ====================
+
+def encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(f"nc:{seq}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, seq = raw.split(":", 1)
+        if prefix != "nc":
+            raise ValueError(prefix)
+        return int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _max_seq() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.max(NodeChange.seq)).scalar() or 0
+    finally:
+        db.close()
+
+
+class _SeqWatcher:
+    """프로세스 안의 롱폴링 요청들이 최신 seq 조회를 공유
+    (기다리는 요청 수와 관계없이 NODE_CHANGES_POLL 초에 한 번만 DB 조회)"""
+
+    def __init__(self):
+        self.value = 0
+        self.checked_at = None
+        self._lock = None
+
+    async def latest(self) -> int:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.checked_at is None or monotonic() - self.checked_at >= NODE_CHANGES_POLL:
+                self.value = await run_in_threadpool(_max_seq)
+                self.checked_at = monotonic()
+        return self.value
+
+
+_watcher = _SeqWatcher()
+
+
+# ==================== 조회 ====================
+
+def _snapshot() -> dict:
+    """전체 노드 + 현재 커서 (커서를 먼저 읽으므로 그 사이 변경은 다음 조회에 다시 나옴)"""
+    db = SessionLocal()
+    try:
+        seq = db.query(func.max(NodeChange.seq)).scalar() or 0
+        nodes = db.query(Node).order_by(Node.node_id).all()
+        return {
+            "cursor": encode_cursor(seq),
+            "snapshot": True,
+            "has_more": False,
+            "changes": [{"op": "upsert", "node_id": node.node_id, "node": node_to_dict(node)} for node in nodes],
+        }
+    finally:
+        db.close()
+
+
+def _changes_since(seq: int, limit: int) -> dict:
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(NodeChange)
+            .filter(NodeChange.seq > seq)
+            .order_by(NodeChange.seq)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not rows:
+            return {"cursor": encode_cursor(seq), "snapshot": False, "has_more": False, "changes": []}
+
+        # 같은 노드의 여러 변경은 마지막 것만, 내용은 현재 노드 상태로
+        latest = {}
+        for row in rows:
+            latest.pop(row.node_id, None)
+            latest[row.node_id] = row
+        nodes = {
+            node.node_id: node
+            for node in db.query(Node).filter(Node.node_id.in_(list(latest))).all()
+        }
+
+        changes = []
+        for node_id, row in latest.items():
+            node = nodes.get(node_id)
+            if node is None:
+                # 이후에 삭제된 노드 (뒤쪽 tombstone과 같은 결과)
+                changes.append({"seq": row.seq, "op": "delete", "node_id": node_id, "node": None})
+            else:
+                changes.append({"seq": row.seq, "op": "upsert", "node_id": node_id, "node": node_to_dict(node)})
+        return {
+            "cursor": encode_cursor(rows[-1].seq),
+            "snapshot": False,
+            "has_more": has_more,
+            "changes": changes,
+        }
+    finally:
+        db.close()
+
+
+@router.get("/nodes/changes")
+async def node_changes(
+    cursor: Optional[str] = None,
+    wait: float = 0,
+    limit: int = 500,
+    token: str = Depends(verify_token)
+):
+    """커서 이후 추가/수정/삭제된 노드
+
+    cursor가 없으면 전체 노드(snapshot)와 커서를 반환합니다.
+    wait > 0 이면 변경이 생기거나 wait 초(최대 30초)가 지날 때까지 기다렸다가 응답합니다 (롱폴링).
+    has_more가 true면 반환된 커서로 바로 다시 조회합니다.
+    """
+    if not cursor:
+        return await run_in_threadpool(_snapshot)
+
+    seq = decode_cursor(cursor)
+    limit = min(max(limit, 1), NODE_CHANGES_PAGE_MAX)
+    deadline = monotonic() + min(max(wait, 0), NODE_CHANGES_WAIT_MAX)
+    while await _watcher.latest() <= seq and monotonic() < deadline:
+        await asyncio.sleep(min(0.25, NODE_CHANGES_POLL))
+    return await run_in_threadpool(_changes_since, seq, limit)
+
+
+# ==================== 압축 ====================
+
+@job_handler("compact_node_changes")
+def compact_node_changes(db: Session, payload: dict):
+    """노드마다 마지막 변경 기록만 남기고 삭제"""
+    latest = db.query(func.max(NodeChange.seq)).group_by(NodeChange.node_id)
+    deleted = (
+        db.query(NodeChange)
+        .filter(NodeChange.seq.notin_(latest.scalar_subquery()))
+        .delete(synchronize_session=False)
+    )
+    logger.info(f"Compacted {deleted} node change records")
+    return {"deleted": deleted}
+
+
+@periodic_task("node-changes-compaction", interval=NODE_CHANGES_COMPACT_INTERVAL)
+def schedule_node_changes_compaction(db: Session):
+    enqueue(db, "compact_node_changes")
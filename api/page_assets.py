@@ -0,0 +1,105 @@
+"""
+Page Assets
+HTML 페이지의 인라인 CSS/JS를 내용 해시 이름의 정적 파일로 분리하고,
+페이지와 정적 파일을 미리 gzip 압축한 바이트 + ETag로 준비하는 공용 코드
+
+웹 프레임워크에 의존하지 않으므로 API(FastAPI, static_assets.py)와
+웹 대시보드(Flask, web-dashboard/app.py)가 같은 파일을 씁니다.
+대시보드 이미지에는 이 파일만 함께 복사/마운트하므로 표준 라이브러리만 사용해야 합니다.
+
+- /static/{이름}.{해시}.css|js 는 내용이 바뀌면 이름도 바뀌므로 1년 immutable 캐시
+- 페이지는 ETag로 재검증하므로 다시 열 때는 304만 받음
+"""
+from typing import Dict, Optional, Tuple
+import gzip
+import hashlib
+import re
+
+# 해시 이름 정적 파일 캐시 기간 (1년)
+STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 페이지는 매번 ETag로 재검증 (런타임 설정 변경이 바로 반영되도록)
+PAGE_CACHE_CONTROL = "no-cache"
+# 이보다 작은 본문은 압축하지 않음
+GZIP_MIN_SIZE = 1024
+
+_STYLE_RE = re.compile(r"<style>(.*?)</style>", re.S)
+_SCRIPT_RE = re.compile(r"<script>(.*?)</script>", re.S)
+
+# text/* 는 Starlette/Flask가 charset=utf-8을 붙여줌
+MEDIA_TYPES = {
+    "css": "text/css",
+    "js": "application/javascript; charset=utf-8",
+    "html": "text/html",
+}
+
+# 파일 이름 -> CompiledBody
+_assets = {}
+
+
+class CompiledBody:
+    """미리 인코딩/압축한 응답 본문"""
+
+    __slots__ = ("body", "gzipped", "etag", "media_type")
+
+    def __init__(self, body: bytes, media_type: str, level: int = 9):
+        self.body = body
+        self.media_type = media_type
+        # mtime=0: 같은 내용이면 프로세스가 달라도 같은 바이트
+        self.gzipped = gzip.compress(body, level, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'
+
+    def negotiate(self, if_none_match: Optional[str], accept_encoding: Optional[str],
+                  headers: Optional[dict] = None) -> Tuple[int, bytes, Dict[str, str]]:
+        """(304 여부, 본문, 헤더) 결정 - ETag가 같으면 304, gzip을 받으면 미리 압축한 본문"""
+        response_headers = {"ETag": self.etag, "Vary": "Accept-Encoding"}
+        response_headers.update(headers or {})
+
+        if etag_matches(if_none_match, self.etag):
+            return 304, b"", response_headers
+
+        if self.gzipped is not None and "gzip" in (accept_encoding or ""):
+            response_headers["Content-Encoding"] = "gzip"
+            return 200, self.gzipped, response_headers
+        return 200, self.body, response_headers
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    # W/ 접두사는 프록시가 압축 후 붙일 수 있으므로 무시
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def register_asset(name: str, content: str, ext: str) -> str:
+    """정적 파일 등록 후 URL 반환 (같은 내용이면 같은 URL)"""
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+    filename = f"{name}.{digest}.{ext}"
+    if filename not in _assets:
+        _assets[filename] = CompiledBody(content.encode("utf-8"), MEDIA_TYPES[ext])
+    return f"/static/{filename}"
+
+
+def get_asset(filename: str) -> Optional[CompiledBody]:
+    return _assets.get(filename)
+
+
+def split_inline_assets(name: str, html: str) -> str:
+    """페이지의 인라인 <style>/<script> 블록을 정적 파일 링크로 교체"""
+    count = {"css": 0, "js": 0}
+
+    def replace(match, ext):
+        count[ext] += 1
+        suffix = f"-{count[ext]}" if count[ext] > 1 else ""
+        url = register_asset(f"{name}{suffix}", match.group(1), ext)
+        if ext == "css":
+            return f'<link rel="stylesheet" href="{url}">'
+        return f'<script src="{url}"></script>'
+
+    html = _STYLE_RE.sub(lambda m: replace(m, "css"), html)
+    return _SCRIPT_RE.sub(lambda m: replace(m, "js"), html)
+
+
+def compile_page(html: str, level: int = 9) -> CompiledBody:
+    """완성된 HTML을 압축/ETag가 준비된 본문으로 변환"""
+    return CompiledBody(html.encode("utf-8"), MEDIA_TYPES["html"], level=level)
@@ -0,0 +1,81 @@
+"""
+Process Files
+여러 uvicorn 워커 프로세스의 메트릭/프로파일/루프 멈춤 기록을 공유 디렉터리에 모으는 도우미
+
+METRICS_MULTIPROC_DIR을 지정하면 각 프로세스가 자기 상태를 `{kind}-{pid}.json` 파일로 쓰고,
+/metrics, /admin/profiles, /admin/loop-stalls는 모든 프로세스의 파일을 합쳐서 보여줍니다.
+디렉터리는 서버를 시작할 때마다 비워야 합니다 (Dockerfile/compose의 시작 명령에서 처리).
+지정하지 않으면 요청을 받은 프로세스의 값만 보여줍니다 (단일 프로세스, 테스트).
+"""
+from typing import Any, Iterator, Tuple
+import json
+import os
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+
+
+def enabled() -> bool:
+    return bool(METRICS_MULTIPROC_DIR)
+
+
+def pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_process_file(kind: str, data: Any):
+    """현재 프로세스의 {kind} 상태를 공유 디렉터리에 기록 (임시 파일에 쓴 뒤 교체하므로 읽는 쪽은 항상 완성된 파일을 봄)"""
+    if not enabled():
+        return
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=METRICS_MULTIPROC_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, os.path.join(METRICS_MULTIPROC_DIR, f"{kind}-{os.getpid()}.json"))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_process_files(kind: str) -> Iterator[Tuple[int, Any]]:
+    """모든 프로세스(종료된 프로세스 포함)의 {kind} 상태 (pid, data)"""
+    if not enabled() or not os.path.isdir(METRICS_MULTIPROC_DIR):
+        return
+    prefix = f"{kind}-"
+    for name in sorted(os.listdir(METRICS_MULTIPROC_DIR)):
+        if not name.startswith(prefix) or not name.endswith(".json"):
+            continue
+        try:
+            pid = int(name[len(prefix):-len(".json")])
+        except ValueError:
+            continue
+        try:
+            with open(os.path.join(METRICS_MULTIPROC_DIR, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read process file {name}: {e}")
+            continue
+        yield pid, data
+
+
+def gather_process_lists(kind: str, local: list) -> list:
+    """현재 프로세스 목록 + 다른 프로세스 파일의 목록 (항목마다 pid 추가)"""
+    pid = os.getpid()
+    items = [dict(item, pid=pid) for item in local]
+    for other, data in read_process_files(kind):
+        if other != pid:
+            items.extend(dict(item, pid=other) for item in data)
+    return items
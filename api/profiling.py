@@ -0,0 +1,247 @@
+"""
+Request Profiling
+요청 단위 샘플링 프로파일러 (collapsed stacks / top functions)
+
+- 수동 모드: 관리자 토큰과 함께 `X-Profile: 1` 헤더 또는 `?profile=1` 쿼리를 보내면
+  해당 요청을 프로파일링하고 응답 헤더 `X-Profile-Id`로 결과 ID를 돌려줍니다.
+- 자동 모드: PROFILE_AUTO_SAMPLE_RATE 비율의 요청을 프로파일링하고,
+  PROFILE_AUTO_THRESHOLD 초 이상 걸린 요청만 링 버퍼에 남깁니다.
+
+결과는 /admin/profiles 에서 조회합니다. collapsed 형식은 flamegraph.pl,
+speedscope 등에 그대로 넣을 수 있으며, 스택의 첫 항목은 스레드 이름입니다
+(이벤트 루프는 MainThread, 동기 라우트/스레드풀 작업은 AnyIO worker thread).
+METRICS_MULTIPROC_DIR을 지정하면 다른 워커 프로세스가 잡은 프로파일도 함께 조회됩니다 (ID는 "pid-번호").
+"""
+from collections import Counter, deque
+from datetime import datetime, timezone
+from time import perf_counter
+from urllib.parse import parse_qs
+import itertools
+import os
+import random
+import sys
+import threading
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+import process_files
+from auth import verify_token, is_admin_authorization
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+PROFILE_AUTO_SAMPLE_RATE = float(os.getenv('PROFILE_AUTO_SAMPLE_RATE', '0'))
+PROFILE_AUTO_THRESHOLD = float(os.getenv('PROFILE_AUTO_THRESHOLD', '1.0'))
+PROFILE_BUFFER_SIZE = int(os.getenv('PROFILE_BUFFER_SIZE', '20'))
+PROFILE_MAX_DEPTH = 128
+
+_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+_profile_ids = itertools.count(1)
+
+
+def frame_label(frame) -> str:
+    """프레임을 'function (file:firstline)' 형태로 표현"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, max_depth: int = PROFILE_MAX_DEPTH) -> str:
+    """프레임 체인을 루트부터 ';'로 연결한 collapsed stack 문자열로 변환"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+# 할 일 없이 기다리는 스레드의 마지막 프레임 (샘플에서 제외)
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+class StackSampler:
+    """모든 스레드의 스택을 주기적으로 샘플링하는 사이드 스레드
+
+    동기 핸들러, run_in_threadpool 작업, StreamingResponse의 동기 이터레이터는 이벤트 루프가 아닌
+    스레드풀 스레드에서 실행되므로 모든 스레드를 샘플링하고 스택 앞에 스레드 이름을 붙입니다.
+    대기 중인 스레드(이벤트 루프의 select, 쉬는 스레드풀 등)는 제외하며,
+    같은 시점에 진행 중인 다른 요청/백그라운드 작업의 스택도 함께 잡힐 수 있습니다.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or _is_idle(frame):
+                    continue
+                name = names.get(thread_id, f"thread-{thread_id}")
+                self.stacks[f"{name};{collapse_stack(frame)}"] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _top_functions(stacks: Counter, limit: int = 25):
+    """self(리프) / total(포함) 샘플 수 기준 상위 함수"""
+    self_counts = Counter()
+    total_counts = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for label in set(frames):
+            total_counts[label] += count
+    return [
+        {"function": label, "self": self_counts[label], "total": total}
+        for label, total in total_counts.most_common(limit)
+    ]
+
+
+def _store_profile(profile_id: str, method: str, path: str, status: int, duration: float,
+                   sampler: StackSampler, trigger: str):
+    profile = {
+        "id": profile_id,
+        "method": method,
+        "path": path,
+        "status": status,
+        "duration_ms": round(duration * 1000, 2),
+        "trigger": trigger,
+        "samples": sampler.samples,
+        "sample_interval_ms": sampler.interval * 1000,
+        "captured_at": datetime.now(timezone.utc).isoformat(),
+        "stacks": sampler.stacks,
+    }
+    with _profiles_lock:
+        _profiles.append(profile)
+        if process_files.enabled():
+            process_files.write_process_file("profiles", list(_profiles))
+    logger.info(f"Captured {trigger} profile #{profile_id} for {method} {path} "
+                f"({profile['duration_ms']}ms, {sampler.samples} samples)")
+
+
+def _all_profiles() -> list:
+    """모든 워커 프로세스의 프로파일 (최신순)"""
+    with _profiles_lock:
+        profiles = list(_profiles)
+    profiles = process_files.gather_process_lists("profiles", profiles)
+    return sorted(profiles, key=lambda profile: profile["captured_at"], reverse=True)
+
+
+def _find_profile(profile_id: str):
+    for profile in _all_profiles():
+        if profile["id"] == profile_id:
+            return profile
+    raise HTTPException(status_code=404, detail="Profile not found")
+
+
+def _wants_profile(scope) -> bool:
+    """관리자 토큰 + 프로파일 플래그가 있는 요청인지 확인"""
+    headers = dict(scope.get("headers") or [])
+    flag = headers.get(b"x-profile", b"").decode("latin-1")
+    if not flag and scope.get("query_string"):
+        flag = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [""])[0]
+    if flag not in ("1", "true", "yes"):
+        return False
+    return is_admin_authorization(headers.get(b"authorization", b"").decode("latin-1"))
+
+
+class ProfilingMiddleware:
+    """요청 단위 프로파일링 ASGI 미들웨어"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if _wants_profile(scope):
+            trigger = "manual"
+        elif PROFILE_AUTO_SAMPLE_RATE > 0 and random.random() < PROFILE_AUTO_SAMPLE_RATE:
+            trigger = "auto"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler()
+        status_holder = [500]
+        profile_id = f"{os.getpid()}-{next(_profile_ids)}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+                if trigger == "manual":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", str(profile_id).encode("latin-1"))
+                    ]
+            await send(message)
+
+        sampler.start()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = perf_counter() - start
+            sampler.stop()
+            if trigger == "manual" or duration >= PROFILE_AUTO_THRESHOLD:
+                _store_profile(profile_id, scope["method"], scope["path"], status_holder[0],
+                               duration, sampler, trigger)
+
+
+@router.get("/admin/profiles")
+async def list_profiles(token: str = Depends(verify_token)):
+    """저장된 프로파일 목록 (최신순, 모든 워커 프로세스)"""
+    profiles = _all_profiles()
+    return {
+        "auto_sample_rate": PROFILE_AUTO_SAMPLE_RATE,
+        "auto_threshold_seconds": PROFILE_AUTO_THRESHOLD,
+        "buffer_size": PROFILE_BUFFER_SIZE,
+        "profiles": [
+            {key: value for key, value in profile.items() if key != "stacks"}
+            for profile in profiles
+        ]
+    }
+
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, token: str = Depends(verify_token)):
+    """프로파일 상세 (상위 함수 포함)"""
+    profile = _find_profile(profile_id)
+    result = {key: value for key, value in profile.items() if key != "stacks"}
+    result["top_functions"] = _top_functions(Counter(profile["stacks"]))
+    return result
+
+
+@router.get("/admin/profiles/{profile_id}/collapsed")
+async def get_profile_collapsed(profile_id: str, token: str = Depends(verify_token)):
+    """collapsed stacks 텍스트 (flamegraph.pl / speedscope 입력 형식)"""
+    profile = _find_profile(profile_id)
+    lines = [f"{stack} {count}" for stack, count in Counter(profile["stacks"]).most_common()]
+    return PlainTextResponse("\n".join(lines) + "\n")
@@ -0,0 +1,229 @@
+"""
+SQL Query Log
+SQLAlchemy 커서 이벤트 기반 쿼리 계측 (느린 쿼리 로그 / N+1 감지 / 테스트용 쿼리 수 검증)
+
+- 요청마다 쿼리 지문(fingerprint)별 실행 횟수, 소요시간, 행 수를 집계합니다.
+- SLOW_QUERY_THRESHOLD 초를 넘는 쿼리는 EXPLAIN 결과와 함께 WARNING 로그를 남깁니다.
+- 한 요청에서 QUERY_COUNT_WARN 개를 넘게 실행하면 반복된 지문과 함께 경고합니다.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+import os
+import re
+import threading
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', '0.2'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+QUERY_COUNT_WARN = int(os.getenv('QUERY_COUNT_WARN', '20'))
+N_PLUS_ONE_REPEAT = int(os.getenv('N_PLUS_ONE_REPEAT', '5'))
+
+_FINGERPRINT_CACHE_SIZE = 1024
+_fingerprints = {}
+
+_WHITESPACE = re.compile(r"\s+")
+_PARAM_LIST = re.compile(r"\(\s*(?:(?:%\([^)]+\)s|%s|\?|\$\d+|:\w+)\s*,\s*)+(?:%\([^)]+\)s|%s|\?|\$\d+|:\w+)\s*\)")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def fingerprint(statement: str) -> str:
+    """리터럴과 IN 목록 길이를 제거한 정규화 SQL"""
+    cached = _fingerprints.get(statement)
+    if cached is not None:
+        return cached
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PARAM_LIST.sub("(...)", normalized)
+    if len(_fingerprints) >= _FINGERPRINT_CACHE_SIZE:
+        _fingerprints.clear()
+    _fingerprints[statement] = normalized
+    return normalized
+
+
+class QueryStats:
+    """요청(또는 테스트 블록) 단위 쿼리 집계"""
+
+    __slots__ = ("count", "total_time", "by_fingerprint")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        # fingerprint -> [횟수, 누적 시간, 누적 행 수]
+        self.by_fingerprint = {}
+
+    def record(self, statement: str, elapsed: float, rows: int):
+        self.count += 1
+        self.total_time += elapsed
+        key = fingerprint(statement)
+        entry = self.by_fingerprint.get(key)
+        if entry is None:
+            self.by_fingerprint[key] = [1, elapsed, max(rows, 0)]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += max(rows, 0)
+
+    def repeated(self, min_count: int = N_PLUS_ONE_REPEAT):
+        """min_count 번 이상 반복된 지문 (N+1 후보), 많은 순"""
+        return sorted(
+            ((key, entry[0]) for key, entry in self.by_fingerprint.items() if entry[0] >= min_count),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def summary(self, limit: int = 10) -> str:
+        lines = [f"{self.count} queries, {self.total_time * 1000:.1f}ms total"]
+        top = sorted(self.by_fingerprint.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        for key, (count, elapsed, rows) in top:
+            lines.append(f"  {count}x {elapsed * 1000:.1f}ms rows={rows}  {key[:200]}")
+        return "\n".join(lines)
+
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+# count_queries() 블록에서 수집 중인 집계 (스레드/요청과 무관하게 전역 수집)
+_captures = []
+_captures_lock = threading.Lock()
+
+
+def start_request() -> tuple:
+    """요청 시작 시 집계 객체를 현재 컨텍스트에 설정"""
+    stats = QueryStats()
+    return stats, _current_stats.set(stats)
+
+
+def finish_request(stats: QueryStats, token, method: str, route: str):
+    """요청 종료 시 컨텍스트 해제 및 쿼리 과다 요청 경고"""
+    _current_stats.reset(token)
+    if stats.count > QUERY_COUNT_WARN:
+        from metrics import HEAVY_QUERY_REQUESTS
+        HEAVY_QUERY_REQUESTS.labels(method, route).inc()
+        repeated = stats.repeated()
+        hint = ""
+        if repeated:
+            hint = " (possible N+1: " + "; ".join(f"{count}x {key[:120]}" for key, count in repeated[:3]) + ")"
+        logger.warning(
+            f"{method} {route} issued {stats.count} queries (> {QUERY_COUNT_WARN}){hint}\n{stats.summary()}"
+        )
+
+
+def current_stats():
+    """현재 요청의 쿼리 집계 (요청 밖이면 None)"""
+    return _current_stats.get()
+
+
+# ==================== 엔진 이벤트 ====================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = perf_counter() - starts.pop()
+    rows = cursor.rowcount if cursor.rowcount is not None else -1
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed, rows)
+    if _captures:
+        with _captures_lock:
+            for capture in _captures:
+                capture.record(statement, elapsed, rows)
+
+    if elapsed >= SLOW_QUERY_THRESHOLD:
+        from metrics import SLOW_QUERIES
+        SLOW_QUERIES.inc()
+        plan = _explain(conn, statement, parameters) if SLOW_QUERY_EXPLAIN and not executemany else None
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f}ms, rows={rows}): {_WHITESPACE.sub(' ', statement)[:1000]}"
+            + (f"\nparameters: {str(parameters)[:500]}" if parameters else "")
+            + (f"\nplan:\n{plan}" if plan else "")
+        )
+
+
+def _explain(conn, statement: str, parameters):
+    """같은 DBAPI 커넥션에서 실행 계획 조회 (실패해도 원래 트랜잭션에 영향 없도록 SAVEPOINT 사용)"""
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        prefix, savepoint = "EXPLAIN ", True
+    elif dialect == "sqlite":
+        prefix, savepoint = "EXPLAIN QUERY PLAN ", False
+    else:
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT query_log_explain")
+        try:
+            cursor.execute(prefix + statement, parameters or ())
+            rows = cursor.fetchall()
+        except Exception as e:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT query_log_explain")
+            return f"(explain failed: {e})"
+        finally:
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT query_log_explain")
+        return "\n".join(" ".join(str(col) for col in row) for row in rows)
+    except Exception as e:
+        logger.debug(f"EXPLAIN skipped: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def install_query_log(engine):
+    """엔진에 쿼리 계측 이벤트 연결"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ==================== 테스트 헬퍼 ====================
+
+@contextmanager
+def count_queries():
+    """블록 안에서 실행된 모든 쿼리를 집계 (TestClient처럼 다른 스레드에서 처리되는 요청 포함)
+
+    사용 예:
+        with count_queries() as stats:
+            client.get("/nodes", headers=headers)
+        assert stats.count == 1
+    """
+    stats = QueryStats()
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+@contextmanager
+def assert_num_queries(expected: int, exact: bool = True):
+    """블록 안의 쿼리 수를 고정 (exact=False면 상한으로 검사)
+
+    사용 예:
+        with assert_num_queries(2):
+            client.post(f"/worker/process-installation/{token}")
+    """
+    with count_queries() as stats:
+        yield stats
+    failed = stats.count != expected if exact else stats.count > expected
+    if failed:
+        relation = "exactly" if exact else "at most"
+        raise AssertionError(f"Expected {relation} {expected} queries, got {stats.summary()}")
@@ -0,0 +1,332 @@
+"""
+Read Replicas
+조회 전용 라우트를 읽기 레플리카로 보내는 세션 라우팅
+
+- DATABASE_REPLICA_URLS가 설정되면 get_read_db를 쓰는 라우트(노드 목록/상세, 통계)는
+  지연이 REPLICA_MAX_LAG 초 이하인 레플리카에서 읽습니다. 쓰기와 나머지 라우트는 항상 primary.
+- 모니터 스레드가 REPLICA_LAG_CHECK 초마다 primary의 현재 WAL 위치와 각 레플리카의 재생 위치를 확인합니다.
+  primary 위치까지 재생했으면 지연 0, 아니면 마지막으로 재생한 트랜잭션 이후 경과 시간을 지연으로 봅니다
+  (아직 받지 못한 WAL도 지연에 포함). 확인 전이거나 연결이 안 되거나 지연이 크면 primary에서 읽습니다.
+- read-your-writes: 쓰기를 커밋한 요청은 커밋 직후 primary의 WAL 위치(pg_current_wal_lsn)를 응답에
+  싣고(X-Last-Write 헤더, wm_last_write 쿠키), 같은 클라이언트의 다음 조회는 그 위치까지 재생한
+  스탠바이에서만 읽습니다 (아니면 primary).
+  쿠키/헤더를 돌려보내지 않는 클라이언트도 같은 프로세스 안에서는 인증 토큰+주소 기준으로 기억합니다.
+"""
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from itertools import count
+from time import time
+import os
+import threading
+import logging
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from auth import verify_token
+from database import SessionLocal, ReadSessionLocal, engine, replica_engines
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK = float(os.getenv('REPLICA_LAG_CHECK', '1.0'))
+# 쓰기 위치 쿠키/프로세스 내 기억 유지 시간 (초)
+REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', '30'))
+
+LAST_WRITE_COOKIE = "wm_last_write"
+LAST_WRITE_HEADER = "x-last-write"
+
+DB_READS = Counter(
+    "worker_api_db_reads_total",
+    "Read-only route sessions by target database (primary/replica)",
+    ("target",),
+)
+_PRIMARY_READS = DB_READS.labels("primary")
+_REPLICA_READS = DB_READS.labels("replica")
+
+_PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()")
+_REPLICA_SQL = text("""
+    SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn(),
+           EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+""")
+
+
+def parse_lsn(value) -> int:
+    """'16/B374D848' 형식 WAL 위치를 정수로 (잘못된 값은 ValueError)"""
+    high, low = str(value).split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def format_lsn(lsn: int) -> str:
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+def primary_lsn():
+    """primary의 현재 WAL 위치 (PostgreSQL이 아니거나 실패하면 None)"""
+    if engine.dialect.name != "postgresql":
+        return None
+    try:
+        with engine.connect() as conn:
+            return parse_lsn(conn.execute(_PRIMARY_LSN_SQL).scalar())
+    except Exception as e:
+        logger.warning(f"Failed to read primary WAL position: {e}")
+        return None
+
+
+class ReplicaState:
+    """레플리카 하나의 마지막 지연 확인 결과"""
+
+    __slots__ = ("engine", "lag", "replay_lsn", "checked_at", "error")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lag = None          # 초, None이면 사용 불가
+        self.replay_lsn = None   # 재생한 WAL 위치 (스탠바이가 아니면 None)
+        self.checked_at = None   # 확인 시각 (epoch)
+        self.error = None
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    @property
+    def usable(self) -> bool:
+        if self.lag is None or self.lag > REPLICA_MAX_LAG:
+            return False
+        # 모니터가 멈췄으면 마지막 결과를 믿지 않음
+        return time() - self.checked_at <= max(REPLICA_LAG_CHECK * 3, REPLICA_MAX_LAG)
+
+    def has_replayed(self, lsn: int) -> bool:
+        """primary WAL 위치 lsn까지 재생했는지 (그 전에 커밋된 쓰기는 레플리카에서 보임)"""
+        if not lsn:
+            return True
+        # 스탠바이가 아니면(논리 복제 대상 등) primary WAL 위치와 비교할 수 없음
+        return self.replay_lsn is not None and self.replay_lsn >= lsn
+
+    def check(self, primary_position=None):
+        """primary_position: 확인 직전 primary WAL 위치 (모르면 재생 시각만으로 지연 계산)"""
+        try:
+            with self.engine.connect() as conn:
+                in_recovery, replay_lsn, replay_age = conn.execute(_REPLICA_SQL).one()
+        except Exception as e:
+            if self.error is None:
+                logger.warning(f"Replica {self.name} unavailable: {e}")
+            self.lag, self.error = None, str(e)
+            return
+
+        if not in_recovery:
+            lag, position = 0.0, None
+        else:
+            position = parse_lsn(replay_lsn) if replay_lsn is not None else None
+            if primary_position is not None and position is not None and position >= primary_position:
+                lag = 0.0
+            elif replay_age is None:
+                # 재생한 트랜잭션이 아직 없는데 primary보다 뒤처짐 - 지연을 알 수 없음
+                lag = None
+            else:
+                lag = max(float(replay_age), 0.0)
+        self.lag, self.replay_lsn, self.checked_at, self.error = lag, position, time(), None
+
+
+_replicas = [ReplicaState(replica) for replica in replica_engines]
+_next_replica = count()
+
+
+# ==================== 쓰기 추적 ====================
+
+# 요청마다 [마지막 쓰기 커밋 후 primary WAL 위치] (스레드풀에서 커밋해도 같은 리스트를 수정)
+_request_write: ContextVar = ContextVar("request_write", default=None)
+
+# 쿠키/헤더를 보내지 않는 클라이언트용 (프로세스 안에서만 유효): 클라이언트 키 -> (WAL 위치, 기록 시각)
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_session_write(session: Session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_request_write(session: Session):
+    if session.info.pop("wrote", False):
+        holder = _request_write.get()
+        if holder is not None:
+            # 커밋 뒤에 읽은 위치이므로 이 위치까지 재생한 스탠바이에는 방금 쓴 내용이 있음
+            lsn = primary_lsn()
+            if lsn is not None:
+                holder[0] = max(holder[0] or 0, lsn)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_session_write(session: Session):
+    session.info.pop("wrote", None)
+
+
+def _client_key(headers: dict, client) -> str:
+    return f"{headers.get('authorization', '')}|{client[0] if client else ''}"
+
+
+def _last_write(request: Request) -> int:
+    """이 클라이언트의 마지막 쓰기 WAL 위치 (없으면 0)"""
+    candidates = [request.headers.get(LAST_WRITE_HEADER), request.cookies.get(LAST_WRITE_COOKIE)]
+    with _recent_writes_lock:
+        remembered = _recent_writes.get(_client_key(request.headers, request.client))
+    if remembered is not None and time() - remembered[1] <= REPLICA_STICKY_SECONDS:
+        candidates.append(remembered[0])
+    last = 0
+    for value in candidates:
+        if not value:
+            continue
+        try:
+            last = max(last, value if isinstance(value, int) else parse_lsn(value))
+        except ValueError:
+            continue
+    return last
+
+
+class ReadYourWritesMiddleware:
+    """쓰기를 커밋한 요청의 응답에 primary WAL 위치를 실어 다음 조회가 그 쓰기를 보도록 함"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _replicas:
+            await self.app(scope, receive, send)
+            return
+
+        holder = [None]
+        token = _request_write.set(holder)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and holder[0] is not None:
+                written = format_lsn(holder[0])
+                cookie = SimpleCookie()
+                cookie[LAST_WRITE_COOKIE] = written
+                cookie[LAST_WRITE_COOKIE]["max-age"] = int(REPLICA_STICKY_SECONDS)
+                cookie[LAST_WRITE_COOKIE]["path"] = "/"
+                cookie[LAST_WRITE_COOKIE]["httponly"] = True
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-last-write", written.encode()),
+                    (b"set-cookie", cookie.output(header="").strip().encode()),
+                ]
+                _remember_write(scope, holder[0])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_write.reset(token)
+
+
+def _remember_write(scope, lsn: int):
+    headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+    key = _client_key(headers, scope.get("client"))
+    now = time()
+    with _recent_writes_lock:
+        _recent_writes[key] = (lsn, now)
+        if len(_recent_writes) > 1024:
+            cutoff = now - REPLICA_STICKY_SECONDS
+            for stale in [k for k, (_, at) in _recent_writes.items() if at < cutoff]:
+                del _recent_writes[stale]
+
+
+# ==================== 세션 선택 ====================
+
+def choose_read_engine(last_write: int = 0):
+    """지연 한도 안이고 primary WAL 위치 last_write까지 재생한 레플리카 (없으면 primary)"""
+    candidates = [
+        replica for replica in _replicas
+        if replica.usable and replica.has_replayed(last_write)
+    ]
+    if not candidates:
+        _PRIMARY_READS.inc()
+        return engine
+    _REPLICA_READS.inc()
+    return candidates[next(_next_replica) % len(candidates)].engine
+
+
+def open_read_session(request: Request) -> Session:
+    """조회 전용 세션 생성 (닫는 것은 호출자 책임, 응답 스트리밍 중에도 쓸 세션용)"""
+    return ReadSessionLocal(bind=choose_read_engine(_last_write(request)) if _replicas else engine)
+
+
+def get_read_db(request: Request):
+    """조회 전용 세션 (레플리카 또는 primary) - 이 세션으로는 쓰지 않습니다"""
+    db = open_read_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ==================== 지연 모니터 ====================
+
+class ReplicaMonitor:
+    """레플리카 지연 확인 사이드 스레드 (프로세스당 하나)"""
+
+    def __init__(self, interval: float = REPLICA_LAG_CHECK):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="replica-monitor", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        logger.info(f"Replica monitor started ({len(_replicas)} replicas, max lag {REPLICA_MAX_LAG}s)")
+        while not self._stop.is_set():
+            check_replicas()
+            self._stop.wait(self.interval)
+
+
+def check_replicas():
+    """primary WAL 위치를 먼저 읽고 각 레플리카 지연 확인"""
+    position = primary_lsn()
+    for replica in _replicas:
+        replica.check(position)
+
+
+_monitor = None
+
+
+def start_replica_monitor():
+    global _monitor
+    if not _replicas or _monitor is not None:
+        return
+    _monitor = ReplicaMonitor()
+    _monitor.start()
+
+
+def stop_replica_monitor():
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
+
+
+@router.get("/db/replicas")
+async def replica_status(token: str = Depends(verify_token)):
+    """레플리카별 지연/사용 여부"""
+    return {
+        "max_lag": REPLICA_MAX_LAG,
+        "replicas": [
+            {
+                "url": replica.name,
+                "lag": replica.lag,
+                "replay_lsn": format_lsn(replica.replay_lsn) if replica.replay_lsn is not None else None,
+                "usable": replica.usable,
+                "error": replica.error,
+            }
+            for replica in _replicas
+        ],
+    }
@@ -0,0 +1,337 @@
+"""
+Periodic Task Scheduler
+주기 작업 스케줄러 (작업별 PostgreSQL advisory lock 리더 선출)
+
+API 프로세스/레플리카가 여러 개여도 각 주기 작업은 리더 한 곳에서만 실행됩니다.
+- 각 프로세스는 전용 DB 커넥션에서 작업마다 `pg_try_advisory_lock`을 시도하고,
+  락을 얻은 프로세스가 그 작업의 리더가 됩니다.
+- 세션 락이므로 리더 프로세스가 죽거나 커넥션이 끊기면 락이 풀리고,
+  다음 틱에서 다른 프로세스가 리더를 이어받습니다.
+- 리더는 scheduler_leases 테이블에 하트비트와 마지막 실행 시각을 남기며,
+  새 리더는 마지막 실행 시각부터 주기를 이어가므로 페일오버 직후 중복 실행이 없습니다.
+
+PostgreSQL이 아니면(SQLite) scheduler_leases 행 자체를 임대로 씁니다.
+하트비트가 SCHEDULER_TICK * 3 초 넘게 끊긴 작업만 다른 프로세스가 이어받습니다.
+정상 종료(stop)할 때는 임대를 비워 두므로 다른 프로세스가 다음 틱에 바로 이어받습니다.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import os
+import threading
+import logging
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from auth import verify_token
+from database import SessionLocal, engine, advisory_lock_key, begin_write
+from jobs import WORKER_ID, enqueue
+from metrics import Counter, Gauge
+from models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SCHEDULER_TICK = float(os.getenv('SCHEDULER_TICK', '5'))
+TOKEN_CLEANUP_INTERVAL = float(os.getenv('TOKEN_CLEANUP_INTERVAL', '3600'))
+JOB_CLEANUP_INTERVAL = float(os.getenv('JOB_CLEANUP_INTERVAL', '3600'))
+
+SCHEDULER_LEADER = Gauge(
+    "worker_api_scheduler_leader",
+    "1 if this process is the leader for the periodic task",
+    ("task",),
+)
+SCHEDULER_RUNS = Counter(
+    "worker_api_scheduler_runs_total",
+    "Periodic task runs on this process by outcome",
+    ("task", "outcome"),
+)
+
+# name -> PeriodicTask
+_tasks = {}
+
+
+class PeriodicTask:
+    """주기 작업 정의"""
+
+    def __init__(self, name: str, interval: float, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.lock_key = advisory_lock_key(f"scheduler:{name}")
+
+
+def periodic_task(name: str, interval: float):
+    """주기 작업 등록 데코레이터 (함수는 db 세션을 받음, commit은 스케줄러가 수행)"""
+    def decorator(func):
+        _tasks[name] = PeriodicTask(name, interval, func)
+        return func
+    return decorator
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite는 tz 정보 없이 돌려주므로 UTC로 간주"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class Scheduler:
+    """리더 선출 + 주기 작업 실행 사이드 스레드 (프로세스당 하나)"""
+
+    def __init__(self, tick: float = SCHEDULER_TICK, worker_id: str = WORKER_ID):
+        self.tick = tick
+        self.worker_id = worker_id
+        self.use_advisory_locks = engine.dialect.name == "postgresql"
+        # task name -> 다음 실행 시각 (리더인 작업만)
+        self.leading = {}
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Scheduler {self.worker_id} started ({len(_tasks)} tasks, tick={self.tick}s)")
+
+    def stop(self):
+        """스케줄러 스레드가 리더 지위를 내려놓고 끝날 때까지 대기
+
+        임대와 락 커넥션은 스케줄러 스레드만 사용하므로 정리도 그 스레드가 합니다.
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._elect()
+                    self._run_due()
+                except Exception as e:
+                    logger.warning(f"Scheduler tick failed: {e}")
+                    self._release_all()
+                self._stop.wait(self.tick)
+        finally:
+            self._release_all(graceful=True)
+
+    # ---------- 리더 선출 ----------
+
+    def _lock_connection(self):
+        """advisory lock을 유지하는 전용 커넥션 (끊기면 모든 락이 풀림)"""
+        if self._conn is None:
+            self._conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        return self._conn
+
+    def _elect(self):
+        conn = self._lock_connection() if self.use_advisory_locks else None
+        if conn is not None and self.leading:
+            # 커넥션이 살아 있는지 확인 (죽었으면 예외 -> 리더 지위 포기)
+            conn.execute(text("SELECT 1"))
+
+        for task in _tasks.values():
+            if task.name in self.leading:
+                continue
+            if conn is not None:
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": task.lock_key}
+                ).scalar()
+                if not acquired:
+                    continue
+            self._become_leader(task)
+
+        if self.leading:
+            self._heartbeat()
+
+    def _lease_held_by_other(self, lease: Optional[SchedulerLease], now: datetime) -> bool:
+        """advisory lock 없이 선출할 때: 다른 프로세스의 하트비트가 살아 있는지"""
+        if self.use_advisory_locks or lease is None or lease.owner in (None, self.worker_id):
+            return False
+        heartbeat = _as_utc(lease.heartbeat_at)
+        return heartbeat is not None and heartbeat > now - timedelta(seconds=self.tick * 3)
+
+    def _become_leader(self, task: PeriodicTask) -> bool:
+        now = _utcnow()
+        db = SessionLocal()
+        try:
+            if not self.use_advisory_locks:
+                begin_write(db)
+            lease = db.get(SchedulerLease, task.name)
+            if self._lease_held_by_other(lease, now):
+                return False
+            previous = lease.owner if lease else None
+            last_run = _as_utc(lease.last_run_at) if lease else None
+            if lease is None:
+                lease = SchedulerLease(task=task.name)
+                db.add(lease)
+            lease.owner = self.worker_id
+            lease.acquired_at = now
+            lease.heartbeat_at = now
+            db.commit()
+        finally:
+            db.close()
+
+        # 이전 리더의 마지막 실행 시각부터 주기를 이어감
+        self.leading[task.name] = last_run + timedelta(seconds=task.interval) if last_run else now
+        SCHEDULER_LEADER.labels(task.name).set(1)
+        logger.info(f"Became leader for periodic task '{task.name}'"
+                    + (f" (previous owner: {previous})" if previous and previous != self.worker_id else ""))
+        return True
+
+    def _heartbeat(self):
+        db = SessionLocal()
+        try:
+            (
+                db.query(SchedulerLease)
+                .filter(SchedulerLease.task.in_(list(self.leading)), SchedulerLease.owner == self.worker_id)
+                .update({SchedulerLease.heartbeat_at: _utcnow()}, synchronize_session=False)
+            )
+            db.commit()
+            if not self.use_advisory_locks:
+                # 하트비트가 늦어 다른 프로세스가 이어받은 작업은 내려놓음
+                owned = {
+                    name for (name,) in db.query(SchedulerLease.task)
+                    .filter(SchedulerLease.task.in_(list(self.leading)), SchedulerLease.owner == self.worker_id)
+                }
+                for name in set(self.leading) - owned:
+                    logger.warning(f"Lost leadership for periodic task '{name}'")
+                    SCHEDULER_LEADER.labels(name).set(0)
+                    del self.leading[name]
+        finally:
+            db.close()
+
+    def _release_all(self, graceful: bool = False):
+        """리더 지위 포기 (graceful이면 종료 - 임대도 비워 다른 프로세스가 다음 틱에 바로 이어받음)"""
+        if graceful and self.leading:
+            db = SessionLocal()
+            try:
+                (
+                    db.query(SchedulerLease)
+                    .filter(SchedulerLease.task.in_(list(self.leading)), SchedulerLease.owner == self.worker_id)
+                    .update({SchedulerLease.owner: None}, synchronize_session=False)
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Failed to release scheduler leases: {e}")
+            finally:
+                db.close()
+        for name in self.leading:
+            SCHEDULER_LEADER.labels(name).set(0)
+        self.leading = {}
+        if self._conn is not None:
+            try:
+                # 커넥션을 닫으면 세션 advisory lock이 모두 풀림
+                self._conn.invalidate()
+                self._conn.close()
+            except Exception as e:
+                logger.debug(f"Failed to close scheduler lock connection: {e}")
+            self._conn = None
+
+    # ---------- 실행 ----------
+
+    def _run_due(self):
+        now = _utcnow()
+        for name, next_run in list(self.leading.items()):
+            if now < next_run:
+                continue
+            task = _tasks[name]
+            db = SessionLocal()
+            error = None
+            try:
+                task.func(db)
+                db.commit()
+                SCHEDULER_RUNS.labels(name, "succeeded").inc()
+            except Exception as e:
+                db.rollback()
+                error = f"{type(e).__name__}: {e}"
+                SCHEDULER_RUNS.labels(name, "failed").inc()
+                logger.error(f"Periodic task '{name}' failed: {e}")
+            finally:
+                db.close()
+            self.leading[name] = now + timedelta(seconds=task.interval)
+            self._record_run(name, now, error)
+
+    def _record_run(self, name: str, ran_at: datetime, error: Optional[str]):
+        db = SessionLocal()
+        try:
+            lease = db.get(SchedulerLease, name)
+            if lease is not None:
+                lease.last_run_at = ran_at
+                lease.last_error = error
+                db.commit()
+        finally:
+            db.close()
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    """스케줄러 시작 (startup 이벤트에서 호출)"""
+    global _scheduler
+    if not SCHEDULER_ENABLED or _scheduler is not None:
+        return
+    _scheduler = Scheduler()
+    _scheduler.start()
+
+
+def stop_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+# ==================== 기본 주기 작업 ====================
+# 실제 처리는 작업 큐에 넘겨 재시도/분산 실행을 그대로 사용
+
+@periodic_task("token-cleanup", interval=TOKEN_CLEANUP_INTERVAL)
+def schedule_token_cleanup(db: Session):
+    enqueue(db, "sweep_expired_tokens")
+
+
+@periodic_task("job-cleanup", interval=JOB_CLEANUP_INTERVAL)
+def schedule_job_cleanup(db: Session):
+    enqueue(db, "purge_finished_jobs")
+
+
+# ==================== API ====================
+
+@router.get("/scheduler/leaders")
+def list_leaders(token: str = Depends(verify_token)):
+    """주기 작업별 리더 프로세스와 마지막 실행 정보"""
+    db = SessionLocal()
+    try:
+        leases = {lease.task: lease for lease in db.query(SchedulerLease).all()}
+    finally:
+        db.close()
+
+    stale_before = _utcnow() - timedelta(seconds=SCHEDULER_TICK * 3)
+    tasks = []
+    for name, task in sorted(_tasks.items()):
+        lease = leases.get(name)
+        heartbeat = _as_utc(lease.heartbeat_at) if lease else None
+        tasks.append({
+            "task": name,
+            "interval_seconds": task.interval,
+            "owner": lease.owner if lease else None,
+            "acquired_at": lease.acquired_at if lease else None,
+            "heartbeat_at": heartbeat,
+            # 하트비트가 끊긴 리더 (다음 틱에 다른 프로세스가 이어받음)
+            "stale": heartbeat is None or heartbeat < stale_before,
+            "last_run_at": lease.last_run_at if lease else None,
+            "last_error": lease.last_error if lease else None,
+        })
+    return {
+        "process": WORKER_ID,
+        "enabled": SCHEDULER_ENABLED,
+        "leading": sorted(_scheduler.leading) if _scheduler else [],
+        "tasks": tasks
+    }
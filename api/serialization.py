@@ -0,0 +1,35 @@
+"""
+JSON Serialization
+응답/내보내기용 JSON 인코딩 (orjson이 있으면 사용, 없으면 표준 json)
+
+- FastJSONResponse는 앱 기본 응답 클래스입니다. orjson은 datetime/UUID 등을 직접 인코딩하고
+  표준 json보다 수 배 빠릅니다.
+- 목록처럼 큰 응답은 라우트에서 dict를 직접 만들어 FastJSONResponse로 반환하면
+  Pydantic 검증과 jsonable_encoder 단계를 건너뜁니다.
+"""
+from datetime import date, datetime
+from typing import Any
+import json
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """JSON bytes (orjson이 없으면 표준 json, datetime은 ISO 8601)"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
@@ -0,0 +1,117 @@
+"""
+Shared Settings
+워커 프로세스 간 공유 설정 (app_settings 테이블 + 환경변수 기본값)
+
+여러 uvicorn 워커가 같은 값을 보도록 런타임 설정은 DB에 저장하고,
+각 프로세스는 SETTINGS_CACHE_TTL 초 동안만 로컬 캐시를 사용합니다.
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Dict
+from time import monotonic
+import os
+import threading
+import logging
+
+from database import SessionLocal
+from models import AppSetting
+from auth import verify_token
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 환경변수 기본값 (DB에 값이 없을 때 사용)
+DEFAULTS = {
+    "LOCAL_SERVER_IP": os.getenv('LOCAL_SERVER_IP', '192.168.0.88'),
+    "CENTRAL_SERVER_URL": os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000'),
+}
+
+SETTINGS_CACHE_TTL = float(os.getenv('SETTINGS_CACHE_TTL', '5'))
+
+_cache: Dict[str, str] = {}
+_loaded_at = None
+_lock = threading.Lock()
+
+
+def _reload():
+    global _cache, _loaded_at
+    db = SessionLocal()
+    try:
+        _cache = {row.key: row.value for row in db.query(AppSetting).all()}
+    except Exception as e:
+        # 테이블 생성 전 등 - 기존 캐시/기본값 유지
+        logger.warning(f"Failed to load shared settings: {e}")
+    finally:
+        db.close()
+    _loaded_at = monotonic()
+
+
+def get_setting(key: str) -> str:
+    """공유 설정 조회 (DB 값 우선, 없으면 환경변수 기본값)"""
+    if _loaded_at is None or monotonic() - _loaded_at > SETTINGS_CACHE_TTL:
+        with _lock:
+            if _loaded_at is None or monotonic() - _loaded_at > SETTINGS_CACHE_TTL:
+                _reload()
+    return _cache.get(key, DEFAULTS[key])
+
+
+def set_setting(db: Session, key: str, value: str):
+    """공유 설정 저장 (commit은 호출자가 수행)"""
+    global _loaded_at
+    if key not in DEFAULTS:
+        raise KeyError(key)
+    db.merge(AppSetting(key=key, value=value))
+    # 이 프로세스는 다음 조회에서 바로 다시 읽음
+    _loaded_at = None
+
+
+def public_server_host() -> str:
+    """설치 URL에 사용할 서버 호스트 (SERVERURL 환경변수 > LOCAL_SERVER_IP)"""
+    server_host = os.getenv('SERVERURL', 'localhost')
+    if server_host == 'auto' or not server_host or server_host == 'localhost':
+        server_host = get_setting("LOCAL_SERVER_IP")
+    return server_host
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/settings")
+def list_settings(token: str = Depends(verify_token)):
+    """현재 적용 중인 공유 설정"""
+    return {key: get_setting(key) for key in DEFAULTS}
+
+
+@router.put("/settings")
+def update_settings(
+    updates: Dict[str, str],
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_token)
+):
+    """공유 설정 변경 (모든 워커 프로세스에 SETTINGS_CACHE_TTL 이내 반영)
+
+    CENTRAL_SERVER_URL을 지정하면 노드 설정 일괄 갱신 작업을 같은 트랜잭션에서 추가합니다
+    (이미 같은 주소인 노드는 작업에서 건너뜀).
+    """
+    # node_bulk가 settings를 import하므로 여기서 가져옴
+    from node_bulk import enqueue_config_refresh
+
+    unknown = [key for key in updates if key not in DEFAULTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown settings: {', '.join(unknown)}")
+    for key, value in updates.items():
+        set_setting(db, key, value)
+    job = enqueue_config_refresh(db, updates["CENTRAL_SERVER_URL"]) if "CENTRAL_SERVER_URL" in updates else None
+    db.commit()
+    logger.info(f"Shared settings updated: {updates}")
+    response = {key: get_setting(key) for key in DEFAULTS}
+    if job is not None:
+        logger.info(f"Node config refresh job #{job.id} queued for {updates['CENTRAL_SERVER_URL']}")
+        response["refresh_job_id"] = job.id
+    return response
@@ -4,12 +4,9 @@ Simplified Worker Node Docker Runner
 """
 import json
 from models import Node
+from settings import get_setting
 import os
 
-# Global configuration - 환경변수에서 한 번만 로드
-LOCAL_SERVER_IP = os.getenv('LOCAL_SERVER_IP', '192.168.0.88')
-CENTRAL_SERVER_URL = os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000')
-
 def generate_simple_worker_runner_wsl(node: Node) -> str:
     """WSL용 워커노드 Docker Runner 생성 (Windows에서 WSL2 사용)"""
 
@@ -19,13 +16,13 @@ def generate_simple_worker_runner_wsl(node: Node) -> str:
     DOCKER_TAG = "latest"
 
     # 서버 설정
-    server_ip = LOCAL_SERVER_IP
+    server_ip = get_setting("LOCAL_SERVER_IP")
     worker_manager_url = f"http://{server_ip}:8091"
 
     if metadata.get('central_server_ip'):
         central_ip = metadata.get('central_server_ip')
     else:
-        central_url = metadata.get('central_server_url') or node.central_server_url or CENTRAL_SERVER_URL
+        central_url = metadata.get('central_server_url') or node.central_server_url or get_setting("CENTRAL_SERVER_URL")
         import re
         central_ip_match = re.search(r'://([^:]+)', central_url)
         central_ip = central_ip_match.group(1) if central_ip_match else "192.168.0.88"
@@ -487,7 +484,7 @@ def generate_simple_worker_runner(node: Node) -> str:
     
     # API 서버 주소 (실제 호스트)
     # Worker Manager 서버 주소 - 호스트의 실제 IP 사용
-    server_ip = LOCAL_SERVER_IP
+    server_ip = get_setting("LOCAL_SERVER_IP")
     worker_manager_url = f"http://{server_ip}:8091"
     # 중앙서버 설정
     # metadata에 central_server_ip가 있으면 사용, 없으면 URL에서 추출
@@ -496,7 +493,7 @@ def generate_simple_worker_runner(node: Node) -> str:
         central_url = f"http://{central_ip}:8000"
     else:
         # 기존 방식: URL에서 IP 추출
-        central_url = metadata.get('central_server_url') or node.central_server_url or os.getenv("CENTRAL_SERVER_URL", "http://192.168.0.88:8000")
+        central_url = metadata.get('central_server_url') or node.central_server_url or get_setting("CENTRAL_SERVER_URL")
         import re
         central_ip_match = re.search(r'://([^:]+)', central_url)
         central_ip = central_ip_match.group(1) if central_ip_match else "192.168.0.88"
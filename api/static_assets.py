@@ -0,0 +1,48 @@
+"""
+Static Page Assets
+페이지/정적 파일을 미리 gzip 압축한 바이트 + ETag로 내보내는 FastAPI 응답과 /static 라우트
+
+분리/압축/ETag 판단은 page_assets.py(웹 대시보드와 공용)에 있고, 여기서는 FastAPI 응답으로 바꿉니다.
+템플릿은 모듈 로드 시 분리/압축해 두므로 모든 프로세스에서 /static 경로가 바로 유효합니다.
+"""
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+# 다른 모듈은 static_assets에서 가져다 씀
+from page_assets import (
+    CompiledBody, PAGE_CACHE_CONTROL, STATIC_CACHE_CONTROL,
+    compile_page, get_asset, register_asset, split_inline_assets,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def compiled_response(compiled: CompiledBody, request: Request, headers: Optional[dict] = None,
+                      status_code: int = 200) -> Response:
+    """미리 만든 본문 응답 (ETag가 같으면 304, gzip을 받으면 압축 본문)"""
+    status, body, response_headers = compiled.negotiate(
+        request.headers.get("if-none-match"), request.headers.get("accept-encoding"), headers
+    )
+    if status == 304:
+        return Response(status_code=304, headers=response_headers)
+    return Response(body, status_code=status_code, media_type=compiled.media_type, headers=response_headers)
+
+
+def html_response(request: Request, html: str, headers: Optional[dict] = None, status_code: int = 200) -> Response:
+    """요청마다 만드는 페이지 응답 (빠른 압축 레벨 사용, ETag 재검증 지원)"""
+    response_headers = {"Cache-Control": PAGE_CACHE_CONTROL}
+    response_headers.update(headers or {})
+    return compiled_response(compile_page(html, level=6), request, response_headers, status_code)
+
+
+@router.get("/static/{filename}")
+async def static_asset(filename: str, request: Request):
+    """페이지에서 분리한 CSS/JS (내용 해시 이름)"""
+    asset = get_asset(filename)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return compiled_response(asset, request, {"Cache-Control": STATIC_CACHE_CONTROL})
@@ -0,0 +1,194 @@
+"""
+Install Tokens
+설치 링크(QR)용 HMAC 서명 토큰
+
+토큰 자체에 node_id, 노드 타입, 만료 시각이 들어 있고 서명으로 위변조를 막으므로
+설치 페이지/설치 처리에서 토큰 확인을 위한 DB 조회가 필요 없습니다.
+DB(qr_tokens)는 설치가 끝날 때(노드가 설치 완료로 바뀌는 트랜잭션) 사용 기록을 남길 때만 씁니다 (upsert 한 번).
+INSTALL_TOKEN_AUDIT가 켜져 있으면 발급 시에도 qr_tokens에 기록해 감사 로그로 남깁니다.
+
+형식: v1.{payload(base64url JSON)}.{HMAC-SHA256(서명 키, "v1.{payload}")}
+서명 키는 INSTALL_TOKEN_SECRET, 없으면 처음 시작할 때 만든 무작위 키(app_settings에 저장, 모든 프로세스/레플리카 공유)입니다.
+서명 형식이 아닌 예전 토큰은 qr_tokens 테이블에서 찾습니다.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import logging
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import AppSetting, QRToken
+
+logger = logging.getLogger(__name__)
+
+INSTALL_TOKEN_AUDIT = os.getenv('INSTALL_TOKEN_AUDIT', 'true').lower() in ('1', 'true', 'yes')
+
+_TOKEN_VERSION = "v1"
+
+
+# app_settings에 저장하는 서명 키 (settings.DEFAULTS에 없으므로 /settings로 노출되지 않음)
+_SECRET_SETTING = "install_token_secret"
+
+_secret: Optional[bytes] = None
+_secret_lock = threading.Lock()
+
+
+def _load_secret() -> bytes:
+    secret = os.getenv('INSTALL_TOKEN_SECRET')
+    if secret:
+        return secret.encode("utf-8")
+    # 공개된 기본 API_TOKEN에서 파생하면 누구나 토큰을 만들 수 있으므로 무작위 키를 DB에 한 번만 저장
+    db = SessionLocal()
+    try:
+        row = db.get(AppSetting, _SECRET_SETTING)
+        if row is None:
+            db.add(AppSetting(key=_SECRET_SETTING, value=secrets.token_urlsafe(32)))
+            try:
+                db.commit()
+                logger.info("INSTALL_TOKEN_SECRET is not set, generated a random install token key")
+            except IntegrityError:
+                # 다른 프로세스가 먼저 저장함
+                db.rollback()
+            row = db.get(AppSetting, _SECRET_SETTING)
+        return row.value.encode("utf-8")
+    finally:
+        db.close()
+
+
+def _get_secret() -> bytes:
+    """서명 키 (테이블이 생성된 뒤 처음 쓸 때 읽음)"""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                _secret = _load_secret()
+    return _secret
+
+
+class InstallToken:
+    """확인된 설치 토큰 (QRToken과 같은 속성 이름)"""
+
+    __slots__ = ("token", "node_id", "node_type", "expires_at")
+
+    def __init__(self, token: str, node_id: str, node_type: str, expires_at: datetime):
+        self.token = token
+        self.node_id = node_id
+        self.node_type = node_type
+        self.expires_at = expires_at
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(message: str) -> str:
+    return _b64encode(hmac.new(_get_secret(), message.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_install_token(node_id: str, node_type: str, expires_at: datetime) -> str:
+    """서명된 설치 토큰 발급"""
+    claims = {
+        "n": node_id,
+        "t": node_type,
+        "e": int(expires_at.timestamp()),
+        # 같은 노드/만료 시각으로 다시 발급해도 토큰이 달라지도록
+        "j": secrets.token_urlsafe(9),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    message = f"{_TOKEN_VERSION}.{payload}"
+    return f"{message}.{_sign(message)}"
+
+
+def _verify_signed(token: str) -> Optional[InstallToken]:
+    try:
+        version, payload, signature = token.split(".")
+    except ValueError:
+        return None
+    if version != _TOKEN_VERSION or not hmac.compare_digest(_sign(f"{version}.{payload}"), signature):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+        return InstallToken(token, claims["n"], claims["t"],
+                            datetime.fromtimestamp(claims["e"], tz=timezone.utc))
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def _as_utc(value: datetime) -> datetime:
+    """SQLite는 tz 정보 없이 돌려주므로 UTC로 간주"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def load_install_token(db: Session, token: str, node_type: str) -> Optional[InstallToken]:
+    """토큰 확인 (서명 토큰은 메모리에서, 예전 토큰만 DB 조회), 다른 노드 타입용이면 None
+
+    만료 여부는 호출자가 expires_at으로 확인합니다 (만료/무효 응답을 구분하기 위해).
+    """
+    if token.startswith(f"{_TOKEN_VERSION}."):
+        install_token = _verify_signed(token)
+    else:
+        qr_token = db.query(QRToken).filter(QRToken.token == token).first()
+        install_token = qr_token and InstallToken(
+            qr_token.token, qr_token.node_id, qr_token.node_type or "worker", _as_utc(qr_token.expires_at)
+        )
+    if install_token is None or install_token.node_type != node_type:
+        return None
+    return install_token
+
+
+def record_issued_token(db: Session, install_token: str, node_id: str, node_type: str, expires_at: datetime):
+    """발급 감사 기록 (INSTALL_TOKEN_AUDIT가 꺼져 있으면 아무것도 하지 않음, commit은 호출자가 수행)"""
+    if INSTALL_TOKEN_AUDIT:
+        db.add(QRToken(token=install_token, node_id=node_id, node_type=node_type,
+                       expires_at=expires_at, used=False))
+
+
+def consume_install_token(db: Session, install_token: InstallToken) -> bool:
+    """토큰을 사용됨으로 기록 (upsert 한 번), 이미 사용된 토큰이면 False (commit은 호출자가 수행)
+
+    노드를 설치 완료로 바꾸는 트랜잭션에서 호출합니다. False면 같은 토큰으로 다른 요청이 먼저 설치를 끝낸 것입니다.
+    """
+    values = {
+        "token": install_token.token,
+        "node_id": install_token.node_id,
+        "node_type": install_token.node_type,
+        "expires_at": install_token.expires_at,
+        "used": True,
+    }
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(QRToken).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QRToken.token],
+            set_={"used": True},
+            where=QRToken.used.isnot(True),
+        ).returning(QRToken.token)
+        return db.execute(stmt).first() is not None
+
+    # 그 외 DB: 조회 후 갱신
+    qr_token = db.get(QRToken, install_token.token)
+    if qr_token is None:
+        db.add(QRToken(**values))
+        return True
+    if qr_token.used:
+        return False
+    qr_token.used = True
+    return True
@@ -183,3 +183,101 @@ def validate_lan_ip(ip: str) -> bool:
 
     except:
         return False
+
+
+def render_qr_data_uri(data: str) -> str:
+    """
+    QR 코드를 PNG로 렌더링하여 data URI로 반환합니다.
+
+    Args:
+        data: QR 코드에 담을 문자열 (설치 URL)
+
+    Returns:
+        str: "data:image/png;base64,..." 형식의 문자열
+    """
+    import io
+    import base64
+    from time import perf_counter
+
+    import qrcode
+    from metrics import QR_RENDER
+
+    start = perf_counter()
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    qr_base64 = base64.b64encode(buffer.getvalue()).decode()
+    QR_RENDER.observe(perf_counter() - start)
+
+    return f"data:image/png;base64,{qr_base64}"
+
+
+def gzip_chunks(chunks, level: int = 6):
+    """
+    바이트 조각을 gzip 스트림으로 압축하며 반환합니다.
+
+    Args:
+        chunks: 원본 바이트 조각 이터러블
+        level: 압축 레벨 (1-9)
+
+    Yields:
+        bytes: gzip 압축된 조각
+    """
+    import zlib
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip 헤더 포함
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def download_response(request, chunks, filename: str, media_type: str, path=None, headers: dict = None):
+    """
+    설치 파일 다운로드 응답을 만듭니다.
+
+    저장된 파일(path)이 있으면 FileResponse로 보내고, 클라이언트가 gzip을 받으면(INSTALLER_GZIP 활성화 시)
+    저장할 때 만든 gzip 사본을 그대로 보냅니다. 저장된 파일이 없으면 생성 조각을 (필요하면 압축하며) 스트리밍합니다.
+
+    Args:
+        request: FastAPI Request (Accept-Encoding 확인용)
+        chunks: 내용 바이트 조각 이터레이터
+        filename: 다운로드 파일명
+        media_type: Content-Type
+        path: 저장된 파일 경로 (있으면 그대로 전송)
+        headers: 추가 응답 헤더
+
+    Returns:
+        Response: StreamingResponse 또는 FileResponse
+    """
+    import os
+    from fastapi.responses import FileResponse, StreamingResponse
+    from artifacts import gzip_path, read_chunks
+
+    response_headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    response_headers.update(headers or {})
+
+    gzip_enabled = os.getenv('INSTALLER_GZIP', 'true').lower() in ('1', 'true', 'yes')
+    accepts_gzip = gzip_enabled and "gzip" in request.headers.get("accept-encoding", "")
+    if gzip_enabled:
+        response_headers["Vary"] = "Accept-Encoding"
+
+    if path is not None:
+        compressed = gzip_path(path) if accepts_gzip else None
+        if compressed is not None and compressed.is_file():
+            return FileResponse(compressed, media_type=media_type,
+                                headers={**response_headers, "Content-Encoding": "gzip"})
+        if not accepts_gzip:
+            return FileResponse(path, media_type=media_type, headers=response_headers)
+        # gzip 사본이 없는 예전 아티팩트 - 읽으면서 압축
+        chunks = read_chunks(path)
+
+    if accepts_gzip:
+        response_headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(gzip_chunks(chunks), media_type=media_type, headers=response_headers)
+    return StreamingResponse(chunks, media_type=media_type, headers=response_headers)
@@ -0,0 +1,422 @@
+"""
+Webhooks
+노드 수명주기 이벤트를 웹훅으로 전달 (DB outbox + 배치 전송)
+
+- 이벤트는 노드를 바꾼 트랜잭션과 같은 트랜잭션에서 webhook_outbox에 엔드포인트마다 한 줄씩 저장되므로
+  커밋된 변경의 이벤트는 프로세스가 죽어도 유실되지 않습니다.
+- 각 API 프로세스의 WebhookDispatcher가 엔드포인트별로 최대 WEBHOOK_BATCH_SIZE 개씩 묶어
+  POST하며, 엔드포인트당 동시 전송 수는 WEBHOOK_ENDPOINT_CONCURRENCY 개로 제한합니다.
+  (PostgreSQL에서는 `FOR UPDATE SKIP LOCKED`로 가져오므로 여러 프로세스가 같은 이벤트를 나눠 보내지 않습니다)
+- 실패한 배치는 지수 백오프로 WEBHOOK_MAX_ATTEMPTS 번까지 재시도합니다.
+- 이 프로세스에서 커밋된 이벤트는 바로, 다른 프로세스의 이벤트는 WEBHOOK_POLL_INTERVAL 초 안에 전송됩니다.
+
+요청 본문: {"events": [{"id", "event", "node_id", "data", "created_at"}, ...]}
+서명 헤더: X-Webhook-Timestamp, X-Webhook-Signature: sha256=HMAC(WEBHOOK_SECRET, "{timestamp}.{body}")
+전달은 최소 한 번(at-least-once)이며 배치 간 순서는 보장하지 않으므로 수신 측은 id로 중복을 거릅니다.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from time import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import logging
+
+import httpx
+from fastapi import APIRouter, Depends
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+
+from auth import verify_token
+from database import SessionLocal, begin_write
+from jobs import WORKER_ID, enqueue, job_handler
+from metrics import Counter, Histogram
+from models import Node, WebhookOutbox
+from node_changes import node_to_dict
+from scheduler import periodic_task
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+WEBHOOK_URLS = [url.strip() for url in os.getenv('WEBHOOK_URLS', '').split(',') if url.strip()]
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_DISPATCHER_ENABLED = os.getenv('WEBHOOK_DISPATCHER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+WEBHOOK_ENDPOINT_CONCURRENCY = int(os.getenv('WEBHOOK_ENDPOINT_CONCURRENCY', '2'))
+WEBHOOK_POLL_INTERVAL = float(os.getenv('WEBHOOK_POLL_INTERVAL', '0.5'))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '5'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '10'))
+WEBHOOK_RETRY_BASE_DELAY = float(os.getenv('WEBHOOK_RETRY_BASE_DELAY', '1'))
+WEBHOOK_RETRY_MAX_DELAY = float(os.getenv('WEBHOOK_RETRY_MAX_DELAY', '300'))
+WEBHOOK_LOCK_TIMEOUT = float(os.getenv('WEBHOOK_LOCK_TIMEOUT', '60'))
+WEBHOOK_RETENTION_DAYS = float(os.getenv('WEBHOOK_RETENTION_DAYS', '7'))
+WEBHOOK_CLEANUP_INTERVAL = float(os.getenv('WEBHOOK_CLEANUP_INTERVAL', '3600'))
+
+# 이벤트 종류
+NODE_REGISTERED = "node.registered"
+NODE_INSTALLED = "node.installed"
+NODE_DELETED = "node.deleted"
+
+WEBHOOK_BATCHES = Counter(
+    "worker_api_webhook_batches_total",
+    "Webhook batches sent by endpoint host and outcome (delivered, retry, failed)",
+    ("endpoint", "outcome"),
+)
+WEBHOOK_LAG = Histogram(
+    "worker_api_webhook_delivery_lag_seconds",
+    "Time from event creation to successful delivery",
+    ("endpoint",),
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite는 tz 정보 없이 돌려주므로 UTC로 간주"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _endpoint_label(endpoint: str) -> str:
+    # 메트릭 라벨에는 경로/쿼리(토큰 등) 대신 호스트만
+    return urlsplit(endpoint).netloc or endpoint
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256)
+    return f"sha256={digest.hexdigest()}"
+
+
+def verify_signature(secret: str, timestamp: str, body: bytes, signature: str, tolerance: float = 300) -> bool:
+    """수신 측 서명 확인 (timestamp가 tolerance 초 넘게 차이 나면 재전송 공격으로 보고 거부)"""
+    try:
+        if abs(time() - int(timestamp)) > tolerance:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), signature)
+
+
+# ==================== 이벤트 기록 ====================
+
+def emit_event(db: Session, event_name: str, node_id: Optional[str] = None,
+               data: Optional[Dict[str, Any]] = None):
+    """설정된 모든 엔드포인트로 보낼 이벤트를 outbox에 추가 (commit은 호출자가 수행)"""
+    if not WEBHOOK_URLS:
+        return
+    now = _utcnow()
+    payload = json.dumps(data or {}, default=str)
+    for endpoint in WEBHOOK_URLS:
+        db.add(WebhookOutbox(
+            endpoint=endpoint,
+            event=event_name,
+            node_id=node_id,
+            payload=payload,
+            next_attempt_at=now,
+            created_at=now,
+        ))
+    db.info["webhook_events"] = True
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _record_lifecycle_events(session: Session, flush_context, instances):
+    """노드 추가/삭제는 어느 코드 경로에서 일어나든 이벤트로 기록"""
+    if not WEBHOOK_URLS:
+        return
+    for obj in list(session.new):
+        if isinstance(obj, Node):
+            emit_event(session, NODE_REGISTERED, obj.node_id, node_to_dict(obj))
+    for obj in list(session.deleted):
+        if isinstance(obj, Node):
+            emit_event(session, NODE_DELETED, obj.node_id, {"node_id": obj.node_id, "node_type": obj.node_type})
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_dispatcher(session: Session):
+    if session.info.pop("webhook_events", False) and _dispatcher is not None:
+        _dispatcher.wake()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_events(session: Session):
+    session.info.pop("webhook_events", None)
+
+
+# ==================== 전송 ====================
+
+def retry_delay(attempts: int) -> float:
+    """재시도 대기 시간 (지수 백오프 + 지터)"""
+    delay = min(WEBHOOK_RETRY_MAX_DELAY, WEBHOOK_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim_batch(endpoint: str, limit: int = WEBHOOK_BATCH_SIZE, worker_id: str = WORKER_ID) -> List[dict]:
+    """엔드포인트로 보낼 이벤트를 최대 limit 개 가져와 sending으로 표시"""
+    now = _utcnow()
+    stale_before = now - timedelta(seconds=WEBHOOK_LOCK_TIMEOUT)
+    db = SessionLocal()
+    try:
+        begin_write(db)
+        rows = (
+            db.query(WebhookOutbox)
+            .filter(
+                WebhookOutbox.endpoint == endpoint,
+                or_(
+                    and_(WebhookOutbox.status == "pending", WebhookOutbox.next_attempt_at <= now),
+                    and_(WebhookOutbox.status == "sending", WebhookOutbox.locked_at < stale_before),
+                ),
+            )
+            .order_by(WebhookOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        batch = []
+        for row in rows:
+            row.status = "sending"
+            row.locked_by = worker_id
+            row.locked_at = now
+            row.attempts += 1
+            batch.append({
+                "id": row.id,
+                "event": row.event,
+                "node_id": row.node_id,
+                "data": json.loads(row.payload) if row.payload else {},
+                "created_at": _as_utc(row.created_at).isoformat(),
+                "attempts": row.attempts,
+            })
+        db.commit()
+        return batch
+    finally:
+        db.close()
+
+
+def _finish_batch(endpoint: str, batch: List[dict], error: Optional[str]):
+    """전송 결과 기록 (실패하면 배치 전체를 백오프 후 다시 보냄)"""
+    now = _utcnow()
+    label = _endpoint_label(endpoint)
+    db = SessionLocal()
+    try:
+        rows = db.query(WebhookOutbox).filter(WebhookOutbox.id.in_([item["id"] for item in batch])).all()
+        outcome = "delivered"
+        # 배치 전체에 같은 재시도 시각을 써서 다음 시도도 한 배치로 묶이게 함 (행마다 지터를 따로 주면 흩어짐)
+        next_attempt_at = now + timedelta(seconds=retry_delay(max((row.attempts for row in rows), default=1)))
+        for row in rows:
+            row.locked_by = None
+            if error is None:
+                row.status = "delivered"
+                row.delivered_at = now
+                row.last_error = None
+                WEBHOOK_LAG.labels(label).observe((now - _as_utc(row.created_at)).total_seconds())
+            elif row.attempts < WEBHOOK_MAX_ATTEMPTS:
+                row.status = "pending"
+                row.next_attempt_at = next_attempt_at
+                row.last_error = error
+                outcome = "retry"
+            else:
+                row.status = "failed"
+                row.last_error = error
+                outcome = "failed"
+        db.commit()
+        WEBHOOK_BATCHES.labels(label, outcome).inc()
+        if error is not None:
+            logger.warning(f"Webhook batch of {len(batch)} events to {label} failed ({outcome}): {error}")
+    except Exception as e:
+        logger.error(f"Failed to record webhook delivery to {label}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def deliver_batch(client: httpx.Client, endpoint: str, batch: List[dict]):
+    """배치 하나를 서명해서 POST (2xx면 성공)"""
+    body = json.dumps(
+        {"events": [{key: item[key] for key in ("id", "event", "node_id", "data", "created_at")} for item in batch]},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    timestamp = str(int(time()))
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "worker-manager-webhooks",
+        "X-Webhook-Timestamp": timestamp,
+    }
+    if WEBHOOK_SECRET:
+        headers["X-Webhook-Signature"] = sign_payload(WEBHOOK_SECRET, timestamp, body)
+
+    error = None
+    try:
+        response = client.post(endpoint, content=body, headers=headers)
+        if response.status_code >= 300:
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    _finish_batch(endpoint, batch, error)
+
+
+class WebhookDispatcher:
+    """outbox 이벤트를 엔드포인트별로 묶어 보내는 사이드 스레드 (프로세스당 하나)"""
+
+    def __init__(self, endpoints: List[str], concurrency: int = WEBHOOK_ENDPOINT_CONCURRENCY,
+                 poll_interval: float = WEBHOOK_POLL_INTERVAL):
+        self.endpoints = endpoints
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        # endpoint -> 전송 중인 배치 수
+        self._inflight = {endpoint: 0 for endpoint in endpoints}
+        self._inflight_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._client = httpx.Client(timeout=WEBHOOK_TIMEOUT)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(endpoints) * concurrency),
+                                            thread_name_prefix="webhook")
+        self._thread = threading.Thread(target=self._run, name="webhook-dispatcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Webhook dispatcher {WORKER_ID} started ({len(self.endpoints)} endpoints, "
+                    f"concurrency={self.concurrency}, batch={WEBHOOK_BATCH_SIZE})")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._executor.shutdown(wait=False)
+        self._client.close()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            full_batch = False
+            for endpoint in self.endpoints:
+                with self._inflight_lock:
+                    if self._inflight[endpoint] >= self.concurrency:
+                        continue
+                try:
+                    batch = claim_batch(endpoint)
+                except Exception as e:
+                    logger.warning(f"Failed to claim webhook events: {e}")
+                    break
+                if not batch:
+                    continue
+                full_batch = full_batch or len(batch) >= WEBHOOK_BATCH_SIZE
+                with self._inflight_lock:
+                    self._inflight[endpoint] += 1
+                self._executor.submit(self._send, endpoint, batch)
+            # 가득 찬 배치를 보냈으면 남은 이벤트가 있을 수 있으므로 바로 다시 확인
+            if not full_batch:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _send(self, endpoint: str, batch: List[dict]):
+        try:
+            deliver_batch(self._client, endpoint, batch)
+        finally:
+            with self._inflight_lock:
+                self._inflight[endpoint] -= 1
+            self._wake.set()
+
+
+_dispatcher = None
+
+
+def start_webhook_dispatcher():
+    """웹훅 전송 스레드 시작 (startup 이벤트에서 호출, WEBHOOK_URLS가 있을 때만)"""
+    global _dispatcher
+    if not WEBHOOK_URLS or not WEBHOOK_DISPATCHER_ENABLED or _dispatcher is not None:
+        return
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set, webhook requests will not be signed")
+    _dispatcher = WebhookDispatcher(WEBHOOK_URLS)
+    _dispatcher.start()
+
+
+def stop_webhook_dispatcher():
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.stop()
+        _dispatcher = None
+
+
+# ==================== 정리 ====================
+
+@job_handler("purge_webhook_outbox")
+def purge_webhook_outbox(db: Session, payload: dict):
+    """전송 완료/실패 후 WEBHOOK_RETENTION_DAYS 일이 지난 이벤트 삭제"""
+    retention = float(payload.get("retention_days", WEBHOOK_RETENTION_DAYS))
+    cutoff = _utcnow() - timedelta(days=retention)
+    deleted = (
+        db.query(WebhookOutbox)
+        .filter(WebhookOutbox.status.in_(("delivered", "failed")), WebhookOutbox.created_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    logger.info(f"Purged {deleted} webhook outbox events")
+    return {"deleted": deleted}
+
+
+@periodic_task("webhook-cleanup", interval=WEBHOOK_CLEANUP_INTERVAL)
+def schedule_webhook_cleanup(db: Session):
+    enqueue(db, "purge_webhook_outbox")
+
+
+# ==================== API ====================
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/webhooks")
+def webhook_status(
+    status: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_token)
+):
+    """설정된 엔드포인트와 최근 outbox 이벤트 (최신순)"""
+    query = db.query(WebhookOutbox)
+    if status:
+        query = query.filter(WebhookOutbox.status == status)
+    rows = query.order_by(WebhookOutbox.id.desc()).limit(min(max(limit, 1), 200)).all()
+    return {
+        "endpoints": [_endpoint_label(endpoint) for endpoint in WEBHOOK_URLS],
+        "signed": bool(WEBHOOK_SECRET),
+        "events": [
+            {
+                "id": row.id,
+                "endpoint": _endpoint_label(row.endpoint),
+                "event": row.event,
+                "node_id": row.node_id,
+                "status": row.status,
+                "attempts": row.attempts,
+                "next_attempt_at": row.next_attempt_at,
+                "last_error": row.last_error,
+                "created_at": row.created_at,
+                "delivered_at": row.delivered_at,
+            }
+            for row in rows
+        ]
+    }
+
+
+@router.post("/webhooks/test")
+def send_test_event(
+    db: Session = Depends(get_db),
+    token: str = Depends(verify_token)
+):
+    """모든 엔드포인트로 webhook.test 이벤트 전송 (수신 측 서명 확인용)"""
+    emit_event(db, "webhook.test", data={"sent_by": WORKER_ID})
+    db.commit()
+    return {"endpoints": len(WEBHOOK_URLS)}
@@ -3,33 +3,37 @@ Worker Node Integration API
 VPN 등록과 워커노드 플랫폼 등록을 통합하는 API
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Response, Form
+from fastapi import APIRouter, Depends, HTTPException, Response, Form, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from database import SessionLocal
-from models import Node, QRToken
+from models import Node
 from simple_worker_docker_runner import generate_simple_worker_runner, generate_simple_worker_runner_wsl
-from utils import get_lan_ip, validate_lan_ip
-from typing import Optional
+from utils import get_lan_ip, validate_lan_ip, render_qr_data_uri, download_response
+from metrics import track_render
+from settings import get_setting, public_server_host
+from jobs import enqueue, job_handler
+from webhooks import emit_event, NODE_INSTALLED
+from tokens import issue_install_token, load_install_token, record_issued_token, consume_install_token
+from node_cache import get_node, get_nodes
+from artifacts import artifact_digest, get_or_render, open_artifact, encode_chunks, source_digest
+from serialization import FastJSONResponse
+from static_assets import split_inline_assets, compile_page, compiled_response, html_response, register_asset, PAGE_CACHE_CONTROL
+from typing import List, Optional
+from functools import lru_cache
 import json
 import logging
-import qrcode
-import io
-import base64
 from datetime import datetime, timedelta, timezone
 import secrets
 import os
 
 logger = logging.getLogger(__name__)
 
-# Global configuration - 환경변수에서 한 번만 로드
-LOCAL_SERVER_IP = os.getenv('LOCAL_SERVER_IP', '192.168.0.88')
-CENTRAL_SERVER_URL = os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000')
-
 # GUI 모듈 import 시도 (옵션)
 try:
-    from gui.worker_setup_gui_modular import generate_worker_setup_gui_modular
+    from gui.worker_setup_gui_modular import generate_worker_setup_gui_modular, iter_worker_setup_gui_modular
     GUI_MODULE_AVAILABLE = True
     logger.info("GUI module loaded successfully")
 except ImportError as e:
@@ -39,6 +43,9 @@ except Exception as e:
     logger.error(f"Error loading GUI module: {e}")
     GUI_MODULE_AVAILABLE = False
 
+# setup-gui 생성기 코드 다이제스트 (코드가 바뀌면 저장된 아티팩트를 다시 생성)
+SETUP_GUI_SOURCE = source_digest(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gui"))
+
 router = APIRouter()
 
 def get_db():
@@ -55,18 +62,7 @@ class WorkerEnvironmentRequest(BaseModel):
     central_server_ip: Optional[str] = None
     hostname: Optional[str] = None
 
-@router.get("/worker/setup")
-async def worker_setup_page():
-    """워커노드 설정 페이지"""
-    central_server_url = CENTRAL_SERVER_URL
-    
-    # Response Headers for better performance
-    headers = {
-        "Cache-Control": "public, max-age=3600",
-        "Connection": "close"
-    }
-    
-    html_content = f"""
+WORKER_SETUP_TEMPLATE = """
     <!DOCTYPE html>
     <html lang="ko">
     <head>
@@ -74,8 +70,8 @@ async def worker_setup_page():
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>워커노드 통합 설정</title>
         <style>
-            * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-            body {{
+            * { margin: 0; padding: 0; box-sizing: border-box; }
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
                 background: linear-gradient(135deg, #f8fafc 0%, #e0f2fe 50%, #c7d2fe 100%);
                 min-height: 100vh;
@@ -83,8 +79,8 @@ async def worker_setup_page():
                 align-items: center;
                 justify-content: center;
                 padding: 20px;
-            }}
-            .container {{
+            }
+            .container {
                 background: white;
                 border-radius: 20px;
                 box-shadow: 0 20px 60px rgba(0,0,0,0.1);
@@ -92,8 +88,8 @@ async def worker_setup_page():
                 width: 100%;
                 padding: 40px;
                 border: 1px solid #e2e8f0;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #1e293b;
                 margin-bottom: 10px;
                 font-size: 28px;
@@ -101,22 +97,22 @@ async def worker_setup_page():
                 -webkit-background-clip: text;
                 -webkit-text-fill-color: transparent;
                 background-clip: text;
-            }}
-            .subtitle {{
+            }
+            .subtitle {
                 color: #64748b;
                 margin-bottom: 30px;
                 font-size: 14px;
-            }}
-            .form-group {{
+            }
+            .form-group {
                 margin-bottom: 20px;
-            }}
-            label {{
+            }
+            label {
                 display: block;
                 margin-bottom: 8px;
                 color: #475569;
                 font-weight: 500;
-            }}
-            input, select {{
+            }
+            input, select {
                 width: 100%;
                 padding: 12px;
                 border: 2px solid #e2e8f0;
@@ -125,12 +121,12 @@ async def worker_setup_page():
                 transition: border-color 0.3s;
                 background: white;
                 color: #1e293b;
-            }}
-            input:focus, select:focus {{
+            }
+            input:focus, select:focus {
                 outline: none;
                 border-color: #7fbf55;
-            }}
-            .btn {{
+            }
+            .btn {
                 width: 100%;
                 padding: 14px;
                 background: linear-gradient(135deg, #7fbf55 0%, #69a758 100%);
@@ -141,15 +137,15 @@ async def worker_setup_page():
                 font-weight: 600;
                 cursor: pointer;
                 transition: transform 0.2s, box-shadow 0.2s;
-            }}
-            .btn:hover {{
+            }
+            .btn:hover {
                 transform: translateY(-2px);
                 box-shadow: 0 10px 20px rgba(127, 191, 85, 0.3);
-            }}
-            .btn:active {{
+            }
+            .btn:active {
                 transform: translateY(0);
-            }}
-            .result {{
+            }
+            .result {
                 display: none;
                 margin-top: 30px;
                 padding: 20px;
@@ -157,17 +153,17 @@ async def worker_setup_page():
                 border-radius: 8px;
                 text-align: center;
                 border: 1px solid #e2e8f0;
-            }}
-            .qr-code {{
+            }
+            .qr-code {
                 margin: 20px 0;
-            }}
-            .qr-code img {{
+            }
+            .qr-code img {
                 max-width: 256px;
                 border: 4px solid white;
                 border-radius: 8px;
                 box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-            }}
-            .install-link {{
+            }
+            .install-link {
                 display: inline-block;
                 margin-top: 15px;
                 padding: 10px 20px;
@@ -176,28 +172,28 @@ async def worker_setup_page():
                 text-decoration: none;
                 border-radius: 8px;
                 font-weight: 500;
-            }}
-            .install-link:hover {{
+            }
+            .install-link:hover {
                 background: #1e5090;
-            }}
-            .info-box {{
+            }
+            .info-box {
                 background: rgba(127, 191, 85, 0.1);
                 border-left: 4px solid #7fbf55;
                 padding: 12px;
                 margin-top: 20px;
                 border-radius: 4px;
-            }}
-            .info-box p {{
+            }
+            .info-box p {
                 color: #5c9f68;
                 font-size: 14px;
                 line-height: 1.5;
-            }}
-            .loading {{
+            }
+            .loading {
                 display: none;
                 text-align: center;
                 margin: 20px 0;
-            }}
-            .spinner {{
+            }
+            .spinner {
                 border: 3px solid #e2e8f0;
                 border-top: 3px solid #7fbf55;
                 border-radius: 50%;
@@ -205,11 +201,11 @@ async def worker_setup_page():
                 height: 40px;
                 animation: spin 1s linear infinite;
                 margin: 0 auto;
-            }}
-            @keyframes spin {{
-                0% {{ transform: rotate(0deg); }}
-                100% {{ transform: rotate(360deg); }}
-            }}
+            }
+            @keyframes spin {
+                0% { transform: rotate(0deg); }
+                100% { transform: rotate(360deg); }
+            }
         </style>
     </head>
     <body>
@@ -233,7 +229,7 @@ async def worker_setup_page():
                 <div class="form-group">
                     <label for="central_server_ip">중앙서버 IP</label>
                     <input type="text" id="central_server_ip" name="central_server_ip" 
-                           value="{central_server_url.replace('http://', '').replace('https://', '').split(':')[0]}" 
+                           value="{CENTRAL_SERVER_IP}" 
                            placeholder="예: 192.168.0.88">
                 </div>
                 
@@ -275,31 +271,31 @@ async def worker_setup_page():
         </div>
         
         <script>
-            document.getElementById('workerForm').addEventListener('submit', async (e) => {{
+            document.getElementById('workerForm').addEventListener('submit', async (e) => {
                 e.preventDefault();
                 
                 const formData = new FormData(e.target);
                 const data = Object.fromEntries(formData.entries());
                 
                 // 빈 값 제거
-                Object.keys(data).forEach(key => {{
+                Object.keys(data).forEach(key => {
                     if (!data[key]) delete data[key];
-                }});
+                });
                 
                 // 로딩 표시
                 document.querySelector('.loading').style.display = 'block';
                 document.querySelector('button[type="submit"]').disabled = true;
                 
-                try {{
-                    const response = await fetch('/worker/generate-qr', {{
+                try {
+                    const response = await fetch('/worker/generate-qr', {
                         method: 'POST',
-                        headers: {{ 'Content-Type': 'application/json' }},
+                        headers: { 'Content-Type': 'application/json' },
                         body: JSON.stringify(data)
-                    }});
+                    });
                     
-                    if (!response.ok) {{
+                    if (!response.ok) {
                         throw new Error('QR 코드 생성 실패');
-                    }}
+                    }
                     
                     const result = await response.json();
                     
@@ -313,22 +309,22 @@ async def worker_setup_page():
                     // 결과 표시
                     document.getElementById('result').style.display = 'block';
                     
-                }} catch (error) {{
+                } catch (error) {
                     alert('오류: ' + error.message);
-                }} finally {{
+                } finally {
                     document.querySelector('.loading').style.display = 'none';
                     document.querySelector('button[type="submit"]').disabled = false;
-                }}
-            }});
+                }
+            });
             
-            function openInNewTab() {{
+            function openInNewTab() {
                 const url = document.getElementById('installUrl').value;
-                if (url) {{
+                if (url) {
                     window.open(url, '_blank');
-                }}
-            }}
+                }
+            }
 
-            function copyUrl() {{
+            function copyUrl() {
                 const urlInput = document.getElementById('installUrl');
                 urlInput.select();
                 document.execCommand('copy');
@@ -339,15 +335,32 @@ async def worker_setup_page():
                 btn.textContent = '✅ 복사됨!';
                 btn.style.background = '#28a745';
 
-                setTimeout(() => {{
+                setTimeout(() => {
                     btn.textContent = originalText;
-                }}, 2000);
-            }}
+                }, 2000);
+            }
         </script>
     </body>
     </html>
     """
-    return HTMLResponse(content=html_content, headers=headers)
+
+# CSS/JS는 정적 파일로 분리해 두고, 페이지는 중앙서버 IP별로 한 번만 만들어 압축
+WORKER_SETUP_PAGE = split_inline_assets("worker-setup", WORKER_SETUP_TEMPLATE)
+
+
+@lru_cache(maxsize=8)
+def _compiled_worker_setup_page(central_server_ip: str):
+    return compile_page(WORKER_SETUP_PAGE.replace('{CENTRAL_SERVER_IP}', central_server_ip))
+
+
+@router.get("/worker/setup")
+async def worker_setup_page(request: Request):
+    """워커노드 설정 페이지"""
+    central_server_url = get_setting("CENTRAL_SERVER_URL")
+    central_server_ip = central_server_url.replace('http://', '').replace('https://', '').split(':')[0]
+    return compiled_response(
+        _compiled_worker_setup_page(central_server_ip), request, {"Cache-Control": PAGE_CACHE_CONTROL}
+    )
 
 @router.post("/api/worker/setup")
 async def api_worker_setup(
@@ -391,12 +404,11 @@ async def api_worker_setup(
             existing.hostname = request.hostname or request.node_id
             existing.docker_env_vars = json.dumps(metadata)
             existing.updated_at = datetime.now(timezone.utc)
+            enqueue_setup_gui_prerender(db, existing.node_id)
             db.commit()
 
             # 다운로드 URL 생성
-            server_host = os.getenv('SERVERURL', 'localhost')
-            if server_host == 'auto' or not server_host or server_host == 'localhost':
-                server_host = LOCAL_SERVER_IP
+            server_host = public_server_host()
 
             download_url = f"http://{server_host}:5000/api/download/{existing.node_id}/setup-gui"
 
@@ -441,25 +453,27 @@ async def api_worker_setup(
 
         # LAN IP 감지 (VPN 없이 워커의 실제 LAN IP 사용)
         try:
+            detect_job = None
             # LAN IP 감지
             lan_ip = get_lan_ip()
             if not lan_ip or lan_ip == "0.0.0.0":
                 logger.warning(f"Could not detect LAN IP for node {request.node_id}, keeping as pending")
-                # LAN IP 감지 실패 시 None으로 두고 pending 상태 유지
+                # LAN IP 감지 실패 시 None으로 두고 pending 상태 유지 - 백그라운드에서 재시도
                 target_node.vpn_ip = None
                 target_node.status = "pending"
+                detect_job = enqueue(db, "detect_lan_ip", {"node_id": request.node_id})
             else:
                 # LAN IP 감지 성공 시 등록 완료
                 target_node.vpn_ip = lan_ip  # 필드명은 vpn_ip지만 실제로는 LAN IP 저장
                 target_node.status = "registered"
                 logger.info(f"Successfully registered worker node {request.node_id} via API with LAN IP {lan_ip}")
 
+            # 첫 다운로드가 생성 비용을 치르지 않도록 설치 파일 미리 생성
+            enqueue_setup_gui_prerender(db, request.node_id)
             db.commit()
 
             # 다운로드 URL 생성
-            server_host = os.getenv('SERVERURL', 'localhost')
-            if server_host == 'auto' or not server_host or server_host == 'localhost':
-                server_host = LOCAL_SERVER_IP
+            server_host = public_server_host()
 
             download_url = f"http://{server_host}:5000/api/download/{request.node_id}/setup-gui"
 
@@ -468,7 +482,8 @@ async def api_worker_setup(
                 "lan_ip": lan_ip,
                 "download_url": download_url,
                 "status": "registered",
-                "message": "Node registered successfully"
+                "message": "Node registered successfully",
+                "job_id": detect_job.id if detect_job else None
             }
 
         except Exception as e:
@@ -492,19 +507,12 @@ async def generate_worker_qr(
 ):
     """워커노드용 QR 코드 및 설치 링크 생성"""
     try:
-        # 토큰 생성
-        token = secrets.token_urlsafe(32)
+        # 서명 토큰 생성 (설치 시 DB 조회 없이 확인)
         expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
-        
-        # 토큰 정보를 DB에 저장
-        qr_token = QRToken(
-            token=token,
-            node_id=request.node_id,
-            node_type="worker",
-            expires_at=expires_at,
-            used=False
-        )
-        db.add(qr_token)
+        token = issue_install_token(request.node_id, "worker", expires_at)
+
+        # 발급 감사 기록 (INSTALL_TOKEN_AUDIT)
+        record_issued_token(db, token, request.node_id, "worker", expires_at)
         
         # 워커노드 메타데이터도 토큰과 함께 저장 (JSON 형태로)
         # 중앙서버 IP를 URL로 변환
@@ -565,9 +573,10 @@ async def generate_worker_qr(
 
                 if not lan_ip or lan_ip == "0.0.0.0":
                     logger.warning(f"Could not detect LAN IP for {request.node_id}, keeping as pending")
-                    # LAN IP 감지 실패 시 None으로 두고 pending 상태 유지
+                    # LAN IP 감지 실패 시 None으로 두고 pending 상태 유지 - 백그라운드에서 재시도
                     target_node.vpn_ip = None
                     target_node.status = "pending"
+                    enqueue(db, "detect_lan_ip", {"node_id": request.node_id})
                 else:
                     # LAN IP 감지 성공 시 등록 완료
                     target_node.vpn_ip = lan_ip  # 필드명은 vpn_ip지만 실제로는 LAN IP
@@ -579,31 +588,25 @@ async def generate_worker_qr(
             except Exception as e:
                 logger.error(f"Failed to register worker node: {e}")
                 # 실패해도 QR 코드는 생성되도록 계속 진행
+
+        # 설치 페이지에서 바로 받을 수 있도록 설치 파일 미리 생성
+        enqueue_setup_gui_prerender(db, request.node_id)
+        db.commit()
         
         # 설치 URL 생성
-        # SERVERURL 환경변수 사용 (docker-compose.yml에서 설정)
-        server_host = os.getenv('SERVERURL', 'localhost')
-        if server_host == 'auto' or not server_host or server_host == 'localhost':
-            # LOCAL_SERVER_IP 사용 (우선순위)
-            server_host = LOCAL_SERVER_IP
+        # SERVERURL 환경변수 > 공유 설정 LOCAL_SERVER_IP
+        server_host = public_server_host()
         
         server_url = f"http://{server_host}:5000"
         install_url = f"{server_url}/worker/install/{token}"
         
         # QR 코드 생성
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(install_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode()
+        qr_code = render_qr_data_uri(install_url)
         
         return {
             "token": token,
             "install_url": install_url,
-            "qr_code": f"data:image/png;base64,{qr_base64}",
+            "qr_code": qr_code,
             "expires_at": expires_at.isoformat(),
             "node_id": request.node_id
         }
@@ -644,36 +647,10 @@ async def generate_worker_qr(
 #         }
 #     )
 
-@router.get("/worker/install/{token}")
-async def worker_install_page(token: str, db: Session = Depends(get_db)):
-    """워커노드 자동 설치 페이지"""
-    
-    # 토큰 확인
-    qr_token = db.query(QRToken).filter(QRToken.token == token).first()
-    if not qr_token:
-        return HTMLResponse(content="<h1>❌ 유효하지 않은 토큰입니다</h1>", status_code=404)
-    
-    if datetime.now(timezone.utc) > qr_token.expires_at:
-        return HTMLResponse(content="<h1>⏰ 만료된 토큰입니다</h1>", status_code=400)
-    
-    # 노드 정보 가져오기
-    node = db.query(Node).filter(Node.node_id == qr_token.node_id).first()
-    if not node:
-        return HTMLResponse(content="<h1>❌ 노드 정보를 찾을 수 없습니다</h1>", status_code=404)
-    
-    # Node 테이블의 값 우선, 없으면 metadata에서 가져오기
-    metadata = json.loads(node.docker_env_vars) if node.docker_env_vars else {}
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="ko">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>워커노드 자동 설치</title>
-        <style>
-            * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-            body {{
+# 설치 페이지 스타일 (노드마다 같으므로 정적 파일로 분리, 스크립트는 노드 값이 들어가므로 인라인 유지)
+WORKER_INSTALL_CSS = """
+            * { margin: 0; padding: 0; box-sizing: border-box; }
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
                 background: linear-gradient(135deg, #f8fafc 0%, #e0f2fe 50%, #c7d2fe 100%);
                 min-height: 100vh;
@@ -681,8 +658,8 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                 align-items: center;
                 justify-content: center;
                 padding: 20px;
-            }}
-            .container {{
+            }
+            .container {
                 background: white;
                 border-radius: 20px;
                 box-shadow: 0 20px 60px rgba(0,0,0,0.1);
@@ -690,50 +667,50 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                 width: 100%;
                 padding: 40px;
                 border: 1px solid #e2e8f0;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #1e293b;
                 margin-bottom: 20px;
                 background: linear-gradient(135deg, #7fbf55 0%, #2665a0 100%);
                 -webkit-background-clip: text;
                 -webkit-text-fill-color: transparent;
                 background-clip: text;
-            }}
-            .info-card {{
+            }
+            .info-card {
                 background: #f8fafc;
                 border-radius: 8px;
                 padding: 20px;
                 margin-bottom: 20px;
                 border: 1px solid #e2e8f0;
-            }}
-            .info-row {{
+            }
+            .info-row {
                 display: flex;
                 justify-content: space-between;
                 margin-bottom: 10px;
                 padding-bottom: 10px;
                 border-bottom: 1px solid #e0e0e0;
-            }}
-            .info-row:last-child {{
+            }
+            .info-row:last-child {
                 border-bottom: none;
                 margin-bottom: 0;
                 padding-bottom: 0;
-            }}
-            .info-label {{
+            }
+            .info-label {
                 font-weight: 600;
                 color: #475569;
-            }}
-            .info-value {{
+            }
+            .info-value {
                 color: #1e293b;
-            }}
-            .status {{
+            }
+            .status {
                 text-align: center;
                 margin: 30px 0;
-            }}
-            .status-icon {{
+            }
+            .status-icon {
                 font-size: 48px;
                 margin-bottom: 10px;
-            }}
-            .btn {{
+            }
+            .btn {
                 width: 100%;
                 padding: 14px;
                 background: linear-gradient(135deg, #7fbf55 0%, #69a758 100%);
@@ -747,31 +724,31 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                 text-decoration: none;
                 display: inline-block;
                 text-align: center;
-            }}
-            .btn:hover {{
+            }
+            .btn:hover {
                 transform: translateY(-2px);
                 box-shadow: 0 10px 20px rgba(127, 191, 85, 0.3);
-            }}
-            .btn-success {{
+            }
+            .btn-success {
                 background: linear-gradient(135deg, #7fbf55 0%, #5c9f68 100%);
-            }}
-            .steps {{
+            }
+            .steps {
                 margin: 30px 0;
-            }}
-            .step {{
+            }
+            .step {
                 display: flex;
                 align-items: center;
                 margin-bottom: 15px;
                 opacity: 0.5;
                 transition: opacity 0.3s;
-            }}
-            .step.active {{
+            }
+            .step.active {
                 opacity: 1;
-            }}
-            .step.completed {{
+            }
+            .step.completed {
                 opacity: 1;
-            }}
-            .step-icon {{
+            }
+            .step-icon {
                 width: 30px;
                 height: 30px;
                 border-radius: 50%;
@@ -781,22 +758,22 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                 justify-content: center;
                 margin-right: 15px;
                 font-size: 14px;
-            }}
-            .step.active .step-icon {{
+            }
+            .step.active .step-icon {
                 background: #7fbf55;
                 color: white;
                 animation: pulse 1.5s infinite;
-            }}
-            .step.completed .step-icon {{
+            }
+            .step.completed .step-icon {
                 background: #7fbf55;
                 color: white;
-            }}
-            @keyframes pulse {{
-                0% {{ transform: scale(1); }}
-                50% {{ transform: scale(1.1); }}
-                100% {{ transform: scale(1); }}
-            }}
-            .code-block {{
+            }
+            @keyframes pulse {
+                0% { transform: scale(1); }
+                50% { transform: scale(1.1); }
+                100% { transform: scale(1); }
+            }
+            .code-block {
                 background: #1e293b;
                 color: #f8f8f2;
                 padding: 20px;
@@ -805,8 +782,8 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                 font-family: 'Courier New', monospace;
                 font-size: 14px;
                 overflow-x: auto;
-            }}
-            .loading {{
+            }
+            .loading {
                 display: inline-block;
                 width: 20px;
                 height: 20px;
@@ -815,12 +792,42 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                 border-radius: 50%;
                 animation: spin 1s linear infinite;
                 margin-left: 10px;
-            }}
-            @keyframes spin {{
-                0% {{ transform: rotate(0deg); }}
-                100% {{ transform: rotate(360deg); }}
-            }}
-        </style>
+            }
+            @keyframes spin {
+                0% { transform: rotate(0deg); }
+                100% { transform: rotate(360deg); }
+            }
+"""
+WORKER_INSTALL_CSS_URL = register_asset("worker-install", WORKER_INSTALL_CSS, "css")
+
+@router.get("/worker/install/{token}")
+async def worker_install_page(token: str, request: Request, db: Session = Depends(get_db)):
+    """워커노드 자동 설치 페이지"""
+    
+    # 토큰 확인 (서명 검증, DB 조회 없음)
+    qr_token = load_install_token(db, token, "worker")
+    if not qr_token:
+        return HTMLResponse(content="<h1>❌ 유효하지 않은 토큰입니다</h1>", status_code=404)
+    
+    if datetime.now(timezone.utc) > qr_token.expires_at:
+        return HTMLResponse(content="<h1>⏰ 만료된 토큰입니다</h1>", status_code=400)
+    
+    # 노드 정보 가져오기
+    node = get_node(qr_token.node_id, db)
+    if not node:
+        return HTMLResponse(content="<h1>❌ 노드 정보를 찾을 수 없습니다</h1>", status_code=404)
+    
+    # Node 테이블의 값 우선, 없으면 metadata에서 가져오기
+    metadata = json.loads(node.docker_env_vars) if node.docker_env_vars else {}
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="ko">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>워커노드 자동 설치</title>
+        <link rel="stylesheet" href="{WORKER_INSTALL_CSS_URL}">
     </head>
     <body>
         <div class="container">
@@ -837,7 +844,7 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                 </div>
                 <div class="info-row">
                     <span class="info-label">중앙서버 IP:</span>
-                    <span class="info-value">{node.central_server_url or metadata.get('central_server_url', os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000'))}</span>
+                    <span class="info-value">{node.central_server_url or metadata.get('central_server_url', get_setting('CENTRAL_SERVER_URL'))}</span>
                 </div>
                 <div class="info-row">
                     <span class="info-label">호스트명:</span>
@@ -1138,7 +1145,7 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
                     return;
                 }}
                 
-                if (!installData || !installData.docker_runner) {{
+                if (!installData || !(installData.artifacts || installData.docker_runner)) {{
                     alert('아직 설치 프로세스가 완료되지 않았습니다.\\n\\n"설치 시작" 버튼을 먼저 클릭하여 설치 프로세스를 완료한 후 다운로드하세요.');
                     const btn = document.getElementById('startBtn');
                     if (btn && btn.style.display === 'none') {{
@@ -1231,7 +1238,18 @@ async def worker_install_page(token: str, db: Session = Depends(get_db)):
     </html>
     """
     
-    return HTMLResponse(content=html_content)
+    return html_response(request, html_content)
+
+
+def _installed_result(node: Node) -> dict:
+    """이미 설치된 노드의 process-installation 응답"""
+    return {
+        "status": "existing",
+        "node_id": node.node_id,
+        "lan_ip": node.vpn_ip,  # DB 필드명은 vpn_ip지만 실제는 LAN IP
+        "artifacts": install_artifacts(node),
+        "message": "Already configured"
+    }
 
 
 @router.post("/worker/process-installation/{token}")
@@ -1241,8 +1259,8 @@ async def process_worker_installation(
 ):
     """워커노드 설치 처리 - VPN 등록 및 설정 생성"""
     
-    # 토큰 확인
-    qr_token = db.query(QRToken).filter(QRToken.token == token).first()
+    # 토큰 확인 (서명 검증, DB 조회 없음)
+    qr_token = load_install_token(db, token, "worker")
     if not qr_token:
         raise HTTPException(status_code=404, detail="Invalid token")
     
@@ -1253,21 +1271,14 @@ async def process_worker_installation(
     node = db.query(Node).filter(Node.node_id == qr_token.node_id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
-    
+
     try:
-        # 이미 등록된 경우
+        # 이미 등록된 경우 - 이 토큰으로 처음 처리할 때만 사용 기록과 설치 이벤트, 재시도/새로고침이면 결과만 반환
         if node.status != "pending":
-            # Docker runner 생성 (GUI 통합 버전)
-            docker_runner = generate_worker_setup_gui_modular(node)
-
-            return {
-                "status": "existing",
-                "node_id": node.node_id,
-                "lan_ip": node.vpn_ip,  # DB 필드명은 vpn_ip지만 실제는 LAN IP
-                "install_script": generate_install_script(node),
-                "docker_runner": docker_runner,
-                "message": "Already configured"
-            }
+            if consume_install_token(db, qr_token):
+                emit_event(db, NODE_INSTALLED, node.node_id, {"node_type": "worker", "lan_ip": node.vpn_ip})
+                db.commit()
+            return _installed_result(node)
 
         # LAN IP 감지
         lan_ip = get_lan_ip()
@@ -1287,36 +1298,124 @@ async def process_worker_installation(
         docker_env = {
             "NODE_ID": node.node_id,
             "DESCRIPTION": node.description or metadata.get('description', ''),
-            "CENTRAL_SERVER_URL": node.central_server_url or metadata.get('central_server_url', os.getenv('CENTRAL_SERVER_URL', 'http://192.168.0.88:8000')),
+            "CENTRAL_SERVER_URL": node.central_server_url or metadata.get('central_server_url', get_setting('CENTRAL_SERVER_URL')),
             "HOST_IP": lan_ip
         }
         node.docker_env_vars = json.dumps(docker_env)
-
-        db.commit()
-
-        # 토큰을 사용됨으로 표시
-        qr_token.used = True
+        if node.status == "registered":
+            # 설치 완료로 바뀌는 트랜잭션에서만 토큰 사용 기록 (LAN IP 감지에 실패하면 같은 토큰으로 재시도 가능)
+            if not consume_install_token(db, qr_token):
+                # 같은 토큰의 다른 요청이 먼저 설치를 끝냄
+                db.rollback()
+                db.refresh(node)
+                return _installed_result(node)
+            emit_event(db, NODE_INSTALLED, node.node_id, {"node_type": "worker", "lan_ip": lan_ip})
+
+        # LAN IP/환경변수가 바뀌었으므로 설치 파일은 백그라운드에서 다시 생성 (다운로드가 먼저 오면 그때 생성)
+        enqueue_setup_gui_prerender(db, node.node_id)
         db.commit()
 
-        # Docker runner 생성 (GUI 통합 버전 - 모듈화)
-        docker_runner = generate_worker_setup_gui_modular(node)
-
-        # Linux/Mac용 스크립트도 제공 (선택사항)
-        install_script = generate_install_script(node)
-
         return {
             "status": "success",
             "node_id": node.node_id,
             "lan_ip": lan_ip,
             "docker_env": docker_env,
-            "docker_runner": docker_runner,
-            "install_script": install_script
+            "artifacts": install_artifacts(node)
         }
         
     except Exception as e:
         logger.error(f"Installation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@job_handler("detect_lan_ip")
+def detect_lan_ip_job(db: Session, payload: dict):
+    """등록 시 LAN IP 감지에 실패해 pending 상태인 노드의 LAN IP 재감지"""
+    node = db.query(Node).filter(Node.node_id == payload["node_id"]).first()
+    if not node or node.status != "pending":
+        return {"skipped": True}
+
+    lan_ip = get_lan_ip()
+    if not lan_ip or lan_ip == "0.0.0.0":
+        # 예외를 던지면 백오프 후 재시도
+        raise RuntimeError(f"Could not detect LAN IP for node {node.node_id}")
+
+    node.vpn_ip = lan_ip  # 필드명은 vpn_ip지만 실제로는 LAN IP 저장
+    node.status = "registered"
+    node.updated_at = datetime.now(timezone.utc)
+    logger.info(f"Registered pending worker node {node.node_id} with LAN IP {lan_ip}")
+    emit_event(db, NODE_INSTALLED, node.node_id, {"node_type": "worker", "lan_ip": lan_ip})
+    # LAN IP가 바뀌었으므로 설치 파일 다시 생성
+    enqueue_setup_gui_prerender(db, node.node_id)
+    return {"lan_ip": lan_ip}
+
+def _setup_gui_inputs(node: Node) -> dict:
+    """setup-gui 결과에 영향을 주는 입력값 (아티팩트 키)"""
+    return {
+        "generator": SETUP_GUI_SOURCE,
+        "node_id": node.node_id,
+        "vpn_ip": node.vpn_ip,
+        "central_server_url": node.central_server_url,
+        "docker_env_vars": node.docker_env_vars,
+        "LOCAL_SERVER_IP": get_setting("LOCAL_SERVER_IP"),
+        "CENTRAL_SERVER_URL": get_setting("CENTRAL_SERVER_URL"),
+    }
+
+def setup_gui_artifact(node: Node):
+    """노드의 setup-gui .bat 아티팩트 경로 (저장된 파일이 없으면 지금 생성)"""
+    return get_or_render(
+        "setup_gui", node.node_id, _setup_gui_inputs(node),
+        lambda: encode_chunks(iter_worker_setup_gui_modular(node))
+    )
+
+def open_setup_gui(node: Node):
+    """(저장된 파일 경로 또는 None, .bat 내용 조각) - 없으면 생성하면서 저장"""
+    return open_artifact(
+        "setup_gui", node.node_id, _setup_gui_inputs(node),
+        lambda: encode_chunks(iter_worker_setup_gui_modular(node))
+    )
+
+def _install_script_inputs(node: Node) -> dict:
+    """install-script 결과에 영향을 주는 입력값"""
+    return {
+        "node_id": node.node_id,
+        "vpn_ip": node.vpn_ip,
+        "docker_env_vars": node.docker_env_vars,
+    }
+
+def install_artifacts(node: Node) -> dict:
+    """설치 파일 다운로드 URL과 다이제스트 (생성하지 않음)
+
+    다이제스트는 생성 입력값의 SHA-256이라 내용이 같으면 같고 내용이 바뀌면 달라집니다.
+    클라이언트는 이전 값과 비교해 다시 받을지 정할 수 있습니다.
+    """
+    artifacts = {
+        "install_script": {
+            "url": f"/api/download/{node.node_id}/install-script",
+            "digest": artifact_digest("install_script", _install_script_inputs(node)),
+        },
+    }
+    if GUI_MODULE_AVAILABLE:
+        artifacts["setup_gui"] = {
+            "url": f"/api/download/{node.node_id}/setup-gui",
+            "digest": artifact_digest("setup_gui", _setup_gui_inputs(node)),
+        }
+    return artifacts
+
+def enqueue_setup_gui_prerender(db: Session, node_id: str):
+    """setup-gui 아티팩트 미리 생성 작업 추가 (commit은 호출자가 수행)"""
+    if GUI_MODULE_AVAILABLE:
+        enqueue(db, "render_setup_gui", {"node_id": node_id})
+
+@job_handler("render_setup_gui", max_attempts=3)
+def render_setup_gui_job(db: Session, payload: dict):
+    """setup-gui .bat을 아티팩트 저장소에 미리 생성"""
+    node = db.query(Node).filter(Node.node_id == payload["node_id"]).first()
+    if not node:
+        return {"skipped": True}
+    path = setup_gui_artifact(node)
+    return {"artifact": path.name, "size": path.stat().st_size}
+
+@track_render("install_script")
 def generate_install_script(node: Node) -> str:
     """워커노드 설치 스크립트 생성"""
     
@@ -1390,7 +1489,7 @@ echo "========================================="
 @router.get("/worker/status/{node_id}")
 async def get_worker_status(node_id: str, db: Session = Depends(get_db)):
     """워커노드 상태 조회"""
-    node = db.query(Node).filter(Node.node_id == node_id).first()
+    node = get_node(node_id, db)
 
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
@@ -1408,14 +1507,72 @@ async def get_worker_status(node_id: str, db: Session = Depends(get_db)):
         "updated_at": node.updated_at
     }
 
+# 한 번에 조회할 수 있는 최대 노드 수
+NODE_STATUS_BATCH_MAX = int(os.getenv('NODE_STATUS_BATCH_MAX', '5000'))
+
+
+class NodeStatusBatchRequest(BaseModel):
+    """여러 워커노드 상태 조회 요청"""
+    node_ids: List[str] = Field(..., max_length=NODE_STATUS_BATCH_MAX, description="조회할 node_id 목록")
+
+
+def _parse_docker_env(raw: Optional[str]):
+    try:
+        return json.loads(raw) if raw else {}
+    except ValueError:
+        return None
+
+
+@router.post("/worker/status:batch")
+def get_worker_status_batch(request: NodeStatusBatchRequest, db: Session = Depends(get_db)):
+    """여러 워커노드 상태 한 번에 조회 (중앙서버 라운드마다 노드별로 /worker/status를 호출하지 않도록)
+
+    노드 캐시에 없는 노드만 쿼리 한 번(node_id = ANY(...))으로 읽습니다.
+    응답의 nodes는 node_id별 /worker/status/{node_id}와 같은 형식이고, 없는 노드는 missing에 들어갑니다.
+    docker_env가 JSON이 아니면 null입니다.
+    """
+    snapshots = get_nodes(request.node_ids, db)
+    nodes = {}
+    missing = []
+    for node_id in dict.fromkeys(request.node_ids):
+        node = snapshots.get(node_id)
+        if node is None:
+            missing.append(node_id)
+            continue
+        nodes[node_id] = {
+            "node_id": node.node_id,
+            "status": node.status,
+            "vpn_ip": node.vpn_ip,  # 호환성 위해 필드명 유지 (실제는 LAN IP)
+            "description": node.description,
+            "central_server_url": node.central_server_url,
+            "docker_env": _parse_docker_env(node.docker_env_vars),
+            "created_at": node.created_at,
+            "updated_at": node.updated_at
+        }
+    # 노드가 많으므로 응답 모델 검증 없이 바로 인코딩
+    return FastJSONResponse({"nodes": nodes, "missing": missing})
+
+@router.get("/api/download/{node_id}/install-script")
+async def download_install_script(node_id: str, request: Request, db: Session = Depends(get_db)):
+    """워커노드 설치 스크립트(Linux/Mac) 다운로드"""
+    node = get_node(node_id, db)
+    if not node:
+        raise HTTPException(status_code=404, detail=f"Node {node_id} not found")
+
+    script = generate_install_script(node)
+    return download_response(
+        request, iter([script.encode("utf-8")]), f"worker-setup-{node_id}.sh",
+        media_type="text/x-shellscript"
+    )
+
 @router.get("/api/download/{node_id}/setup-gui")
-async def download_setup_gui(node_id: str, db: Session = Depends(get_db)):
+async def download_setup_gui(node_id: str, request: Request, db: Session = Depends(get_db)):
     """워커노드 통합 설치 프로그램 다운로드"""
     try:
         logger.info(f"Download request for setup-gui: {node_id}")
 
         # 노드 조회
-        node = db.query(Node).filter(Node.node_id == node_id).first()
+        node = get_node(node_id, db)
 
         if not node:
             logger.error(f"Node not found: {node_id}")
@@ -1427,22 +1584,17 @@ async def download_setup_gui(node_id: str, db: Session = Depends(get_db)):
             logger.error("GUI module not available")
             raise HTTPException(status_code=500, detail="Setup-GUI module not available")
 
-        # setup-gui 배치 파일 생성
-        logger.info(f"Generating setup script for {node_id}")
-        setup_script = generate_worker_setup_gui_modular(node)
-        logger.info(f"Setup script generated successfully for {node_id}, length: {len(setup_script)}")
+        # setup-gui 배치 파일 - 미리 생성된 아티팩트가 있으면 파일 그대로,
+        # 없으면 생성되는 조각을 바로 스트리밍하면서 아티팩트로 저장
+        artifact, chunks = await run_in_threadpool(open_setup_gui, node)
 
         # 파일명 생성
         filename = f"DistributedAI_v2.0-worker-setup-{node_id}.bat"
 
-        # Response 생성
-        return Response(
-            content=setup_script,
+        return download_response(
+            request, chunks, filename,
             media_type="application/x-msdos-program",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "application/x-msdos-program"
-            }
+            path=artifact
         )
     except HTTPException:
         raise
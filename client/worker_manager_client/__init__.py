@@ -0,0 +1,16 @@
+"""
+Worker Manager Python 클라이언트
+"""
+from .client import NotFoundError, WorkerManagerClient, WorkerManagerError
+from .models import NodeResponse, SetupResult, StatusBatch, WorkerEnvironmentRequest, WorkerStatus
+
+__all__ = [
+    "WorkerManagerClient",
+    "WorkerManagerError",
+    "NotFoundError",
+    "WorkerEnvironmentRequest",
+    "NodeResponse",
+    "SetupResult",
+    "WorkerStatus",
+    "StatusBatch",
+]
@@ -0,0 +1,254 @@
+"""
+Worker Manager Client
+Worker Manager API 비동기 클라이언트
+
+- 연결 풀: httpx.AsyncClient 하나를 재사용해 HTTP/1.1 keep-alive 연결을 유지합니다 (요청마다 TCP/TLS 연결 생성 없음).
+- 재시도: 연결 오류와 429/502/503/504 응답은 지수 백오프(+지터)로 재시도하고, Retry-After 헤더가 있으면 따릅니다.
+  POST는 Idempotency-Key 헤더를 붙여 보내므로 재시도해도 서버에서 한 번만 처리됩니다.
+- 일괄 처리: register_many는 동시 요청 수를 제한해 여러 노드를 등록하고,
+  get_statuses는 /worker/status:batch로 상태를 한 번에 조회합니다.
+- 다운로드: 설치 파일은 메모리에 올리지 않고 디스크로 스트리밍합니다.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+import asyncio
+import logging
+import os
+import random
+import uuid
+
+import httpx
+
+from .models import NodeResponse, SetupResult, StatusBatch, WorkerEnvironmentRequest, WorkerStatus
+
+logger = logging.getLogger(__name__)
+
+# 재시도할 응답 코드 (admission 제한, 게이트웨이/과부하)
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# 서버의 NODE_STATUS_BATCH_MAX 기본값
+STATUS_BATCH_SIZE = 5000
+_DOWNLOAD_CHUNK = 64 * 1024
+
+
+class WorkerManagerError(Exception):
+    """API 오류 응답"""
+
+    def __init__(self, status_code: int, detail: Any, response: Optional[httpx.Response] = None):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.response = response
+
+
+class NotFoundError(WorkerManagerError):
+    """노드 없음 (404)"""
+
+
+def _error_from(response: httpx.Response) -> WorkerManagerError:
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    error_class = NotFoundError if response.status_code == 404 else WorkerManagerError
+    return error_class(response.status_code, detail, response)
+
+
+class WorkerManagerClient:
+    """Worker Manager API 비동기 클라이언트
+
+    async with WorkerManagerClient("http://192.168.0.88:8000", token="...") as client:
+        result = await client.register_worker(WorkerEnvironmentRequest(node_id="worker-1", description="GPU 1"))
+        statuses = await client.get_statuses(["worker-1", "worker-2"])
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: Optional[str] = None,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "WorkerManagerClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """연결 풀 닫기"""
+        await self._client.aclose()
+
+    # ==================== 요청/재시도 ====================
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _request(self, method: str, url: str, idempotency_key: Optional[str] = None,
+                       read_only: bool = False, **kwargs) -> httpx.Response:
+        """요청 전송 (재시도 포함). 2xx가 아니면 WorkerManagerError
+
+        POST는 idempotency_key가 있거나 조회용(read_only)일 때만 재시도합니다.
+        idempotency_key가 있으면 같은 키의 앞선 요청이 아직 처리 중이라는 409도 재시도합니다.
+        """
+        retryable = method != "POST" or idempotency_key is not None or read_only
+        if idempotency_key is not None:
+            kwargs["headers"] = {**kwargs.get("headers", {}), "Idempotency-Key": idempotency_key}
+
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if not retryable or attempt >= self.retries:
+                    raise
+                logger.warning(f"{method} {url} failed ({e!r}), retrying")
+            else:
+                in_progress = response.status_code == 409 and idempotency_key is not None
+                if ((response.status_code not in RETRY_STATUS_CODES and not in_progress)
+                        or not retryable or attempt >= self.retries):
+                    if response.is_success:
+                        return response
+                    raise _error_from(response)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying")
+
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    # ==================== 등록 ====================
+
+    async def register_worker(self, request: Union[WorkerEnvironmentRequest, Dict[str, Any]],
+                              idempotency_key: Optional[str] = None) -> SetupResult:
+        """워커노드 등록 (POST /api/worker/setup)
+
+        idempotency_key를 주지 않으면 새로 만들어 모든 재시도에 같은 키를 씁니다.
+        """
+        if isinstance(request, dict):
+            request = WorkerEnvironmentRequest(**request)
+        response = await self._request(
+            "POST", "/api/worker/setup",
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+            json=request.model_dump(exclude_none=True),
+        )
+        return SetupResult.model_validate(response.json())
+
+    async def register_many(
+        self,
+        requests: Iterable[Union[WorkerEnvironmentRequest, Dict[str, Any]]],
+        concurrency: int = 10,
+    ) -> List[Union[SetupResult, Exception]]:
+        """여러 워커노드 등록 (동시 요청 수 제한)
+
+        결과는 요청 순서대로이며, 실패한 항목은 예외 객체가 들어갑니다.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def register(request):
+            async with semaphore:
+                return await self.register_worker(request)
+
+        return await asyncio.gather(*(register(request) for request in requests), return_exceptions=True)
+
+    # ==================== 조회 ====================
+
+    async def list_nodes(self) -> List[NodeResponse]:
+        """모든 노드 목록 (GET /nodes, 토큰 필요)"""
+        response = await self._request("GET", "/nodes")
+        return [NodeResponse.model_validate(node) for node in response.json()]
+
+    async def get_status(self, node_id: str) -> WorkerStatus:
+        """워커노드 상태 (GET /worker/status/{node_id}). 없으면 NotFoundError"""
+        response = await self._request("GET", f"/worker/status/{node_id}")
+        return WorkerStatus.model_validate(response.json())
+
+    async def get_statuses(self, node_ids: Iterable[str], batch_size: int = STATUS_BATCH_SIZE,
+                           concurrency: int = 4) -> StatusBatch:
+        """여러 워커노드 상태 (POST /worker/status:batch를 batch_size개씩, 동시 concurrency개)
+
+        조회만 하므로 Idempotency-Key 없이 재시도합니다 (서버에 응답을 저장하지 않음).
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(chunk):
+            async with semaphore:
+                response = await self._request(
+                    "POST", "/worker/status:batch", read_only=True,
+                    json={"node_ids": chunk},
+                )
+                return StatusBatch.model_validate(response.json())
+
+        result = StatusBatch()
+        chunks = [node_ids[i:i + batch_size] for i in range(0, len(node_ids), batch_size)]
+        for batch in await asyncio.gather(*(fetch(chunk) for chunk in chunks)):
+            result.nodes.update(batch.nodes)
+            result.missing.extend(batch.missing)
+        return result
+
+    # ==================== 다운로드 ====================
+
+    async def _download(self, url: str, destination: Union[str, Path]) -> Path:
+        """url을 destination으로 스트리밍 저장 (임시 파일에 쓴 뒤 이름 변경, 재시도 포함)"""
+        destination = Path(destination)
+        partial = destination.with_name(destination.name + ".part")
+        attempt = 0
+        while True:
+            try:
+                async with self._client.stream("GET", url) as response:
+                    if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                        delay = self._retry_delay(attempt, response)
+                    elif not response.is_success:
+                        await response.aread()
+                        raise _error_from(response)
+                    else:
+                        with open(partial, "wb") as f:
+                            async for chunk in response.aiter_bytes(_DOWNLOAD_CHUNK):
+                                f.write(chunk)
+                        os.replace(partial, destination)
+                        return destination
+            except httpx.TransportError as e:
+                partial.unlink(missing_ok=True)
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"Download {url} failed ({e!r}), retrying")
+                delay = self._retry_delay(attempt, None)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def download_setup_gui(self, node_id: str, destination: Union[str, Path]) -> Path:
+        """통합 설치 프로그램(Windows 배치 파일) 다운로드"""
+        return await self._download(f"/api/download/{node_id}/setup-gui", destination)
+
+    async def download_install_script(self, node_id: str, destination: Union[str, Path]) -> Path:
+        """설치 스크립트(Linux/Mac) 다운로드"""
+        return await self._download(f"/api/download/{node_id}/install-script", destination)
@@ -0,0 +1,62 @@
+"""
+Client Models
+API 요청/응답 모델 (api/worker_integration.py, api/models.py와 같은 형식)
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
+
+
+class WorkerEnvironmentRequest(BaseModel):
+    """워커노드 환경변수 설정 요청 (POST /api/worker/setup)"""
+    node_id: str
+    description: str
+    central_server_ip: Optional[str] = None
+    hostname: Optional[str] = None
+
+
+class NodeResponse(BaseModel):
+    """노드 정보 (GET /nodes)"""
+    node_id: str
+    # 워커의 LAN IP (서버 응답에 따라 vpn_ip 필드로 올 수도 있음)
+    lan_ip: Optional[str] = Field(None, validation_alias=AliasChoices("lan_ip", "vpn_ip"))
+    status: str
+    description: Optional[str] = None
+    central_server_url: Optional[str] = None
+
+    model_config = ConfigDict(extra="ignore")
+
+
+class SetupResult(BaseModel):
+    """워커노드 등록 결과 (POST /api/worker/setup)"""
+    node_id: str
+    lan_ip: Optional[str] = Field(None, validation_alias=AliasChoices("lan_ip", "vpn_ip"))
+    download_url: Optional[str] = None
+    status: str
+    message: Optional[str] = None
+    # LAN IP 감지가 백그라운드 작업으로 넘어간 경우 작업 ID
+    job_id: Optional[int] = None
+
+    model_config = ConfigDict(extra="ignore")
+
+
+class WorkerStatus(BaseModel):
+    """워커노드 상태 (GET /worker/status/{node_id}, POST /worker/status:batch)"""
+    node_id: str
+    status: str
+    lan_ip: Optional[str] = Field(None, validation_alias=AliasChoices("lan_ip", "vpn_ip"))
+    description: Optional[str] = None
+    central_server_url: Optional[str] = None
+    # JSON이 아니면 None
+    docker_env: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(extra="ignore")
+
+
+class StatusBatch(BaseModel):
+    """여러 워커노드 상태 조회 결과"""
+    nodes: Dict[str, WorkerStatus] = Field(default_factory=dict)
+    missing: List[str] = Field(default_factory=list)
@@ -0,0 +1,77 @@
+"""
+테스트 공용 설정
+
+- api/ 모듈은 평평한 import(`import main`)를 쓰므로 api/를 sys.path에 추가합니다.
+- DB는 임시 디렉터리의 SQLite 파일 (TEST_DATABASE_URL로 PostgreSQL 지정 가능), 아티팩트도 임시 디렉터리에 저장합니다.
+- 백그라운드 스레드(작업 워커, 스케줄러, 웹훅 전송)는 끄고, 필요한 테스트가 직접 실행합니다.
+- 각 테스트가 끝나면 모든 테이블을 비우고 노드 캐시를 지웁니다.
+"""
+from pathlib import Path
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+API_DIR = ROOT / "api"
+
+_tmp = Path(tempfile.mkdtemp(prefix="worker-manager-tests-"))
+os.environ.setdefault("DATABASE_URL", os.getenv("TEST_DATABASE_URL", f"sqlite:///{_tmp / 'test.db'}"))
+os.environ.setdefault("ARTIFACT_DIR", str(_tmp / "artifacts"))
+os.environ.setdefault("LOCAL_SERVER_IP", "192.168.0.5")
+os.environ.setdefault("API_TOKEN", "test-token-123")
+os.environ.setdefault("JOB_WORKER_ENABLED", "false")
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+os.environ.setdefault("WEBHOOK_DISPATCHER_ENABLED", "false")
+
+sys.path.insert(0, str(API_DIR))
+
+AUTH = {"Authorization": "Bearer test-token-123"}
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+    # startup 이벤트(백그라운드 스레드)는 실행하지 않음
+    return TestClient(app, raise_server_exceptions=False)
+
+
+@pytest.fixture
+def db(app):
+    from database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def dashboard_module():
+    """웹 대시보드(web-dashboard/app.py) 모듈 (Flask가 없으면 건너뜀)"""
+    pytest.importorskip("flask")
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("dashboard_app", ROOT / "web-dashboard" / "app.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def _clean_database(request):
+    yield
+    if "app" not in request.fixturenames:
+        return
+    from database import Base, engine
+    from node_cache import node_cache
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    node_cache.clear()
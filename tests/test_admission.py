@@ -0,0 +1,40 @@
+"""부하 차단: 롱폴링으로 기다리는 요청은 처리 중 요청 수에 넣지 않음"""
+import asyncio
+
+import httpx
+
+import admission
+import worker_integration
+from conftest import AUTH
+
+WATCHERS = 6
+
+
+async def _watch_and_register(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=AUTH, timeout=30) as client:
+        cursor = (await client.get("/nodes/changes")).json()["cursor"]
+        watchers = [
+            asyncio.create_task(client.get("/nodes/changes", params={"cursor": cursor, "wait": 1}))
+            for _ in range(WATCHERS)
+        ]
+        await asyncio.sleep(0.3)
+        # 롱폴링이 모두 기다리는 중에 무거운 라우트 요청
+        registered = await client.post("/worker/generate-qr", json={"node_id": "adm-w1", "description": "test"})
+        return registered, await asyncio.gather(*watchers)
+
+
+def test_long_polls_do_not_shed_heavy_routes(app, monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_SHED_INFLIGHT", WATCHERS // 2)
+    monkeypatch.setattr(worker_integration, "get_lan_ip", lambda: "192.168.0.42")
+
+    registered, watchers = asyncio.run(_watch_and_register(app))
+    assert registered.status_code == 200
+    assert all(response.status_code == 200 for response in watchers)
+
+
+def test_is_long_poll():
+    assert admission.is_long_poll({"query_string": b"cursor=abc&wait=30"})
+    assert not admission.is_long_poll({"query_string": b"cursor=abc&wait=0"})
+    assert not admission.is_long_poll({"query_string": b"wait=soon"})
+    assert not admission.is_long_poll({"query_string": b""})
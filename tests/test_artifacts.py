@@ -0,0 +1,60 @@
+"""설치 파일 아티팩트: 저장할 때 gzip 사본을 만들고, 다운로드는 사본을 그대로 전송"""
+import gzip
+
+import pytest
+
+import artifacts
+import utils
+import worker_integration
+
+
+@pytest.fixture
+def node_id(client, monkeypatch):
+    monkeypatch.setattr(worker_integration, "get_lan_ip", lambda: "192.168.0.42")
+    response = client.post("/worker/generate-qr", json={"node_id": "art-w1", "description": "test"})
+    assert response.status_code == 200
+    return "art-w1"
+
+
+def _stored(node_id):
+    return [p for p in (artifacts.ARTIFACT_DIR / "setup_gui").glob(f"{artifacts._owner_prefix(node_id)}-*")]
+
+
+def test_store_artifact_writes_gzip_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "ARTIFACT_DIR", tmp_path)
+    content = b"@echo off\r\n" * 1000
+    path = artifacts.store_artifact("setup_gui", "owner", "a" * 40, [content[:500], content[500:]])
+    assert path.read_bytes() == content
+    assert gzip.decompress(artifacts.gzip_path(path).read_bytes()) == content
+
+    # 새 버전이 저장되면 이전 버전과 그 gzip 사본도 삭제
+    newer = artifacts.store_artifact("setup_gui", "owner", "b" * 40, b"new")
+    assert sorted(p.name for p in tmp_path.joinpath("setup_gui").iterdir()) == sorted(
+        [newer.name, artifacts.gzip_path(newer).name])
+
+
+def test_download_serves_precompressed_copy(client, node_id, monkeypatch):
+    url = f"/api/download/{node_id}/setup-gui"
+    first = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+
+    stored = _stored(node_id)
+    raw = next(p for p in stored if p.suffix == ".bat")
+    assert artifacts.gzip_path(raw) in stored
+
+    # 저장된 뒤에는 다운로드마다 다시 압축하지 않음
+    def fail(*args, **kwargs):
+        raise AssertionError("artifact was recompressed")
+    monkeypatch.setattr(utils, "gzip_chunks", fail)
+
+    second = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert second.status_code == 200
+    assert second.headers["content-encoding"] == "gzip"
+    assert second.headers["vary"] == "Accept-Encoding"
+    assert int(second.headers["content-length"]) == artifacts.gzip_path(raw).stat().st_size
+    assert second.content == first.content == raw.read_bytes()
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == raw.read_bytes()
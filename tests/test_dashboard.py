@@ -0,0 +1,115 @@
+"""웹 대시보드: 업스트림 회로 차단기와 노드 목록 스냅샷"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+
+class FakeApi:
+    """경로별 (상태, 헤더, 본문)을 돌려주는 API 흉내 서버"""
+
+    def __init__(self):
+        self.routes = {}
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                status, headers, body = api.routes.get((self.command, self.path.split("?")[0]),
+                                                       (404, {}, {"detail": "Not Found"}))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_DELETE = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+NODES = {"total": 1, "nodes": [{"node_id": "dash-w1", "status": "registered"}]}
+
+
+@pytest.fixture
+def api(dashboard_module, monkeypatch):
+    fake = FakeApi()
+    fake.routes[("GET", "/api/nodes/list")] = (200, {}, NODES)
+    monkeypatch.setattr(dashboard_module, "API_URL_INTERNAL", fake.url)
+    # 테스트마다 새 스냅샷 (다른 테스트가 채운 값을 쓰지 않도록)
+    monkeypatch.setattr(dashboard_module, "_nodes_snapshot",
+                        dashboard_module._Snapshot("nodes", dashboard_module._fetch_nodes_summary))
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def dashboard(dashboard_module, api):
+    return dashboard_module.app.test_client()
+
+
+def test_shed_requests_do_not_open_breaker(dashboard_module, dashboard, api):
+    # API의 부하 차단 응답 (admission)
+    api.routes[("POST", "/worker/generate-qr")] = (503, {"Retry-After": "2"}, {"detail": "Too many requests"})
+    api.routes[("POST", "/central/generate-qr")] = (429, {"Retry-After": "1"}, {"detail": "Too many requests"})
+    for _ in range(dashboard_module.CIRCUIT_FAILURE_THRESHOLD * 2):
+        assert dashboard.post("/worker/generate-qr", json={"node_id": "x"}).status_code == 503
+    for _ in range(dashboard_module.CIRCUIT_FAILURE_THRESHOLD * 2):
+        assert dashboard.post("/central/generate-qr", json={"node_id": "x"}).status_code == 429
+
+    assert dashboard_module._breaker_for(api.url).state == "closed"
+    response = dashboard.get("/api/nodes")
+    assert response.status_code == 200
+    assert response.get_json()["nodes"] == NODES["nodes"]
+
+
+def test_unavailable_upstream_opens_breaker(dashboard_module, dashboard, api):
+    # Retry-After 없는 503은 업스트림 장애
+    api.routes[("POST", "/worker/generate-qr")] = (503, {}, {"detail": "down"})
+    for _ in range(dashboard_module.CIRCUIT_FAILURE_THRESHOLD):
+        dashboard.post("/worker/generate-qr", json={"node_id": "x"})
+
+    assert dashboard_module._breaker_for(api.url).state == "open"
+    assert dashboard.get("/api/nodes").status_code == 503
+
+
+def test_refresh_started_before_invalidate_is_not_stored(dashboard_module):
+    started, release = threading.Event(), threading.Event()
+    results = iter(["before-delete", "after-delete"])
+
+    def fetch():
+        value = next(results)
+        if value == "before-delete":
+            started.set()
+            release.wait(5)
+        return value
+
+    snapshot = dashboard_module._Snapshot("test", fetch)
+    # 백그라운드 갱신이 변경 전 목록을 가져오는 중에 노드 삭제 요청이 성공
+    refresh = threading.Thread(target=snapshot._background_refresh)
+    refresh.start()
+    assert started.wait(5)
+    snapshot.invalidate()
+    release.set()
+    refresh.join()
+
+    # 변경 전 목록을 저장하지 않고 다음 조회는 다시 가져옴
+    data, stale, _ = snapshot.get()
+    assert (data, stale) == ("after-delete", False)
@@ -0,0 +1,108 @@
+"""Idempotency-Key: 같은 키의 동시 요청은 한 번만 실행, 다른 본문은 422, 오류 응답은 재처리"""
+import asyncio
+import hashlib
+import json
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import idempotency
+from models import IdempotencyKey
+
+
+def _counting_app(delay: float = 0.0, status: int = 200):
+    """호출 수를 세고 delay초 걸리는 POST /run"""
+    inner = FastAPI()
+    calls = []
+
+    @inner.post("/run")
+    async def run(request: Request):
+        calls.append(await request.json())
+        await asyncio.sleep(delay)
+        return JSONResponse({"call": len(calls)}, status_code=status)
+
+    return idempotency.IdempotencyMiddleware(inner), calls
+
+
+def _post_all(asgi, requests):
+    async def go():
+        transport = httpx.ASGITransport(app=asgi)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/run", json=body, headers={"Idempotency-Key": key}) for key, body in requests
+            ))
+    return asyncio.run(go())
+
+
+def test_concurrent_duplicate_runs_once(app, db):
+    asgi, calls = _counting_app(delay=0.5)
+    first, second = _post_all(asgi, [("k-1", {"n": 1}), ("k-1", {"n": 1})])
+
+    # 처음 요청이 끝날 때까지 기다렸다가 저장된 응답을 재생
+    assert len(calls) == 1
+    assert first.json() == second.json() == {"call": 1}
+    assert sorted(r.headers.get("idempotent-replayed", "") for r in (first, second)) == ["", "true"]
+    assert db.get(IdempotencyKey, "k-1").status_code == 200
+
+
+def test_duplicate_gets_409_while_still_processing(app, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT", 0.2)
+    asgi, calls = _counting_app(delay=1.0)
+    responses = _post_all(asgi, [("k-2", {"n": 1}), ("k-2", {"n": 1})])
+
+    assert len(calls) == 1
+    assert sorted(r.status_code for r in responses) == [200, 409]
+    conflict = next(r for r in responses if r.status_code == 409)
+    assert conflict.headers["retry-after"] == "1"
+
+
+def test_reused_key_with_different_body_is_rejected(app):
+    asgi, calls = _counting_app()
+    (first,) = _post_all(asgi, [("k-3", {"n": 1})])
+    (replayed,) = _post_all(asgi, [("k-3", {"n": 1})])
+    (other,) = _post_all(asgi, [("k-3", {"n": 2})])
+
+    assert first.status_code == replayed.status_code == 200
+    assert replayed.headers["idempotent-replayed"] == "true"
+    assert other.status_code == 422
+    assert calls == [{"n": 1}]
+
+
+def test_error_response_releases_key(app, db):
+    asgi, calls = _counting_app(status=503)
+    _post_all(asgi, [("k-4", {"n": 1})])
+    assert db.get(IdempotencyKey, "k-4") is None
+
+    # 재시도하면 다시 처리
+    (retry,) = _post_all(asgi, [("k-4", {"n": 1})])
+    assert retry.status_code == 503
+    assert len(calls) == 2
+
+
+def test_stale_processing_key_is_taken_over(app, db, monkeypatch):
+    asgi, calls = _counting_app()
+    # httpx가 보내는 것과 같은 본문
+    request = f"POST /run sha256={hashlib.sha256(json.dumps({'n': 1}).encode()).hexdigest()}"
+    assert idempotency._reserve("k-5", request) is None
+    # 처리하던 프로세스가 죽어 처리 중으로 남은 키
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_PROCESSING_TIMEOUT", -1)
+
+    (response,) = _post_all(asgi, [("k-5", {"n": 1})])
+    assert response.status_code == 200
+    assert len(calls) == 1
+    db.expire_all()
+    assert db.get(IdempotencyKey, "k-5").status_code == 200
+
+
+def test_worker_setup_retry_is_replayed(client):
+    body = {"node_id": "idem-w1", "description": "test"}
+    headers = {"Idempotency-Key": "setup-1"}
+    first = client.post("/api/worker/setup", json=body, headers=headers)
+    again = client.post("/api/worker/setup", json=body, headers=headers)
+    assert first.status_code == again.status_code == 200
+    assert again.headers["idempotent-replayed"] == "true"
+    assert again.json() == first.json()
+
+    other = client.post("/api/worker/setup", json=dict(body, description="changed"), headers=headers)
+    assert other.status_code == 422
@@ -0,0 +1,108 @@
+"""설치 토큰: 설치가 끝날 때만 사용 처리되고, 같은 토큰으로 다시 호출하면 저장된 결과를 반환, 서명 키는 API_TOKEN과 무관"""
+from datetime import datetime, timedelta, timezone
+import base64
+import hashlib
+import hmac
+
+import pytest
+
+import tokens
+import webhooks
+import worker_integration
+from conftest import AUTH
+from models import AppSetting, Node, QRToken, WebhookOutbox
+
+
+@pytest.fixture
+def hook(monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_URLS", ["http://hook.test/events"])
+
+
+def _installed_events(db):
+    return db.query(WebhookOutbox).filter(WebhookOutbox.event == webhooks.NODE_INSTALLED).count()
+
+
+def _worker_token(client, node_id):
+    response = client.post("/worker/generate-qr", json={"node_id": node_id, "description": "test"})
+    assert response.status_code == 200
+    return response.json()["token"]
+
+
+def test_worker_retry_after_lan_ip_failure(client, db, hook, monkeypatch):
+    monkeypatch.setattr(worker_integration, "get_lan_ip", lambda: "0.0.0.0")
+    token = _worker_token(client, "tok-w1")
+
+    first = client.post(f"/worker/process-installation/{token}")
+    assert first.status_code == 200
+    assert db.get(Node, "tok-w1").status == "pending"
+    # 설치가 끝나지 않았으므로 토큰은 그대로 사용 가능
+    assert not db.query(QRToken).filter(QRToken.token == token, QRToken.used.is_(True)).count()
+
+    monkeypatch.setattr(worker_integration, "get_lan_ip", lambda: "192.168.0.42")
+    second = client.post(f"/worker/process-installation/{token}")
+    assert second.status_code == 200
+    assert second.json()["status"] == "success"
+    db.expire_all()
+    assert db.get(Node, "tok-w1").status == "registered"
+    assert db.query(QRToken).filter(QRToken.token == token, QRToken.used.is_(True)).count() == 1
+    assert _installed_events(db) == 1
+
+
+def test_worker_repeat_returns_stored_result(client, db, hook, monkeypatch):
+    monkeypatch.setattr(worker_integration, "get_lan_ip", lambda: "192.168.0.42")
+    token = _worker_token(client, "tok-w2")
+
+    # QR 생성 때 LAN IP를 감지해 이미 registered
+    first = client.post(f"/worker/process-installation/{token}")
+    again = client.post(f"/worker/process-installation/{token}")
+    assert first.status_code == again.status_code == 200
+    assert again.json()["status"] == "existing"
+    assert db.query(QRToken).filter(QRToken.token == token, QRToken.used.is_(True)).count() == 1
+    assert again.json()["lan_ip"] == "192.168.0.42"
+    assert again.json()["artifacts"] == first.json()["artifacts"]
+    # node.installed는 실제로 설치 완료로 바뀔 때 한 번만
+    assert _installed_events(db) == 1
+
+
+def test_central_repeat_returns_stored_result(client, db, hook):
+    # 중앙서버 노드 ID는 central-server-01로 고정
+    response = client.post("/central/generate-qr", json={"node_id": "central-server-01", "server_ip": "192.168.0.7"})
+    assert response.status_code == 200
+    token = response.json()["token"]
+
+    first = client.post(f"/central/process-installation/{token}")
+    again = client.post(f"/central/process-installation/{token}")
+    assert first.status_code == again.status_code == 200
+    assert again.json()["docker_runner"] == first.json()["docker_runner"]
+    assert db.get(Node, "central-server-01").status == "registered"
+    assert _installed_events(db) == 1
+
+
+@pytest.fixture
+def fresh_secret(monkeypatch):
+    """INSTALL_TOKEN_SECRET 없이 처음 시작한 프로세스"""
+    monkeypatch.delenv("INSTALL_TOKEN_SECRET", raising=False)
+    monkeypatch.setattr(tokens, "_secret", None)
+
+
+def test_generated_secret_is_shared_through_db(client, db, fresh_secret, monkeypatch):
+    token = tokens.issue_install_token("secret-n1", "worker", datetime.now(timezone.utc) + timedelta(hours=1))
+    stored = db.get(AppSetting, tokens._SECRET_SETTING)
+    assert stored is not None
+
+    # 다른 프로세스도 같은 키를 읽어 토큰을 확인
+    monkeypatch.setattr(tokens, "_secret", None)
+    assert tokens.load_install_token(db, token, "worker").node_id == "secret-n1"
+    assert db.get(AppSetting, tokens._SECRET_SETTING).value == stored.value
+
+    # 서명 키는 /settings로 노출되지 않음
+    assert stored.value not in client.get("/settings", headers=AUTH).text
+
+
+def test_token_signed_with_api_token_is_rejected(db, fresh_secret):
+    # 예전처럼 공개된 기본 API_TOKEN에서 파생한 키로 만든 토큰
+    derived = hmac.new(AUTH["Authorization"].split()[1].encode(), b"worker-manager:install-token", hashlib.sha256).digest()
+    payload = tokens._b64encode(b'{"n":"forged","t":"worker","e":4102444800,"j":"x"}')
+    signature = base64.urlsafe_b64encode(hmac.new(derived, f"v1.{payload}".encode(), hashlib.sha256).digest())
+    forged = f"v1.{payload}.{signature.decode().rstrip('=')}"
+    assert tokens.load_install_token(db, forged, "worker") is None
@@ -0,0 +1,166 @@
+"""백그라운드 작업: 커밋되면 워커를 바로 깨움, 가져가기/재시도, GET /jobs/{id} 롱폴링"""
+from datetime import timedelta
+import threading
+import time
+
+import pytest
+
+import jobs
+from conftest import AUTH
+from database import SessionLocal
+from models import Job
+
+
+@pytest.fixture
+def handler():
+    """호출 기록을 남기고, fail_times 번은 실패하는 test_job 작업"""
+    calls = []
+    state = {"fail_times": 0}
+
+    @jobs.job_handler("test_job", max_attempts=2)
+    def test_job(db, payload):
+        calls.append(payload)
+        if len(calls) <= state["fail_times"]:
+            raise RuntimeError("boom")
+        return {"echo": payload.get("n")}
+
+    yield calls, state
+    jobs._handlers.pop("test_job", None)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    # poll 주기를 길게 잡아 깨우지 않으면 테스트 안에 실행되지 않게 함
+    job_worker = jobs.JobWorker(concurrency=1, poll_interval=30)
+    monkeypatch.setattr(jobs, "_worker", job_worker)
+    job_worker.start()
+    yield job_worker
+    job_worker.stop()
+
+
+def _enqueue(db, **kwargs) -> int:
+    job = jobs.enqueue(db, "test_job", {"n": 1}, **kwargs)
+    db.commit()
+    return job.id
+
+
+def _wait_status(job_id: int, status: str, timeout: float = 3) -> Job:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        session = SessionLocal()
+        try:
+            job = session.get(Job, job_id)
+            if job.status == status:
+                return job
+        finally:
+            session.close()
+        time.sleep(0.05)
+    raise AssertionError(f"job #{job_id} did not reach {status}")
+
+
+def test_commit_wakes_worker(db, handler, worker):
+    # 워커가 가져갈 작업이 없어 대기를 시작할 때까지
+    time.sleep(0.2)
+    job = jobs.enqueue(db, "test_job", {"n": 1})
+    # 커밋 전에 깨우면 워커는 아직 보이지 않는 작업을 놓치고 poll 주기만큼 잠듦
+    # (SQLite에서는 워커의 BEGIN IMMEDIATE가 커밋을 기다리므로 PostgreSQL에서만 드러남)
+    time.sleep(0.2)
+    db.commit()
+    assert _wait_status(job.id, "succeeded").result == '{"echo": 1}'
+
+
+def test_rollback_does_not_wake(db, handler):
+    jobs.enqueue(db, "test_job")
+    db.rollback()
+    assert "jobs_enqueued" not in db.info
+
+
+def test_stop_joins_worker_threads(handler):
+    job_worker = jobs.JobWorker(concurrency=1, poll_interval=30)
+    job_worker.start()
+    job_worker.stop()
+    assert not job_worker._thread.is_alive()
+
+
+def test_claim_skips_delayed_and_reclaims_stale(db, handler):
+    ready = [_enqueue(db) for _ in range(3)]
+    delayed = _enqueue(db, delay=60)
+
+    claimed = jobs.claim_jobs(2, worker_id="w1")
+    assert claimed == ready[:2]
+    assert jobs.claim_jobs(10, worker_id="w2") == ready[2:]
+    assert jobs.claim_jobs(10) == []
+
+    db.expire_all()
+    assert db.get(Job, ready[0]).locked_by == "w1"
+    assert db.get(Job, ready[0]).attempts == 1
+    assert db.get(Job, delayed).status == "queued"
+
+    # 프로세스가 죽어 JOB_LOCK_TIMEOUT 넘게 running으로 남은 작업은 다시 가져감
+    stale = db.get(Job, ready[0])
+    stale.locked_at = stale.locked_at - timedelta(seconds=jobs.JOB_LOCK_TIMEOUT + 1)
+    db.commit()
+    assert jobs.claim_jobs(10, worker_id="w3") == [ready[0]]
+    db.expire_all()
+    assert db.get(Job, ready[0]).attempts == 2
+
+
+def test_failed_job_is_retried_then_failed(db, handler):
+    calls, state = handler
+    state["fail_times"] = 2
+    job_id = _enqueue(db)
+
+    assert jobs.claim_jobs(1) == [job_id]
+    jobs.run_job(job_id)
+    db.expire_all()
+    job = db.get(Job, job_id)
+    assert job.status == "queued"
+    assert job.last_error == "RuntimeError: boom"
+    # 백오프 동안은 가져가지 않음
+    assert jobs.claim_jobs(1) == []
+
+    job.run_after = jobs._utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert jobs.claim_jobs(1) == [job_id]
+    jobs.run_job(job_id)
+    db.expire_all()
+    job = db.get(Job, job_id)
+    # max_attempts=2를 모두 써서 실패로 끝남
+    assert job.status == "failed"
+    assert job.finished_at is not None
+    assert len(calls) == 2
+
+
+def test_long_poll_returns_when_job_finishes(client, db, handler):
+    job_id = _enqueue(db)
+
+    def finish():
+        time.sleep(0.5)
+        jobs.claim_jobs(1)
+        jobs.run_job(job_id)
+
+    runner = threading.Thread(target=finish)
+    runner.start()
+    start = time.monotonic()
+    response = client.get(f"/jobs/{job_id}", params={"wait": 10}, headers=AUTH)
+    elapsed = time.monotonic() - start
+    runner.join()
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "succeeded"
+    assert response.json()["result"] == {"echo": 1}
+    assert 0.4 < elapsed < 5
+
+
+def test_long_poll_times_out_and_missing_job(client, db, handler):
+    job_id = _enqueue(db, delay=60)
+    response = client.get(f"/jobs/{job_id}", params={"wait": 0.6}, headers=AUTH)
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+
+    assert client.get("/jobs/999999", params={"wait": 1}, headers=AUTH).status_code == 404
+
+
+def test_create_job_rejects_unknown_kind(client):
+    response = client.post("/jobs", json={"kind": "no-such-job"}, headers=AUTH)
+    assert response.status_code == 400
@@ -0,0 +1,95 @@
+"""메트릭: 여러 스레드에서 동시에 갱신해도 값을 잃지 않음, 풀 대기시간 기록, 생성기 소요시간"""
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import metrics
+
+THREADS = 8
+INCREMENTS = 20000
+
+
+@pytest.fixture
+def registered():
+    created = []
+    yield created
+    with metrics._registry_lock:
+        for metric in created:
+            metrics._registry.remove(metric)
+
+
+@pytest.fixture
+def fast_switching():
+    # 스레드 전환을 자주 일으켜 잠금 없는 += 에서 갱신이 사라지게 함
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _run_threads(target):
+    threads = [threading.Thread(target=target) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_updates_are_not_lost(registered, fast_switching):
+    counter = metrics.Counter("test_threaded_total", "test counter", ("kind",))
+    gauge = metrics.Gauge("test_threaded_in_flight", "test gauge")
+    histogram = metrics.Histogram("test_threaded_seconds", "test histogram", buckets=(1.0,))
+    registered.extend([counter, gauge, histogram])
+    child = counter.labels("a")
+
+    def work():
+        for _ in range(INCREMENTS):
+            child.inc()
+            gauge.inc()
+            histogram.observe(0.5)
+
+    _run_threads(work)
+    total = THREADS * INCREMENTS
+    assert child.value == total
+    assert gauge.labels().value == total
+    counts, observed_sum = histogram.labels().state()
+    assert sum(counts) == total
+    assert observed_sum == total * 0.5
+
+
+def test_pool_wait_is_observed_after_dispose(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=metrics.TimedQueuePool)
+    metrics.instrument_engine(engine)
+    before_counts, _ = metrics.DB_POOL_WAIT.labels().state()
+    checkouts = metrics.DB_POOL_CHECKOUTS.labels().value
+    try:
+        for _ in range(3):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            # dispose()가 새 풀을 만들어도 계측 유지
+            engine.dispose()
+    finally:
+        engine.dispose()
+    after_counts, _ = metrics.DB_POOL_WAIT.labels().state()
+    assert sum(after_counts) - sum(before_counts) == 3
+    assert metrics.DB_POOL_CHECKOUTS.labels().value - checkouts == 3
+
+
+def test_generator_render_time_excludes_consumer():
+    render = metrics.INSTALLER_RENDER.labels("test-slow-consumer")
+
+    @metrics.track_render("test-slow-consumer")
+    def pieces():
+        for _ in range(3):
+            yield "x" * 10
+
+    before_counts, before_sum = render.state()
+    for _ in pieces():
+        # 스트리밍 응답이 조각을 느리게 보내는 상황
+        time.sleep(0.1)
+    after_counts, after_sum = render.state()
+    assert sum(after_counts) - sum(before_counts) == 1
+    assert after_sum - before_sum < 0.05
@@ -0,0 +1,140 @@
+"""여러 워커 프로세스: 시작 시 DB 초기화 직렬화, 공유 설정, 프로세스 간 메트릭/프로파일 합산"""
+from pathlib import Path
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+import metrics
+import process_files
+from conftest import API_DIR, AUTH
+
+WORKERS = 2
+SETTINGS_CACHE_TTL = 0.5
+FLUSH_INTERVAL = 0.2
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sample(text: str, name: str, labels: str = "") -> float:
+    prefix = f"{name}{{{labels}}} " if labels else f"{name} "
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+
+def _get(url: str, **kwargs) -> httpx.Response:
+    # 요청마다 새 연결 (워커 프로세스에 고르게 분산)
+    return httpx.get(url, headers=AUTH, timeout=10, **kwargs)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """빈 SQLite DB로 uvicorn --workers 2 실행 (두 워커가 동시에 테이블 생성)"""
+    port = _free_port()
+    multiproc_dir = tmp_path / "metrics"
+    multiproc_dir.mkdir()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'multi.db'}",
+        ARTIFACT_DIR=str(tmp_path / "artifacts"),
+        METRICS_MULTIPROC_DIR=str(multiproc_dir),
+        METRICS_FLUSH_INTERVAL=str(FLUSH_INTERVAL),
+        SETTINGS_CACHE_TTL=str(SETTINGS_CACHE_TTL),
+        LOCAL_SERVER_IP="192.168.0.5",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(WORKERS), "--log-level", "warning"],
+        cwd=API_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        # 모든 워커가 시작해 메트릭 파일을 쓸 때까지 대기
+        while len(list(multiproc_dir.glob("metrics-*.json"))) < WORKERS:
+            if process.poll() is not None or time.monotonic() > deadline:
+                pytest.fail(f"server did not start:\n{process.stdout.read().decode(errors='replace')}")
+            time.sleep(0.1)
+        yield base_url, multiproc_dir
+    finally:
+        process.terminate()
+        try:
+            output, _ = process.communicate(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            output, _ = process.communicate()
+    # 시작 시 테이블 생성이 겹쳐 실패하면 워커가 오류를 남김
+    assert b"Traceback" not in output, output.decode(errors="replace")
+
+
+def test_workers_share_settings_and_metrics(server):
+    base_url, multiproc_dir = server
+
+    # 각 워커의 설정 캐시를 기존 값으로 채움
+    for _ in range(10):
+        assert _get(f"{base_url}/settings").json()["LOCAL_SERVER_IP"] == "192.168.0.5"
+
+    response = httpx.put(f"{base_url}/settings", headers=AUTH, json={"LOCAL_SERVER_IP": "192.168.0.77"})
+    assert response.status_code == 200
+    time.sleep(SETTINGS_CACHE_TTL * 2)
+    values = {_get(f"{base_url}/settings").json()["LOCAL_SERVER_IP"] for _ in range(20)}
+    assert values == {"192.168.0.77"}
+
+    requests = 40
+    for _ in range(requests):
+        assert _get(f"{base_url}/health").status_code == 200
+    time.sleep(FLUSH_INTERVAL * 3)
+
+    # 스크레이프가 어느 워커로 가도 같은 합계
+    series = ("worker_api_http_requests_total", 'method="GET",route="/health",status="200"')
+    totals = {_sample(_get(f"{base_url}/metrics").text, *series) for _ in range(10)}
+    assert totals == {requests}
+    assert len(list(multiproc_dir.glob("metrics-*.json"))) == WORKERS
+
+    # 한 워커가 잡은 프로파일을 다른 워커에서도 조회
+    profiled = _get(f"{base_url}/health", params={"profile": "1"})
+    profile_id = profiled.headers["x-profile-id"]
+    for _ in range(10):
+        response = _get(f"{base_url}/admin/profiles/{profile_id}")
+        assert response.status_code == 200
+        assert response.json()["pid"] == int(profile_id.split("-")[0])
+
+
+def test_render_merges_process_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_files, "METRICS_MULTIPROC_DIR", str(tmp_path))
+    counter = metrics.Counter("test_multiproc_total", "test counter", ("kind",))
+    gauge = metrics.Gauge("test_multiproc_in_flight", "test gauge")
+    histogram = metrics.Histogram("test_multiproc_seconds", "test histogram", buckets=(1.0,))
+    try:
+        counter.labels("a").inc(2)
+        gauge.inc(3)
+        histogram.observe(0.5)
+
+        # 종료된 프로세스: 카운터/히스토그램은 합산, 게이지는 제외
+        dead_pid = 2 ** 22 + 1
+        Path(tmp_path, f"metrics-{dead_pid}.json").write_text(
+            '{"test_multiproc_total": [[["a"], 5], [["b"], 1]],'
+            ' "test_multiproc_in_flight": [[[], 7]],'
+            ' "test_multiproc_seconds": [[[], [[0, 2], 4.0]]]}'
+        )
+        text = metrics.render_latest()
+        assert _sample(text, "test_multiproc_total", 'kind="a"') == 7
+        assert _sample(text, "test_multiproc_total", 'kind="b"') == 1
+        assert _sample(text, "test_multiproc_in_flight") == 3
+        assert _sample(text, "test_multiproc_seconds_bucket", 'le="1"') == 1
+        assert _sample(text, "test_multiproc_seconds_count") == 3
+        assert _sample(text, "test_multiproc_seconds_sum") == 4.5
+    finally:
+        with metrics._registry_lock:
+            for metric in (counter, gauge, histogram):
+                metrics._registry.remove(metric)
@@ -0,0 +1,239 @@
+"""노드 일괄 처리: 조건 삭제, 내보내기, 중앙서버 주소 일괄 갱신"""
+from datetime import datetime, timedelta, timezone
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import event, func
+
+import jobs
+import node_bulk
+import webhooks
+from conftest import AUTH
+from database import SessionLocal, engine
+from models import Job, Node, NodeChange, QRToken, WebhookOutbox
+from node_cache import get_node, node_cache
+
+OLD = datetime.now(timezone.utc) - timedelta(days=30)
+
+
+@pytest.fixture
+def hook(monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_URLS", ["http://hook.test/events"])
+
+
+def _add_nodes(db, *nodes):
+    for node_id, node_type, status, updated_at in nodes:
+        db.add(Node(node_id=node_id, node_type=node_type, status=status, updated_at=updated_at))
+        db.add(QRToken(token=f"tok-{node_id}", node_id=node_id, node_type=node_type or "worker",
+                       expires_at=datetime.now(timezone.utc) + timedelta(hours=1)))
+    db.commit()
+
+
+@pytest.fixture
+def nodes(db):
+    _add_nodes(
+        db,
+        ("auto-node-1", "worker", "disconnected", OLD),
+        ("auto-node-2", "worker", "registered", None),
+        ("auto-node-3", "worker", "disconnected", None),
+        ("gpu-1", "worker", "disconnected", OLD),
+        ("central-1", "central", "registered", OLD),
+    )
+
+
+def _remaining(db):
+    db.expire_all()
+    return sorted(node.node_id for node in db.query(Node))
+
+
+@pytest.mark.parametrize("params, deleted", [
+    ({"status": "disconnected"}, ["auto-node-1", "auto-node-3", "gpu-1"]),
+    ({"name": "auto-node-*"}, ["auto-node-1", "auto-node-2", "auto-node-3"]),
+    ({"name": "auto-node-?", "status": ["registered", "disconnected"]}, ["auto-node-1", "auto-node-2", "auto-node-3"]),
+    ({"node_type": "central"}, ["central-1"]),
+    ({"node_id": ["gpu-1", "missing"]}, ["gpu-1"]),
+])
+def test_delete_by_filter(client, db, nodes, hook, params, deleted):
+    response = client.delete("/nodes", params=params, headers=AUTH)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["node_ids"] == deleted
+    assert body["deleted"] == body["matched"] == body["tokens_deleted"] == len(deleted)
+    assert set(_remaining(db)).isdisjoint(deleted)
+
+    # 집합 DELETE여도 tombstone, 웹훅, QR 토큰 삭제가 노드마다 남음
+    tombstones = {row.node_id for row in db.query(NodeChange).filter(NodeChange.op == "delete")}
+    assert tombstones == set(deleted)
+    events = {row.node_id for row in db.query(WebhookOutbox).filter(WebhookOutbox.event == webhooks.NODE_DELETED)}
+    assert events == set(deleted)
+    assert not db.query(QRToken).filter(QRToken.node_id.in_(deleted)).count()
+
+
+def test_delete_stale_since(client, db, nodes):
+    since = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    response = client.delete("/nodes", params={"stale_since": since, "node_type": "worker"}, headers=AUTH)
+    assert response.json()["node_ids"] == ["auto-node-1", "gpu-1"]
+
+
+def test_dry_run_and_missing_filter(client, db, nodes):
+    response = client.delete("/nodes", params={"status": "disconnected", "dry_run": True}, headers=AUTH)
+    assert response.json()["matched"] == 3 and response.json()["deleted"] == 0
+    assert len(_remaining(db)) == 5
+    assert client.delete("/nodes", headers=AUTH).status_code == 400
+
+
+def test_rows_committed_after_lock_are_not_deleted(client, db, nodes, hook):
+    if engine.dialect.name != "postgresql":
+        pytest.skip("SQLite serializes writers with BEGIN IMMEDIATE")
+
+    inserted = []
+
+    # 대상 행을 잠근 직후 다른 트랜잭션이 조건에 맞는 노드를 커밋
+    @event.listens_for(engine, "after_cursor_execute")
+    def insert_late_node(conn, cursor, statement, parameters, context, executemany):
+        if inserted or "FOR UPDATE" not in statement or "FROM nodes" not in statement:
+            return
+        inserted.append(True)
+        other = SessionLocal()
+        try:
+            other.add(Node(node_id="auto-node-late", node_type="worker", status="disconnected"))
+            other.commit()
+        finally:
+            other.close()
+
+    try:
+        response = client.delete("/nodes", params={"status": "disconnected"}, headers=AUTH)
+    finally:
+        event.remove(engine, "after_cursor_execute", insert_late_node)
+
+    assert inserted
+    body = response.json()
+    assert body["deleted"] == body["matched"] == 3
+    # 잠그지 않은 늦게 커밋된 노드는 tombstone/웹훅 없이 사라지지 않음
+    assert "auto-node-late" in _remaining(db)
+
+
+@pytest.fixture
+def partitions(monkeypatch):
+    """NODE_EXPORT_BATCH를 작게 잡고 서버 측 커서에서 읽은 묶음 크기를 기록"""
+    monkeypatch.setattr(node_bulk, "NODE_EXPORT_BATCH", 2)
+    # 묶음마다 바로 내보내도록
+    monkeypatch.setattr(node_bulk, "_EXPORT_FLUSH_BYTES", 1)
+    sizes = []
+    export_rows = node_bulk._export_rows
+
+    def recording(db, filters):
+        for partition in export_rows(db, filters):
+            sizes.append(len(partition))
+            yield partition
+
+    monkeypatch.setattr(node_bulk, "_export_rows", recording)
+    return sizes
+
+
+def test_export_ndjson_streams_every_partition(client, nodes, partitions):
+    response = client.get("/nodes/export", headers=AUTH)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [row["node_id"] for row in rows] == ["auto-node-1", "auto-node-2", "auto-node-3", "central-1", "gpu-1"]
+    assert set(rows[0]) == set(node_bulk._EXPORT_COLUMNS)
+    assert rows[0]["status"] == "disconnected"
+    assert partitions == [2, 2, 1]
+
+
+def test_export_csv_with_filter(client, nodes, partitions):
+    response = client.get("/nodes/export", params={"format": "csv", "name": "auto-node-*"}, headers=AUTH)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="nodes.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+
+    assert [row["node_id"] for row in rows] == ["auto-node-1", "auto-node-2", "auto-node-3"]
+    assert rows[0]["updated_at"].startswith(OLD.date().isoformat())
+    assert rows[1]["updated_at"] == ""
+    assert partitions == [2, 1]
+
+
+def test_export_rejects_unknown_format(client):
+    assert client.get("/nodes/export", params={"format": "xml"}, headers=AUTH).status_code == 422
+
+
+NEW_CENTRAL = "http://10.0.0.9:8000"
+
+
+@pytest.fixture
+def configured_nodes(db, monkeypatch):
+    monkeypatch.setattr(node_bulk, "NODE_CONFIG_CHUNK", 2)
+    old_env = {"central_server_url": "http://10.0.0.1:8000", "central_server_ip": "10.0.0.1"}
+    installed_env = {"CENTRAL_SERVER_URL": "http://10.0.0.1:8000", "CENTRAL_SERVER_IP": "10.0.0.1", "GPU": "1"}
+    for node_id, node_type, central_url, env in (
+        ("w-1", "worker", "http://10.0.0.1:8000", old_env),
+        ("w-2", None, "http://10.0.0.1:8000", installed_env),
+        ("w-3", "worker", None, None),
+        ("w-4", "worker", NEW_CENTRAL, old_env),
+        ("w-5", "worker", "http://10.0.0.1:8000", "not-json"),
+        ("c-1", "central", "http://10.0.0.1:8000", old_env),
+    ):
+        raw = env if isinstance(env, str) or env is None else json.dumps(env)
+        db.add(Node(node_id=node_id, node_type=node_type, central_server_url=central_url, docker_env_vars=raw))
+    db.commit()
+
+
+def _run_refresh(client, **params) -> dict:
+    response = client.post("/nodes/refresh-configs", params=dict(central_server_url=NEW_CENTRAL, **params),
+                           headers=AUTH)
+    assert response.status_code == 200
+    job_id = response.json()["id"]
+    assert jobs.claim_jobs(1) == [job_id]
+    jobs.run_job(job_id)
+    job = client.get(f"/jobs/{job_id}", headers=AUTH).json()
+    assert job["status"] == "succeeded"
+    return job["result"]
+
+
+def test_refresh_rewrites_worker_configs(client, db, configured_nodes):
+    last_seq = db.query(func.max(NodeChange.seq)).scalar()
+    result = _run_refresh(client)
+    assert result["total"] == 4
+    assert (result["updated"], result["failed"], result["failed_node_ids"]) == (3, 1, ["w-5"])
+
+    db.expire_all()
+    env = {node.node_id: node.docker_env_vars for node in db.query(Node)}
+    urls = {node.node_id: node.central_server_url for node in db.query(Node)}
+    assert json.loads(env["w-1"]) == {"central_server_url": NEW_CENTRAL, "central_server_ip": "10.0.0.9"}
+    assert json.loads(env["w-2"]) == {"CENTRAL_SERVER_URL": NEW_CENTRAL, "CENTRAL_SERVER_IP": "10.0.0.9", "GPU": "1"}
+    assert json.loads(env["w-3"])["central_server_url"] == NEW_CENTRAL
+    # 이미 같은 주소인 노드, JSON이 아닌 노드, 중앙서버 노드는 그대로
+    assert urls["w-4"] == NEW_CENTRAL and json.loads(env["w-4"])["central_server_ip"] == "10.0.0.1"
+    assert urls["w-5"] == urls["c-1"] == "http://10.0.0.1:8000"
+
+    # bulk UPDATE여도 갱신한 노드만 변경 피드에 남음
+    changed = [row.node_id for row in db.query(NodeChange).filter(NodeChange.seq > last_seq)]
+    assert sorted(changed) == ["w-1", "w-2", "w-3"]
+
+
+def test_refresh_invalidates_cached_nodes(client, db, configured_nodes, monkeypatch):
+    monkeypatch.setattr(node_cache, "enabled", True)
+    assert get_node("w-1").central_server_url == "http://10.0.0.1:8000"
+    assert node_cache.get("w-1") is not None
+
+    _run_refresh(client)
+    assert node_cache.get("w-1") is None
+    assert get_node("w-1").central_server_url == NEW_CENTRAL
+
+
+def test_refresh_force_and_pending_job_reuse(client, db, configured_nodes):
+    first = client.post("/nodes/refresh-configs", params={"central_server_url": NEW_CENTRAL}, headers=AUTH).json()
+    again = client.post("/nodes/refresh-configs", params={"central_server_url": NEW_CENTRAL}, headers=AUTH).json()
+    # 같은 조건의 작업이 대기 중이면 새로 추가하지 않음
+    assert again["id"] == first["id"]
+    assert db.query(Job).filter(Job.kind == node_bulk.REFRESH_CONFIGS_JOB).count() == 1
+    jobs.claim_jobs(1)
+    jobs.run_job(first["id"])
+
+    assert _run_refresh(client, force=True)["total"] == 5
+    assert client.post("/nodes/refresh-configs", params={"central_server_url": "ftp://x"},
+                       headers=AUTH).status_code == 400
@@ -0,0 +1,48 @@
+"""노드 캐시 write-through: 커밋 전에 도착한 무효화가 있으면 오래된 스냅샷을 다시 넣지 않음"""
+import pytest
+
+from database import SessionLocal
+from models import Node
+from node_cache import get_node, node_cache
+
+
+@pytest.fixture
+def cache(app, db, monkeypatch):
+    # PostgreSQL에서는 LISTEN 스레드가 켜야 사용되므로 테스트에서 직접 켬
+    monkeypatch.setattr(node_cache, "enabled", True)
+    db.add(Node(node_id="cache-w1", node_type="worker", hostname="initial"))
+    db.commit()
+    node_cache.clear()
+    return node_cache
+
+
+def _update(hostname: str, invalidate_before_commit: bool = False):
+    session = SessionLocal()
+    try:
+        session.get(Node, "cache-w1").hostname = hostname
+        session.flush()
+        if invalidate_before_commit:
+            # 다른 프로세스가 같은 노드를 바꾸고 보낸 NOTIFY가 이 커밋과 after_commit 사이에 도착
+            node_cache.invalidate(["cache-w1"])
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_commit_writes_through(cache):
+    _update("first")
+    cached = cache.get("cache-w1")
+    assert cached is not None and cached.hostname == "first"
+
+
+def test_invalidation_after_flush_skips_write_through(cache, db):
+    _update("first")
+    _update("second", invalidate_before_commit=True)
+    assert cache.get("cache-w1") is None
+
+    # 다음 조회는 DB에서 다시 읽어 캐시
+    db.query(Node).filter(Node.node_id == "cache-w1").update({"hostname": "from-other-process"})
+    db.commit()
+    cache.invalidate(["cache-w1"])
+    assert get_node("cache-w1").hostname == "from-other-process"
+    assert cache.get("cache-w1").hostname == "from-other-process"
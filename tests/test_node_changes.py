@@ -0,0 +1,117 @@
+"""노드 변경 피드: 커서 페이지, tombstone, 압축, 커밋 직전에만 잡는 순서 잠금"""
+import threading
+
+import pytest
+
+import node_changes
+from conftest import AUTH
+from database import SessionLocal, engine
+from models import Node, NodeChange
+
+
+def _feed(client, cursor=None, **params):
+    if cursor:
+        params["cursor"] = cursor
+    response = client.get("/nodes/changes", params=params, headers=AUTH)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _add(db, *node_ids):
+    for node_id in node_ids:
+        db.add(Node(node_id=node_id, node_type="worker", status="registered"))
+    db.commit()
+
+
+def test_snapshot_then_changes(client, db):
+    _add(db, "feed-1", "feed-2")
+    snapshot = _feed(client)
+    assert snapshot["snapshot"] is True
+    assert [change["node_id"] for change in snapshot["changes"]] == ["feed-1", "feed-2"]
+
+    db.get(Node, "feed-1").status = "connected"
+    db.delete(db.get(Node, "feed-2"))
+    db.commit()
+
+    page = _feed(client, snapshot["cursor"])
+    assert page["snapshot"] is False and page["has_more"] is False
+    changes = {change["node_id"]: change for change in page["changes"]}
+    assert changes["feed-1"]["op"] == "upsert" and changes["feed-1"]["node"]["status"] == "connected"
+    # 삭제는 tombstone
+    assert changes["feed-2"]["op"] == "delete" and changes["feed-2"]["node"] is None
+
+    # 변경이 없으면 같은 커서
+    assert _feed(client, page["cursor"]) == dict(page, changes=[], has_more=False)
+
+
+def test_cursor_paging(client, db):
+    cursor = _feed(client)["cursor"]
+    node_ids = [f"page-{i:02d}" for i in range(7)]
+    for node_id in node_ids:
+        _add(db, node_id)
+
+    seen, pages = [], 0
+    while True:
+        page = _feed(client, cursor, limit=3)
+        seen.extend(change["node_id"] for change in page["changes"])
+        cursor, pages = page["cursor"], pages + 1
+        if not page["has_more"]:
+            break
+    assert seen == node_ids
+    assert pages == 3
+
+
+def test_compaction_keeps_latest_per_node(client, db):
+    cursor = _feed(client)["cursor"]
+    _add(db, "compact-1", "compact-2")
+    for status in ("connected", "disconnected", "registered"):
+        db.get(Node, "compact-1").status = status
+        db.commit()
+    db.delete(db.get(Node, "compact-2"))
+    db.commit()
+    assert db.query(NodeChange).count() == 6
+
+    result = node_changes.compact_node_changes(db, {})
+    db.commit()
+    assert result == {"deleted": 4}
+    rows = db.query(NodeChange).order_by(NodeChange.seq).all()
+    assert [(row.node_id, row.op) for row in rows] == [("compact-1", "upsert"), ("compact-2", "delete")]
+
+    # 압축 전에 받은 커서도 그대로 이어서 씀
+    changes = {change["node_id"]: change["op"] for change in _feed(client, cursor)["changes"]}
+    assert changes == {"compact-1": "upsert", "compact-2": "delete"}
+
+
+def test_uncommitted_node_write_does_not_block_others(app, db):
+    if engine.dialect.name != "postgresql":
+        pytest.skip("SQLite serializes writers with BEGIN IMMEDIATE")
+    _add(db, "lock-1", "lock-2")
+
+    # 첫 트랜잭션은 노드 변경을 flush한 채 커밋하지 않음
+    first = SessionLocal()
+    first.get(Node, "lock-1").status = "connected"
+    first.flush()
+
+    committed = threading.Event()
+
+    def write_other_node():
+        other = SessionLocal()
+        try:
+            other.get(Node, "lock-2").status = "connected"
+            other.commit()
+            committed.set()
+        finally:
+            other.close()
+
+    thread = threading.Thread(target=write_other_node)
+    thread.start()
+    try:
+        assert committed.wait(5), "another node write waited for the open transaction"
+    finally:
+        first.commit()
+        first.close()
+        thread.join()
+
+    # seq는 커밋 순서
+    rows = db.query(NodeChange).order_by(NodeChange.seq).all()
+    assert [row.node_id for row in rows][-2:] == ["lock-2", "lock-1"]
@@ -0,0 +1,74 @@
+"""요청 프로파일러: 스레드풀에서 실행되는 동기 라우트/스트리밍 응답의 스택도 샘플링"""
+from time import perf_counter
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import profiling
+from conftest import AUTH
+
+BUSY_SECONDS = 0.2
+
+
+def _busy_sync_handler():
+    end = perf_counter() + BUSY_SECONDS
+    while perf_counter() < end:
+        pass
+    return {"ok": True}
+
+
+def _busy_chunks():
+    for _ in range(4):
+        end = perf_counter() + BUSY_SECONDS / 4
+        while perf_counter() < end:
+            pass
+        yield b"chunk\n"
+
+
+def _profiled_app():
+    inner = FastAPI()
+    inner.get("/sync")(_busy_sync_handler)
+
+    @inner.get("/stream")
+    async def stream():
+        return StreamingResponse(_busy_chunks(), media_type="text/plain")
+
+    return TestClient(profiling.ProfilingMiddleware(inner))
+
+
+def _profile(client, path: str) -> dict:
+    response = client.get(path, headers=dict(AUTH, **{"X-Profile": "1"}))
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    return next(profile for profile in profiling._all_profiles() if profile["id"] == profile_id)
+
+
+def _leaf_threads(profile: dict, function: str) -> set:
+    """function이 리프인 샘플이 잡힌 스레드 이름"""
+    return {
+        stack.split(";")[0]
+        for stack in profile["stacks"]
+        if stack.split(";")[-1].startswith(f"{function} ")
+    }
+
+
+def test_sync_route_running_in_threadpool_is_sampled():
+    profile = _profile(_profiled_app(), "/sync")
+    threads = _leaf_threads(profile, "_busy_sync_handler")
+    assert threads
+    # 이벤트 루프가 아닌 스레드풀 스레드에서 실행됨
+    assert "MainThread" not in threads
+
+
+def test_streaming_iterator_in_threadpool_is_sampled():
+    profile = _profile(_profiled_app(), "/stream")
+    assert _leaf_threads(profile, "_busy_chunks")
+
+
+def test_idle_threads_are_skipped():
+    profile = _profile(_profiled_app(), "/sync")
+    for stack in profile["stacks"]:
+        leaf = stack.split(";")[-1]
+        assert not leaf.startswith("select (selectors.py")
+        assert not leaf.startswith("wait (threading.py")
@@ -0,0 +1,71 @@
+"""엔드포인트별 쿼리 수 고정 (query_log.assert_num_queries)
+
+PostgreSQL은 노드 변경마다 NOTIFY를 보내고, 알림 리스너가 없는 테스트에서는 노드 캐시 대신 DB를 읽으므로
+DB 종류별로 기대값을 둡니다.
+"""
+import pytest
+
+import settings
+import webhooks
+import worker_integration
+from conftest import AUTH
+from database import engine
+from query_log import assert_num_queries
+
+
+def _expected(sqlite: int, postgresql: int) -> int:
+    return postgresql if engine.dialect.name == "postgresql" else sqlite
+
+
+@pytest.fixture(autouse=True)
+def _stable(monkeypatch):
+    monkeypatch.setattr(worker_integration, "get_lan_ip", lambda: "192.168.0.42")
+    monkeypatch.setattr(webhooks, "WEBHOOK_URLS", ["http://hook.test/events"])
+    # 공유 설정 재조회가 중간에 끼지 않도록
+    monkeypatch.setattr(settings, "SETTINGS_CACHE_TTL", 3600)
+
+
+def _register(client, node_id: str) -> str:
+    response = client.post("/worker/generate-qr", json={"node_id": node_id, "description": "test"})
+    assert response.status_code == 200
+    return response.json()["token"]
+
+
+def test_list_nodes_is_one_query(client):
+    for i in range(5):
+        _register(client, f"qc-list-{i}")
+    with assert_num_queries(1):
+        response = client.get("/nodes", headers=AUTH)
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+
+
+def test_stats_is_one_query(client):
+    for i in range(3):
+        _register(client, f"qc-stats-{i}")
+    with assert_num_queries(1):
+        response = client.get("/stats", headers=AUTH)
+    assert response.status_code == 200
+    assert response.json()["total_nodes"] == 3
+
+
+def test_install_flow_query_counts(client):
+    _register(client, "qc-warmup")
+
+    with assert_num_queries(_expected(sqlite=10, postgresql=14)):
+        token = _register(client, "qc-install")
+
+    with assert_num_queries(4):
+        response = client.post(f"/worker/process-installation/{token}")
+    assert response.status_code == 200
+
+    # 같은 토큰으로 다시 호출하면 저장된 결과만 읽음
+    with assert_num_queries(2):
+        response = client.post(f"/worker/process-installation/{token}")
+    assert response.json()["status"] == "existing"
+
+    # 설치 파일은 노드 캐시 + 저장된 아티팩트로 처리
+    for _ in range(2):
+        with assert_num_queries(_expected(sqlite=0, postgresql=1)):
+            response = client.get("/api/download/qc-install/setup-gui")
+        assert response.status_code == 200
@@ -0,0 +1,153 @@
+"""읽기 레플리카: WAL 위치 기준 read-your-writes
+
+통합 테스트는 로컬 PostgreSQL 두 개(primary + 스트리밍 스탠바이)가 필요합니다.
+    pg_basebackup -D standby -R -h <primary> -X stream && pg_ctl -D standby -o "-p 5433" start
+    TEST_PRIMARY_URL=postgresql://postgres@localhost:5432/postgres \
+    TEST_REPLICA_URL=postgresql://postgres@localhost:5433/postgres python -m pytest -q tests/test_replicas.py
+"""
+from time import monotonic, sleep, time
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import replicas
+from database import SessionLocal
+from models import AppSetting
+
+PRIMARY_URL = os.getenv("TEST_PRIMARY_URL")
+REPLICA_URL = os.getenv("TEST_REPLICA_URL")
+
+needs_standby = pytest.mark.skipif(
+    not (PRIMARY_URL and REPLICA_URL),
+    reason="TEST_PRIMARY_URL / TEST_REPLICA_URL (PostgreSQL primary + streaming standby) not set",
+)
+
+
+class _FakeReplica(replicas.ReplicaState):
+    def __init__(self, lag, replay_lsn):
+        super().__init__(engine=object())
+        self.lag, self.replay_lsn, self.checked_at = lag, replay_lsn, time()
+
+
+def test_lsn_round_trip():
+    assert replicas.parse_lsn("16/B374D848") == (0x16 << 32) + 0xB374D848
+    assert replicas.format_lsn(replicas.parse_lsn("0/3000148")) == "0/3000148"
+    with pytest.raises(ValueError):
+        replicas.parse_lsn("1700000000.123")
+
+
+def test_choose_read_engine_compares_wal_positions(monkeypatch):
+    behind = _FakeReplica(lag=0.0, replay_lsn=100)
+    caught_up = _FakeReplica(lag=0.0, replay_lsn=200)
+    logical = _FakeReplica(lag=0.0, replay_lsn=None)
+
+    monkeypatch.setattr(replicas, "_replicas", [behind, logical])
+    assert replicas.choose_read_engine(150) is replicas.engine
+    # 쓰기가 없으면 지연 한도만 봄
+    assert replicas.choose_read_engine(0) in (behind.engine, logical.engine)
+
+    monkeypatch.setattr(replicas, "_replicas", [behind, caught_up])
+    assert replicas.choose_read_engine(150) is caught_up.engine
+
+
+# ==================== primary + 스탠바이 ====================
+
+@pytest.fixture
+def pair(monkeypatch):
+    primary = create_engine(PRIMARY_URL)
+    standby = create_engine(REPLICA_URL, isolation_level="AUTOCOMMIT")
+    AppSetting.__table__.create(primary, checkfirst=True)
+    with standby.connect() as conn:
+        conninfo = conn.execute(text("SHOW primary_conninfo")).scalar()
+    state = replicas.ReplicaState(standby)
+    monkeypatch.setattr(replicas, "engine", primary)
+    monkeypatch.setattr(replicas, "_replicas", [state])
+    try:
+        yield primary, standby, state
+    finally:
+        with standby.connect() as conn:
+            conn.execute(text("SELECT pg_wal_replay_resume()"))
+            conn.execute(text("ALTER SYSTEM SET primary_conninfo = '%s'" % conninfo.replace("'", "''")))
+            conn.execute(text("SELECT pg_reload_conf()"))
+        with primary.begin() as conn:
+            conn.execute(AppSetting.__table__.delete().where(AppSetting.key == "rw-probe"))
+        primary.dispose()
+        standby.dispose()
+
+
+def _write(primary, value: str) -> int:
+    """요청 안에서 쓰기를 커밋하고 응답에 실릴 WAL 위치 반환"""
+    holder = [None]
+    token = replicas._request_write.set(holder)
+    try:
+        session = SessionLocal(bind=primary)
+        session.merge(AppSetting(key="rw-probe", value=value))
+        session.commit()
+        session.close()
+    finally:
+        replicas._request_write.reset(token)
+    assert holder[0] is not None
+    return holder[0]
+
+
+def _read(standby) -> str:
+    with standby.connect() as conn:
+        return conn.execute(text("SELECT value FROM app_settings WHERE key = 'rw-probe'")).scalar()
+
+
+def _wait_replayed(standby, state, lsn: int):
+    deadline = monotonic() + 10
+    while not state.has_replayed(lsn):
+        assert monotonic() < deadline, "standby did not replay the write"
+        sleep(0.05)
+        replicas.check_replicas()
+
+
+@needs_standby
+def test_paused_replay_reads_from_primary(pair):
+    primary, standby, state = pair
+    _wait_replayed(standby, state, _write(primary, "before"))
+    assert state.usable and state.lag == 0
+
+    with standby.connect() as conn:
+        conn.execute(text("SELECT pg_wal_replay_pause()"))
+    lsn = _write(primary, "after")
+    sleep(0.2)
+    replicas.check_replicas()
+    assert not state.has_replayed(lsn)
+    assert replicas.choose_read_engine(lsn) is primary
+
+    with standby.connect() as conn:
+        conn.execute(text("SELECT pg_wal_replay_resume()"))
+    _wait_replayed(standby, state, lsn)
+    assert replicas.choose_read_engine(lsn) is standby
+    assert _read(standby) == "after"
+
+
+@needs_standby
+def test_unreceived_wal_is_not_treated_as_replayed(pair):
+    primary, standby, state = pair
+    _wait_replayed(standby, state, _write(primary, "before"))
+
+    # WAL 수신을 끊으면 receive == replay 이지만 primary보다 뒤처짐
+    with standby.connect() as conn:
+        conn.execute(text("ALTER SYSTEM SET primary_conninfo = ''"))
+        conn.execute(text("SELECT pg_reload_conf()"))
+    deadline = monotonic() + 10
+    with standby.connect() as conn:
+        while conn.execute(text("SELECT count(*) FROM pg_stat_wal_receiver")).scalar():
+            assert monotonic() < deadline, "WAL receiver did not stop"
+            sleep(0.05)
+
+    lsn = _write(primary, "unreceived")
+    replicas.check_replicas()
+    with standby.connect() as conn:
+        received, replayed = conn.execute(
+            text("SELECT pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn(), pg_last_wal_replay_lsn()")
+        ).one()
+    assert received
+    assert replicas.parse_lsn(replayed) < lsn
+    assert state.lag is None or state.lag > 0
+    assert replicas.choose_read_engine(lsn) is primary
+    assert _read(standby) == "before"
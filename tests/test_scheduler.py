@@ -0,0 +1,95 @@
+"""주기 작업 스케줄러: 두 인스턴스 중 한 곳만 리더, 리더가 멈추면 다른 인스턴스가 이어받음"""
+from datetime import timedelta
+import time
+
+import pytest
+
+import scheduler
+from models import SchedulerLease
+
+TICK = 0.1
+
+
+@pytest.fixture
+def runs(app, monkeypatch):
+    """실행 기록만 남기는 주기 작업 하나 (기본 작업은 등록하지 않음)"""
+    monkeypatch.setattr(scheduler, "_tasks", {})
+    calls = []
+    scheduler.periodic_task("test-task", interval=3600)(lambda db: calls.append(time.monotonic()))
+    return calls
+
+
+@pytest.fixture
+def instances():
+    created = []
+
+    def make(worker_id: str) -> scheduler.Scheduler:
+        instance = scheduler.Scheduler(tick=TICK, worker_id=worker_id)
+        created.append(instance)
+        instance.start()
+        return instance
+
+    yield make
+    for instance in created:
+        instance.stop()
+
+
+def _wait_for(condition, timeout: float = 3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(TICK / 2)
+    raise AssertionError("condition not met")
+
+
+def _owner(db):
+    db.expire_all()
+    lease = db.get(SchedulerLease, "test-task")
+    return lease.owner if lease else None
+
+
+def test_only_one_instance_leads(db, runs, instances):
+    first = instances("sched-a")
+    _wait_for(lambda: "test-task" in first.leading)
+    second = instances("sched-b")
+    time.sleep(TICK * 5)
+
+    assert "test-task" not in second.leading
+    assert _owner(db) == "sched-a"
+    assert len(runs) == 1
+
+
+def test_stopped_leader_hands_over_without_rerun(db, runs, instances):
+    first = instances("sched-a")
+    _wait_for(lambda: "test-task" in first.leading)
+    second = instances("sched-b")
+
+    first.stop()
+    assert not first._thread.is_alive()
+    assert first.leading == {} and first._conn is None
+
+    _wait_for(lambda: "test-task" in second.leading)
+    assert _owner(db) == "sched-b"
+    # 이전 리더의 마지막 실행 시각부터 주기를 이어가므로 다시 실행하지 않음
+    time.sleep(TICK * 3)
+    assert len(runs) == 1
+
+
+def test_lease_of_dead_process_is_taken_over(db, runs, instances):
+    if scheduler.engine.dialect.name == "postgresql":
+        pytest.skip("PostgreSQL은 advisory lock으로 선출 (죽은 프로세스의 락은 커넥션과 함께 풀림)")
+    # 하트비트를 남기다 죽은 프로세스의 임대
+    now = scheduler._utcnow()
+    db.add(SchedulerLease(task="test-task", owner="dead-process", acquired_at=now, heartbeat_at=now, last_run_at=now))
+    db.commit()
+
+    survivor = instances("sched-b")
+    time.sleep(TICK)
+    # 하트비트가 아직 살아 있으면 이어받지 않음
+    assert "test-task" not in survivor.leading
+
+    _wait_for(lambda: "test-task" in survivor.leading)
+    assert _owner(db) == "sched-b"
+    assert survivor.leading["test-task"] > now + timedelta(seconds=3000)
+    assert runs == []
@@ -0,0 +1,51 @@
+"""설치 GUI 다운로드 1회당 최대 메모리 할당량 (tracemalloc)
+
+생성 결과(약 0.5MiB)를 통째로 여러 벌 만들면 한도를 넘도록 고정 한도를 둡니다.
+"""
+import tracemalloc
+
+import pytest
+
+from artifacts import invalidate_artifacts
+from models import Node
+from worker_integration import open_setup_gui
+
+# 처음 생성하면서 저장할 때 (PowerShell 스크립트 원문 + Docker Runner 함수 + 압축 상태)
+RENDER_PEAK_LIMIT = 1536 * 1024
+# 저장된 파일을 보낼 때 (읽기 조각 몇 개)
+STORED_PEAK_LIMIT = 256 * 1024
+
+
+@pytest.fixture
+def node(app):
+    node = Node(node_id="mem-w1", node_type="worker", status="registered", vpn_ip="192.168.0.42",
+                description="test", central_server_url="http://192.168.0.5:8000",
+                docker_env_vars='{"GPU_MODEL": "RTX 2080"}')
+    # import/캐시 등 처음 한 번만 생기는 할당은 측정에서 제외
+    _download(node)
+    invalidate_artifacts(node.node_id)
+    yield node
+    invalidate_artifacts(node.node_id)
+
+
+def _download(node):
+    """(저장된 파일이었는지, 보낸 바이트 수, 최대 할당량)"""
+    tracemalloc.start()
+    try:
+        path, chunks = open_setup_gui(node)
+        size = sum(len(chunk) for chunk in chunks)
+        return path is not None, size, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_setup_gui_download_peak_allocation(node):
+    stored, size, peak = _download(node)
+    assert not stored
+    assert size > 256 * 1024
+    assert peak < RENDER_PEAK_LIMIT, f"first download allocated {peak} bytes at peak ({size} bytes sent)"
+
+    stored, cached_size, peak = _download(node)
+    assert stored
+    assert cached_size == size
+    assert peak < STORED_PEAK_LIMIT, f"stored download allocated {peak} bytes at peak"
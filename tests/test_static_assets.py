@@ -0,0 +1,47 @@
+"""페이지 자산: API와 웹 대시보드가 같은 page_assets 코드로 분리/압축/ETag 처리"""
+import gzip
+
+import page_assets
+
+
+def _asset_urls(html: str) -> list:
+    return [part.split('"')[0] for part in html.split('href="/static/')[1:] + html.split('src="/static/')[1:]]
+
+
+def test_negotiate():
+    compiled = page_assets.compile_page("<p>" + "x" * 2000 + "</p>")
+    status, body, headers = compiled.negotiate(None, "gzip, br", {"Cache-Control": "no-cache"})
+    assert status == 200 and gzip.decompress(body) == compiled.body
+    assert headers["Content-Encoding"] == "gzip" and headers["Cache-Control"] == "no-cache"
+    assert compiled.negotiate(f'W/{compiled.etag}', "gzip")[0] == 304
+    assert compiled.negotiate(None, None)[1] == compiled.body
+
+
+def test_api_serves_split_assets(client):
+    page = client.get("/worker/setup")
+    assert page.status_code == 200
+    assert "<style>" not in page.text
+    for name in _asset_urls(page.text):
+        asset = client.get(f"/static/{name}")
+        assert asset.status_code == 200
+        assert asset.headers["cache-control"] == page_assets.STATIC_CACHE_CONTROL
+        assert client.get(f"/static/{name}", headers={"If-None-Match": asset.headers["etag"]}).status_code == 304
+    assert client.get("/worker/setup", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+
+
+def test_dashboard_uses_shared_page_assets(dashboard_module):
+    client = dashboard_module.app.test_client()
+    assert dashboard_module.page_assets is page_assets
+
+    page = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert page.status_code == 200
+    assert page.headers["Content-Encoding"] == "gzip"
+    html = gzip.decompress(page.data).decode()
+    assert "<style>" not in html and "<script>" not in html
+    names = _asset_urls(html)
+    assert names
+    for name in names:
+        asset = client.get(f"/static/{name}")
+        assert asset.status_code == 200
+        assert asset.headers["Cache-Control"] == page_assets.STATIC_CACHE_CONTROL
+        assert client.get(f"/static/{name}", headers={"If-None-Match": asset.headers["ETag"]}).status_code == 304
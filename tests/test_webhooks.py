@@ -0,0 +1,151 @@
+"""웹훅 전송: 로컬 수신 서버로 배치, 서명, 백오프 재시도, WEBHOOK_MAX_ATTEMPTS 후 실패 처리 확인"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep
+import json
+import threading
+
+import pytest
+
+import webhooks
+from models import WebhookOutbox
+
+SECRET = "test-webhook-secret"
+
+
+class Receiver:
+    """받은 요청을 기록하고 statuses 순서대로 응답하는 수신 서버 (다 쓰면 200)"""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                signed = webhooks.verify_signature(
+                    SECRET, self.headers.get("X-Webhook-Timestamp", ""), body,
+                    self.headers.get("X-Webhook-Signature", ""),
+                )
+                with receiver.lock:
+                    receiver.requests.append({"at": monotonic(), "signed": signed, "body": json.loads(body)})
+                    status = receiver.statuses.pop(0) if receiver.statuses else 200
+                if not signed:
+                    status = 401
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hooks"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def event_ids(self):
+        with self.lock:
+            return [event["id"] for request in self.requests for event in request["body"]["events"]]
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    receiver = Receiver()
+    monkeypatch.setattr(webhooks, "WEBHOOK_URLS", [receiver.url])
+    monkeypatch.setattr(webhooks, "WEBHOOK_SECRET", SECRET)
+    yield receiver
+    receiver.close()
+
+
+@pytest.fixture
+def dispatcher(receiver):
+    dispatcher = webhooks.WebhookDispatcher([receiver.url], poll_interval=0.02)
+    yield dispatcher
+    dispatcher.stop()
+
+
+def _emit(db, count: int):
+    for i in range(count):
+        webhooks.emit_event(db, "webhook.test", data={"i": i})
+    db.commit()
+    return [row.id for row in db.query(WebhookOutbox.id).order_by(WebhookOutbox.id)]
+
+
+def _wait_for(predicate, timeout: float = 10):
+    deadline = monotonic() + timeout
+    while not predicate():
+        assert monotonic() < deadline, "timed out"
+        sleep(0.02)
+
+
+def _statuses(db):
+    db.expire_all()
+    return {row.status for row in db.query(WebhookOutbox)}
+
+
+def test_signature_round_trip():
+    body = b'{"events":[]}'
+    timestamp = str(int(webhooks.time()))
+    signature = webhooks.sign_payload(SECRET, timestamp, body)
+    assert webhooks.verify_signature(SECRET, timestamp, body, signature)
+    assert not webhooks.verify_signature(SECRET, timestamp, body + b" ", signature)
+    assert not webhooks.verify_signature("other-secret", timestamp, body, signature)
+    # 오래된 timestamp는 재전송으로 보고 거부
+    old = str(int(timestamp) - 3600)
+    assert not webhooks.verify_signature(SECRET, old, body, webhooks.sign_payload(SECRET, old, body))
+
+
+def test_events_are_batched_and_signed(db, receiver, dispatcher, monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_BATCH_SIZE", 100)
+    ids = _emit(db, 250)
+
+    dispatcher.start()
+    _wait_for(lambda: _statuses(db) == {"delivered"})
+
+    assert sorted(receiver.event_ids()) == ids
+    sizes = sorted(len(request["body"]["events"]) for request in receiver.requests)
+    assert sizes == [50, 100, 100]
+    assert all(request["signed"] for request in receiver.requests)
+
+
+def test_failed_batch_is_retried_with_backoff(db, receiver, dispatcher, monkeypatch):
+    base = 0.2
+    monkeypatch.setattr(webhooks, "WEBHOOK_RETRY_BASE_DELAY", base)
+    receiver.statuses = [503, 503]
+    ids = _emit(db, 3)
+
+    dispatcher.start()
+    _wait_for(lambda: _statuses(db) == {"delivered"})
+
+    # 같은 배치를 세 번 (실패, 실패, 성공)
+    assert [sorted(e["id"] for e in r["body"]["events"]) for r in receiver.requests] == [ids] * 3
+    first, second, third = (request["at"] for request in receiver.requests)
+    # retry_delay(n) = base * 2^(n-1) * [0.5, 1.0]
+    assert second - first >= base * 0.5
+    assert third - second >= base
+    db.expire_all()
+    assert {row.attempts for row in db.query(WebhookOutbox)} == {3}
+
+
+def test_batch_fails_after_max_attempts(db, receiver, dispatcher, monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(webhooks, "WEBHOOK_RETRY_BASE_DELAY", 0.02)
+    receiver.statuses = [500] * 10
+    _emit(db, 2)
+
+    dispatcher.start()
+    _wait_for(lambda: _statuses(db) == {"failed"})
+    sleep(0.3)
+
+    # 실패 처리된 뒤에는 더 보내지 않음
+    assert len(receiver.requests) == 3
+    db.expire_all()
+    rows = db.query(WebhookOutbox).all()
+    assert {row.attempts for row in rows} == {3}
+    assert all(row.last_error.startswith("HTTP 500") for row in rows)
@@ -0,0 +1,56 @@
+"""POST /worker/status:batch: 찾은 노드와 없는 노드, 요청 크기 제한, 캐시에 없는 노드만 쿼리 한 번"""
+import json
+
+import pytest
+
+import worker_integration
+from models import Node
+from node_cache import node_cache
+from query_log import assert_num_queries
+
+
+@pytest.fixture
+def nodes(db):
+    db.add(Node(node_id="st-1", node_type="worker", status="registered", description="first",
+                central_server_url="http://10.0.0.1:8000", docker_env_vars=json.dumps({"GPU": "1"})))
+    db.add(Node(node_id="st-2", node_type="worker", status="active", docker_env_vars="not-json"))
+    db.add(Node(node_id="st-3", node_type="worker", status="pending"))
+    db.commit()
+
+
+def _batch(client, node_ids):
+    return client.post("/worker/status:batch", json={"node_ids": node_ids})
+
+
+def test_found_and_missing_ids(client, nodes):
+    response = _batch(client, ["st-1", "missing-1", "st-2", "st-1", "missing-1"])
+    assert response.status_code == 200
+    body = response.json()
+
+    # 중복은 한 번만, 요청 순서대로
+    assert list(body["nodes"]) == ["st-1", "st-2"]
+    assert body["missing"] == ["missing-1"]
+    # 노드별 GET /worker/status/{node_id}와 같은 형식
+    assert body["nodes"]["st-1"] == client.get("/worker/status/st-1").json()
+    assert body["nodes"]["st-1"]["docker_env"] == {"GPU": "1"}
+    # docker_env가 JSON이 아니면 null
+    assert body["nodes"]["st-2"]["docker_env"] is None
+
+
+def test_uncached_nodes_are_read_in_one_query(client, nodes, monkeypatch):
+    monkeypatch.setattr(node_cache, "enabled", True)
+    node_cache.clear()
+    with assert_num_queries(1):
+        assert len(_batch(client, ["st-1", "st-2", "st-3"]).json()["nodes"]) == 3
+    # 모두 캐시에 있으면 쿼리 없음
+    with assert_num_queries(0):
+        assert len(_batch(client, ["st-1", "st-2", "st-3"]).json()["nodes"]) == 3
+
+
+def test_max_length(client, nodes):
+    at_limit = _batch(client, ["st-1"] * worker_integration.NODE_STATUS_BATCH_MAX)
+    assert at_limit.status_code == 200
+    assert list(at_limit.json()["nodes"]) == ["st-1"]
+
+    assert _batch(client, ["st-1"] * (worker_integration.NODE_STATUS_BATCH_MAX + 1)).status_code == 422
+    assert _batch(client, []).json() == {"nodes": {}, "missing": []}
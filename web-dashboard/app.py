@@ -3,14 +3,28 @@
 Worker Manager Web Dashboard
 """
 
-from flask import Flask, render_template_string, jsonify, request, redirect, url_for, make_response
+from flask import Flask, jsonify, request, redirect, url_for, make_response, g, Response
+from bisect import bisect_left
 import requests
+from urllib3.util.retry import Retry
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import secrets
+import threading
+import time
 import os
+import sys
 
-app = Flask(__name__)
+# 페이지 자산 분리/압축은 API와 같은 코드(api/page_assets.py)를 사용
+# 이미지에는 app.py 옆에 복사, compose는 /shared에 마운트(PYTHONPATH), 저장소에서 바로 실행하면 ../api에서 가져옴
+try:
+    import page_assets
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+    import page_assets
+
+# /static은 페이지에서 분리한 CSS/JS 라우트가 사용
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.getenv('SECRET_KEY', secrets.token_hex(32))
 
 # Global configuration - 환경변수에서 한 번만 로드
@@ -23,6 +37,313 @@ API_URL_INTERNAL = os.getenv('API_URL', 'http://vpn-api:8091')
 # 외부 API URL (브라우저 접근용)
 API_URL = f"http://{LOCAL_SERVER_IP}:8091"
 API_TOKEN = os.getenv('API_TOKEN', 'test-token-123')
+# 'Cleanup disconnected'가 지우는 노드: 이 시간 동안 갱신되지 않은 disconnected/pending 노드
+DISCONNECTED_NODE_HOURS = float(os.getenv('DISCONNECTED_NODE_HOURS', '24'))
+# 'Sync All' / 'Fix Configs'가 노드 설정 일괄 갱신 작업을 기다리는 최대 시간 (넘으면 진행 상황만 표시)
+CONFIG_REFRESH_TIMEOUT = float(os.getenv('CONFIG_REFRESH_TIMEOUT', '60'))
+# API(업스트림)가 연속 이만큼 실패하면 회로를 열고 CIRCUIT_RESET_TIMEOUT초 동안 요청 없이 바로 실패
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '10'))
+# 노드 목록 스냅샷을 새로 가져오지 않고 그대로 쓰는 시간(초) - 지나면 바로 응답하고 백그라운드에서 갱신
+NODES_SNAPSHOT_TTL = float(os.getenv('NODES_SNAPSHOT_TTL', '5'))
+
+# ==================== Metrics ====================
+# Prometheus 텍스트 포맷으로 /metrics 노출 (엔드포인트별 지연시간, 진행 중 요청 수)
+_METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_metrics_lock = threading.Lock()
+_latency_stats = {}   # (method, endpoint) -> [bucket counts..., +Inf]
+_latency_sums = {}    # (method, endpoint) -> 누적 초
+_status_counts = {}   # (method, endpoint, status) -> 요청 수
+_in_flight = [0]
+
+
+@app.before_request
+def _metrics_before_request():
+    g.metrics_start = time.perf_counter()
+    with _metrics_lock:
+        _in_flight[0] += 1
+
+
+@app.teardown_request
+def _metrics_teardown_request(exc):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    endpoint = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    key = (request.method, endpoint)
+    status = g.pop('metrics_status', 500 if exc is not None else 200)
+    with _metrics_lock:
+        _in_flight[0] -= 1
+        counts = _latency_stats.get(key)
+        if counts is None:
+            counts = _latency_stats[key] = [0] * (len(_METRICS_BUCKETS) + 1)
+        counts[bisect_left(_METRICS_BUCKETS, elapsed)] += 1
+        _latency_sums[key] = _latency_sums.get(key, 0.0) + elapsed
+        status_key = (request.method, endpoint, status)
+        _status_counts[status_key] = _status_counts.get(status_key, 0) + 1
+
+
+@app.after_request
+def _metrics_after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _render_metrics():
+    lines = [
+        '# HELP worker_dashboard_http_requests_total HTTP requests by endpoint and status code',
+        '# TYPE worker_dashboard_http_requests_total counter',
+    ]
+    with _metrics_lock:
+        status_counts = dict(_status_counts)
+        latency_stats = {key: list(counts) for key, counts in _latency_stats.items()}
+        latency_sums = dict(_latency_sums)
+        in_flight = _in_flight[0]
+    for (method, endpoint, status), count in status_counts.items():
+        lines.append(f'worker_dashboard_http_requests_total{{method="{method}",endpoint="{endpoint}",status="{status}"}} {count}')
+    lines.append('# HELP worker_dashboard_http_request_duration_seconds HTTP request latency by endpoint')
+    lines.append('# TYPE worker_dashboard_http_request_duration_seconds histogram')
+    for (method, endpoint), counts in latency_stats.items():
+        labels = f'method="{method}",endpoint="{endpoint}"'
+        cumulative = 0
+        for bound, count in zip(_METRICS_BUCKETS + (None,), counts):
+            cumulative += count
+            le = '+Inf' if bound is None else repr(bound)
+            lines.append(f'worker_dashboard_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'worker_dashboard_http_request_duration_seconds_sum{{{labels}}} {latency_sums[(method, endpoint)]}')
+        lines.append(f'worker_dashboard_http_request_duration_seconds_count{{{labels}}} {cumulative}')
+    lines.append('# HELP worker_dashboard_http_requests_in_flight HTTP requests currently being processed')
+    lines.append('# TYPE worker_dashboard_http_requests_in_flight gauge')
+    lines.append(f'worker_dashboard_http_requests_in_flight {in_flight}')
+    lines.append('# HELP worker_dashboard_upstream_circuit_open Whether the circuit breaker for an upstream is open (1) or half-open (0.5)')
+    lines.append('# TYPE worker_dashboard_upstream_circuit_open gauge')
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    for breaker in breakers:
+        value = {'closed': 0, 'half-open': 0.5, 'open': 1}[breaker.state]
+        lines.append(f'worker_dashboard_upstream_circuit_open{{upstream="{breaker.name}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus 스크레이프 엔드포인트"""
+    response = make_response(_render_metrics())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+# ==================== Upstream ====================
+# API 호출은 모두 _http 세션을 사용 (keep-alive 연결 재사용 + 업스트림(호스트)별 회로 차단기)
+# API가 재시작 중이거나 멈춰 있으면 요청마다 timeout만큼 Flask 스레드를 잡지 않고 바로 실패합니다.
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """회로가 열려 있어 업스트림에 요청하지 않음"""
+
+
+class _CircuitBreaker:
+    """연속 실패 수 기반 회로 차단기 (closed -> open -> half-open)
+
+    - closed: 요청 허용. 연결 실패/timeout/502~504가 CIRCUIT_FAILURE_THRESHOLD번 연속되면 open
+    - open: CIRCUIT_RESET_TIMEOUT초 동안 요청 없이 바로 실패
+    - half-open: 시험 요청 하나만 보내고 성공하면 closed, 실패하면 다시 open
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < CIRCUIT_RESET_TIMEOUT:
+                return 'open'
+            return 'half-open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < CIRCUIT_RESET_TIMEOUT:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"[INFO] Upstream {self.name} recovered, circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if self._opened_at is None:
+                    print(f"[WARN] Upstream {self.name} failing, circuit open for {CIRCUIT_RESET_TIMEOUT}s")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """업스트림 상태와 무관한 오류 - 다음 요청이 다시 시험하도록 시험 표시만 해제"""
+        with self._lock:
+            self._probing = False
+
+
+_UPSTREAM_FAILURE_STATUS = (502, 503, 504)
+
+
+def _is_upstream_failure(response):
+    """업스트림 장애 응답인지 확인
+
+    API의 부하 차단(admission)은 Retry-After와 함께 503/429를 돌려주는데,
+    이는 API가 정상 동작하며 일부 요청만 돌려보낸 것이므로 장애로 세지 않음
+    """
+    if response.status_code not in _UPSTREAM_FAILURE_STATUS:
+        return False
+    return not (response.status_code == 503 and 'Retry-After' in response.headers)
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def _breaker_for(url):
+    name = requests.utils.urlparse(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = _CircuitBreaker(name)
+        return breaker
+
+
+class _UpstreamSession(requests.Session):
+    """회로 차단기를 거치는 requests 세션"""
+
+    def request(self, method, url, *args, **kwargs):
+        breaker = _breaker_for(url)
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"API unavailable ({breaker.name}), retry in a few seconds")
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            breaker.record_failure()
+            raise
+        except Exception:
+            breaker.release()
+            raise
+        if response.status_code >= 500:
+            # 처리되지 않은 예외 뒤 API(uvicorn)가 연결을 닫으므로 풀에 남은 연결을 버림
+            self.get_adapter(url).close()
+        if _is_upstream_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+
+_http = _UpstreamSession()
+# API가 닫은 유휴 keep-alive 연결을 재사용하다 끊긴 경우 등 - 멱등 메서드(GET/PUT/DELETE)만 한 번 재시도
+_http.mount('http://', requests.adapters.HTTPAdapter(
+    pool_maxsize=32, max_retries=Retry(total=1, status=0, redirect=0, raise_on_status=False)))
+
+
+def _error_response(e):
+    """업스트림 호출 실패 응답 (회로가 열려 있으면 503)"""
+    if isinstance(e, UpstreamUnavailable):
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'error': str(e)}), 500
+
+
+class _Snapshot:
+    """마지막 정상 응답 (stale-while-revalidate)
+
+    - NODES_SNAPSHOT_TTL 안이면 그대로 반환
+    - 지났으면 바로 반환(stale)하고 백그라운드 스레드 하나가 갱신
+    - 스냅샷이 없거나 변경 요청 뒤(invalidate)면 직접 가져오고, 실패하면 남아 있는 스냅샷을 stale로 반환
+    """
+
+    def __init__(self, name, fetch):
+        self.name = name
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._data = None
+        self._fetched_at = None
+        self._invalidated = False
+        # invalidate()마다 증가 (가져오는 도중 무효화됐으면 그 결과를 저장하지 않기 위해)
+        self._generation = 0
+        self._refreshing = False
+        # 마지막 갱신 실패 (성공하면 None)
+        self.last_error = None
+
+    def invalidate(self):
+        with self._lock:
+            self._invalidated = True
+            self._generation += 1
+
+    def _refresh(self):
+        with self._lock:
+            generation = self._generation
+        try:
+            data = self._fetch()
+        except Exception as e:
+            self.last_error = str(e) or type(e).__name__
+            raise
+        fetched_at = time.time()
+        with self._lock:
+            # 가져오기 시작한 뒤 변경 요청이 있었으면 변경 전 데이터일 수 있으므로 저장하지 않음
+            if generation == self._generation:
+                self._data = data
+                self._fetched_at = fetched_at
+                self._invalidated = False
+            self.last_error = None
+        return data, fetched_at
+
+    def _background_refresh(self):
+        try:
+            self._refresh()
+        except Exception as e:
+            print(f"[WARN] Background refresh of {self.name} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        """(데이터, stale 여부, 가져온 시각) - 스냅샷도 없이 가져오기에 실패하면 예외"""
+        with self._lock:
+            data, fetched_at = self._data, self._fetched_at
+            usable = data is not None and not self._invalidated
+            fresh = usable and time.time() - fetched_at < NODES_SNAPSHOT_TTL
+            revalidate = usable and not fresh and not self._refreshing
+            if revalidate:
+                self._refreshing = True
+        if fresh:
+            return data, False, fetched_at
+        if usable:
+            if revalidate:
+                threading.Thread(target=self._background_refresh, name=f'{self.name}-refresh', daemon=True).start()
+            return data, True, fetched_at
+        try:
+            latest, latest_at = self._refresh()
+            return latest, False, latest_at
+        except Exception as e:
+            if data is None:
+                raise
+            print(f"[WARN] Refresh of {self.name} failed, serving stale snapshot: {e}")
+            return data, True, fetched_at
+
+
+@app.after_request
+def _invalidate_snapshots(response):
+    # 노드를 바꿀 수 있는 요청이 성공하면 다음 목록 조회는 API에서 직접 가져옴
+    if request.method != 'GET' and response.status_code < 400:
+        _nodes_snapshot.invalidate()
+    return response
 
 # HTML Template
 DASHBOARD_TEMPLATE = """
@@ -423,7 +744,7 @@ DASHBOARD_TEMPLATE = """
         <div class="main-content">
             <div class="nodes-section">
                 <div class="section-header">
-                    <h2>📡 Network Nodes</h2>
+                    <h2>📡 Network Nodes <span id="nodes-stale" style="display: none; font-size: 13px; font-weight: normal; color: #d69e2e;"></span></h2>
                     <div class="btn-group">
                         <button class="btn btn-primary" onclick="refreshNodes()">
                             🔄 Refresh
@@ -494,6 +815,7 @@ DASHBOARD_TEMPLATE = """
     
     <script>
         let currentNodes = [];
+        let staleRetry = null;
         
         function formatDate(dateStr) {
             if (!dateStr) return '-';
@@ -532,6 +854,14 @@ DASHBOARD_TEMPLATE = """
                 
                 currentNodes = data.nodes || [];
                 
+                // 오래된 목록(stale)이면 서버가 백그라운드에서 갱신 중이므로 잠시 뒤 다시 조회
+                const staleNote = document.getElementById('nodes-stale');
+                staleNote.style.display = data.refresh_error ? 'inline' : 'none';
+                staleNote.textContent = data.refresh_error ? `⚠️ API unavailable - showing nodes from ${formatDateShort(data.fetched_at)}` : '';
+                if (data.stale && !staleRetry) {
+                    staleRetry = setTimeout(() => { staleRetry = null; loadNodes(); }, 3000);
+                }
+                
                 // Update stats
                 document.getElementById('total-nodes').textContent = data.total || '0';
                 document.getElementById('connected-nodes').textContent = data.connected || '0';
@@ -740,7 +1070,11 @@ DASHBOARD_TEMPLATE = """
                 
                 if (!response.ok) throw new Error(data.error || 'Sync failed');
                 
-                alert(`Sync Complete:\n\nSynced: ${data.synced} nodes\nFailed: ${data.failed} nodes`);
+                if (response.status === 202) {
+                    alert(`Sync still running (job #${data.job_id}):\n\nSynced so far: ${data.synced} of ${data.total} nodes`);
+                } else {
+                    alert(`Sync Complete:\n\nSynced: ${data.synced} nodes\nFailed: ${data.failed} nodes`);
+                }
                 await loadNodes();
             } catch (error) {
                 alert('Error syncing nodes: ' + error.message);
@@ -761,7 +1095,11 @@ DASHBOARD_TEMPLATE = """
                 
                 if (!response.ok) throw new Error(data.error || 'Refresh failed');
                 
-                alert(`Config Refresh Complete:\n\nUpdated: ${data.updated} nodes\nFailed: ${data.failed} nodes\n\nClients need to re-download and import the new configs.`);
+                if (response.status === 202) {
+                    alert(`Config refresh still running (job #${data.job_id}):\n\nUpdated so far: ${data.updated} of ${data.total} nodes`);
+                } else {
+                    alert(`Config Refresh Complete:\n\nUpdated: ${data.updated} nodes\nFailed: ${data.failed} nodes\n\nClients need to re-download and import the new configs.`);
+                }
                 await loadNodes();
             } catch (error) {
                 alert('Error refreshing configs: ' + error.message);
@@ -788,10 +1126,21 @@ DASHBOARD_TEMPLATE = """
 </html>
 """
 
-@app.route('/')
-def index():
-    """Landing page"""
-    landing_html = """
+# ==================== 정적 페이지 / 자산 ====================
+# 페이지의 인라인 CSS/JS를 내용 해시 이름의 /static 파일로 분리하고 (1년 immutable 캐시)
+# 페이지와 자산은 시작할 때 한 번 만들어 gzip 압축 + ETag로 내보냄 (API와 같은 page_assets 사용)
+
+def _compiled_response(compiled, cache_control):
+    """ETag가 같으면 304, gzip을 받으면 미리 압축한 본문"""
+    status, body, headers = compiled.negotiate(
+        request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'),
+        {'Cache-Control': cache_control}
+    )
+    if status == 304:
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype=compiled.media_type, headers=headers)
+
+LANDING_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="ko">
 <head>
@@ -1120,84 +1469,128 @@ def index():
 </body>
 </html>
     """
-    return landing_html.replace('{LOCAL_SERVER_IP}', LOCAL_SERVER_IP)
 
-@app.route('/api/nodes')
-def get_nodes():
-    """Get all nodes from API"""
+LANDING_PAGE = page_assets.compile_page(
+    page_assets.split_inline_assets('landing', LANDING_TEMPLATE).replace('{LOCAL_SERVER_IP}', LOCAL_SERVER_IP)
+)
+
+@app.route('/')
+def index():
+    """Landing page"""
+    return _compiled_response(LANDING_PAGE, page_assets.PAGE_CACHE_CONTROL)
+
+@app.route('/static/<path:filename>')
+def static_asset(filename):
+    """페이지에서 분리한 CSS/JS (대시보드 것이 아니면 API 설정/설치 페이지 자산을 프록시)"""
+    compiled = page_assets.get_asset(filename)
+    if compiled is not None:
+        return _compiled_response(compiled, page_assets.STATIC_CACHE_CONTROL)
     try:
-        headers = {'Authorization': f'Bearer {API_TOKEN}'}
-        
-        # Try the custom node manager endpoint first
-        try:
-            response = requests.get(f'{API_URL_INTERNAL}/api/nodes/list', headers=headers, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Calculate statistics
-                total = data.get('total', 0)
-                nodes = data.get('nodes', [])
-                
-                connected = sum(1 for n in nodes if n.get('status') == 'connected')
-                registered = sum(1 for n in nodes if n.get('status') == 'registered')
-                disconnected = sum(1 for n in nodes if n.get('status') == 'disconnected')
-                
-                return jsonify({
-                    'total': total,
-                    'connected': connected,
-                    'registered': registered,
-                    'disconnected': disconnected,
-                    'nodes': nodes
-                })
-        except:
-            pass
-        
-        # Fallback to standard endpoint
-        response = requests.get(f'{API_URL_INTERNAL}/nodes', headers=headers, timeout=5)
-        
+        response = _http.get(f"{API_URL_INTERNAL}/static/{filename}", headers=_download_headers({}),
+                             timeout=10, stream=True)
+        return _stream_download(response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 502
+
+def _fetch_nodes_summary():
+    """API에서 노드 목록과 상태별 개수를 가져옴 (실패하면 예외)"""
+    headers = {'Authorization': f'Bearer {API_TOKEN}'}
+
+    # Try the custom node manager endpoint first
+    try:
+        response = _http.get(f'{API_URL_INTERNAL}/api/nodes/list', headers=headers, timeout=5)
         if response.status_code == 200:
-            nodes = response.json()
+            data = response.json()
             
             # Calculate statistics
-            total = len(nodes)
-            connected = sum(1 for n in nodes if n.get('connected', False))
-            registered = sum(1 for n in nodes if n.get('status') == 'registered')
-            disconnected = total - connected
+            total = data.get('total', 0)
+            nodes = data.get('nodes', [])
             
-            # Transform to expected format
-            formatted_nodes = []
-            for node in nodes:
-                formatted_nodes.append({
-                    'node_id': node.get('node_id'),
-                    'node_type': node.get('node_type'),
-                    'hostname': node.get('hostname'),
-                    'vpn_ip': node.get('vpn_ip'),
-                    'status': 'connected' if node.get('connected') else node.get('status', 'disconnected'),
-                    'created_at': node.get('created_at'),
-                    'updated_at': node.get('updated_at')
-                })
+            connected = sum(1 for n in nodes if n.get('status') == 'connected')
+            registered = sum(1 for n in nodes if n.get('status') == 'registered')
+            disconnected = sum(1 for n in nodes if n.get('status') == 'disconnected')
             
-            return jsonify({
+            return {
                 'total': total,
                 'connected': connected,
                 'registered': registered,
                 'disconnected': disconnected,
-                'nodes': formatted_nodes
+                'nodes': nodes
+            }
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        # API에 닿지 않으면 다른 엔드포인트도 마찬가지
+        raise
+    except:
+        pass
+    
+    # Fallback to standard endpoint
+    response = _http.get(f'{API_URL_INTERNAL}/nodes', headers=headers, timeout=5)
+    
+    if response.status_code == 200:
+        nodes = response.json()
+        
+        # Calculate statistics
+        total = len(nodes)
+        connected = sum(1 for n in nodes if n.get('connected', False))
+        registered = sum(1 for n in nodes if n.get('status') == 'registered')
+        disconnected = total - connected
+        
+        # Transform to expected format
+        formatted_nodes = []
+        for node in nodes:
+            formatted_nodes.append({
+                'node_id': node.get('node_id'),
+                'node_type': node.get('node_type'),
+                'hostname': node.get('hostname'),
+                'vpn_ip': node.get('vpn_ip'),
+                'status': 'connected' if node.get('connected') else node.get('status', 'disconnected'),
+                'created_at': node.get('created_at'),
+                'updated_at': node.get('updated_at')
             })
-        else:
-            return jsonify({'error': f'API returned {response.status_code}', 'nodes': []})
-            
+        
+        return {
+            'total': total,
+            'connected': connected,
+            'registered': registered,
+            'disconnected': disconnected,
+            'nodes': formatted_nodes
+        }
+    else:
+        raise RuntimeError(f'API returned {response.status_code}')
+
+
+_nodes_snapshot = _Snapshot('nodes', _fetch_nodes_summary)
+
+
+@app.route('/api/nodes')
+def get_nodes():
+    """Get all nodes from API
+
+    마지막 정상 응답을 바로 반환하고 오래됐으면 백그라운드에서 갱신합니다.
+    스냅샷에서 나간 응답은 stale=true와 Warning 헤더가 붙고, 마지막 갱신이 실패했으면 refresh_error가 들어갑니다.
+    """
+    try:
+        data, stale, fetched_at = _nodes_snapshot.get()
     except requests.exceptions.Timeout:
         return jsonify({'error': 'API timeout', 'nodes': []})
+    except UpstreamUnavailable as e:
+        return jsonify({'error': str(e), 'nodes': []}), 503
     except Exception as e:
         return jsonify({'error': str(e), 'nodes': []})
 
+    response = jsonify(dict(data, stale=stale, refresh_error=_nodes_snapshot.last_error,
+                            fetched_at=datetime.fromtimestamp(fetched_at, timezone.utc).isoformat()))
+    if stale:
+        response.headers['Warning'] = '110 - "Response is Stale"'
+    return response
+
+
 @app.route('/api/test-connectivity', methods=['POST'])
 def test_connectivity():
     """Test connectivity to all nodes"""
     try:
         headers = {'Authorization': f'Bearer {API_TOKEN}'}
-        response = requests.post(f'{API_URL_INTERNAL}/api/nodes/test-connectivity', headers=headers, timeout=30)
+        response = _http.post(f'{API_URL_INTERNAL}/api/nodes/test-connectivity', headers=headers, timeout=30)
         
         if response.status_code == 200:
             return jsonify(response.json())
@@ -1205,7 +1598,7 @@ def test_connectivity():
             return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/node/<node_id>/test', methods=['POST'])
 def test_single_node(node_id):
@@ -1214,18 +1607,18 @@ def test_single_node(node_id):
         headers = {'Authorization': f'Bearer {API_TOKEN}'}
         
         # First get node info from API
-        response = requests.get(f'{API_URL_INTERNAL}/api/nodes/{node_id}/status', headers=headers, timeout=10)
+        response = _http.get(f'{API_URL_INTERNAL}/api/nodes/{node_id}/status', headers=headers, timeout=10)
         
         if response.status_code != 200:
             # Fallback to standard endpoint
-            response = requests.get(f'{API_URL_INTERNAL}/nodes/{node_id}', headers=headers, timeout=10)
+            response = _http.get(f'{API_URL_INTERNAL}/nodes/{node_id}', headers=headers, timeout=10)
         
         if response.status_code == 200:
             node_data = response.json()
             vpn_ip = node_data.get('vpn_ip')
             
             # Test from API container (which has access to WireGuard network)
-            test_response = requests.post(
+            test_response = _http.post(
                 f'{API_URL_INTERNAL}/api/nodes/test-single',
                 json={'vpn_ip': vpn_ip, 'node_id': node_id},
                 headers=headers,
@@ -1259,14 +1652,20 @@ def test_single_node(node_id):
             return jsonify({'error': f'Node not found'}), 404
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/cleanup-disconnected', methods=['DELETE'])
 def cleanup_disconnected():
-    """Remove all disconnected nodes"""
+    """Remove disconnected/pending nodes not updated for DISCONNECTED_NODE_HOURS"""
     try:
         headers = {'Authorization': f'Bearer {API_TOKEN}'}
-        response = requests.delete(f'{API_URL_INTERNAL}/api/nodes/cleanup-disconnected', headers=headers, timeout=10)
+        stale_since = datetime.now(timezone.utc) - timedelta(hours=DISCONNECTED_NODE_HOURS)
+        response = _http.delete(
+            f'{API_URL_INTERNAL}/nodes',
+            params={'status': ['disconnected', 'pending'], 'stale_since': stale_since.isoformat()},
+            headers=headers,
+            timeout=10
+        )
         
         if response.status_code == 200:
             return jsonify(response.json())
@@ -1274,7 +1673,7 @@ def cleanup_disconnected():
             return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/cleanup-test-nodes', methods=['DELETE'])
 def cleanup_test_nodes():
@@ -1282,32 +1681,24 @@ def cleanup_test_nodes():
     try:
         headers = {'Authorization': f'Bearer {API_TOKEN}'}
         
-        # First get all nodes
-        response = requests.get(f'{API_URL_INTERNAL}/api/nodes/list', headers=headers, timeout=5)
-        if response.status_code != 200:
-            return jsonify({'error': 'Failed to get nodes'}), 500
-        
-        nodes = response.json().get('nodes', [])
-        test_node_ids = [n['node_id'] for n in nodes if n['node_id'].startswith('auto-node-')]
-        
-        if not test_node_ids:
-            return jsonify({'deleted': 0, 'message': 'No test nodes found'})
-        
-        # Delete test nodes
-        response = requests.delete(
-            f'{API_URL_INTERNAL}/api/nodes/cleanup',
-            json={'node_ids': test_node_ids},
+        # 노드 목록을 받아 하나씩 지우지 않고 API에서 조건으로 한 번에 삭제
+        response = _http.delete(
+            f'{API_URL_INTERNAL}/nodes',
+            params={'name': 'auto-node-*'},
             headers=headers,
             timeout=10
         )
         
         if response.status_code == 200:
-            return jsonify(response.json())
+            data = response.json()
+            if not data.get('deleted'):
+                data['message'] = 'No test nodes found'
+            return jsonify(data)
         else:
             return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/node/<node_id>', methods=['DELETE'])
 def delete_node(node_id):
@@ -1315,27 +1706,21 @@ def delete_node(node_id):
     try:
         headers = {'Authorization': f'Bearer {API_TOKEN}'}
         
-        # Try custom endpoint first
-        response = requests.delete(
-            f'{API_URL_INTERNAL}/api/nodes/cleanup',
-            json={'node_ids': [node_id]},
+        response = _http.delete(
+            f'{API_URL_INTERNAL}/nodes',
+            params={'node_id': node_id},
             headers=headers,
             timeout=10
         )
         
-        if response.status_code == 200:
-            return jsonify(response.json())
-        
-        # Fallback to standard endpoint
-        response = requests.delete(f'{API_URL_INTERNAL}/nodes/{node_id}', headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            return jsonify({'message': 'Node deleted successfully'})
-        else:
+        if response.status_code != 200:
             return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
+        if not response.json().get('deleted'):
+            return jsonify({'error': 'Node not found'}), 404
+        return jsonify({'message': 'Node deleted successfully'})
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/node/<node_id>')
 def get_node(node_id):
@@ -1344,13 +1729,13 @@ def get_node(node_id):
         headers = {'Authorization': f'Bearer {API_TOKEN}'}
         
         # Try custom endpoint first
-        response = requests.get(f'{API_URL_INTERNAL}/api/nodes/{node_id}/status', headers=headers, timeout=5)
+        response = _http.get(f'{API_URL_INTERNAL}/api/nodes/{node_id}/status', headers=headers, timeout=5)
         
         if response.status_code == 200:
             return jsonify(response.json())
         
         # Fallback to standard endpoint
-        response = requests.get(f'{API_URL_INTERNAL}/nodes/{node_id}', headers=headers, timeout=5)
+        response = _http.get(f'{API_URL_INTERNAL}/nodes/{node_id}', headers=headers, timeout=5)
         
         if response.status_code == 200:
             return jsonify(response.json())
@@ -1358,7 +1743,7 @@ def get_node(node_id):
             return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/generate-deployment')
 def generate_deployment():
@@ -1378,44 +1763,70 @@ def generate_deployment():
             'token': token
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
+
+def _refresh_node_configs(force):
+    """API의 노드 설정 일괄 갱신 작업을 추가하고 끝날 때까지 (최대 CONFIG_REFRESH_TIMEOUT 초) 기다림
+
+    (응답 본문, 상태 코드) 반환 - 시간 안에 끝나지 않으면 202와 지금까지의 진행 상황
+    """
+    headers = {'Authorization': f'Bearer {API_TOKEN}'}
+    response = _http.post(f'{API_URL_INTERNAL}/nodes/refresh-configs',
+                          params={'force': str(force).lower()}, headers=headers, timeout=10)
+    if response.status_code != 200:
+        return {'error': f'API returned {response.status_code}'}, response.status_code
+
+    job = response.json()
+    deadline = time.monotonic() + CONFIG_REFRESH_TIMEOUT
+    while job['status'] not in ('succeeded', 'failed') and time.monotonic() < deadline:
+        # 작업이 끝나면 바로 응답하는 롱폴링
+        wait = max(1, min(25, int(deadline - time.monotonic())))
+        response = _http.get(f"{API_URL_INTERNAL}/jobs/{job['id']}", params={'wait': wait},
+                             headers=headers, timeout=wait + 10)
+        if response.status_code != 200:
+            return {'error': f'API returned {response.status_code}'}, response.status_code
+        job = response.json()
+
+    progress = job.get('result') or {}
+    if job['status'] == 'failed':
+        return {'error': job.get('last_error') or 'Config refresh failed', 'job_id': job['id']}, 500
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'total': progress.get('total'),
+        'updated': progress.get('updated', 0),
+        'failed': progress.get('failed', 0),
+        'central_server_url': progress.get('central_server_url'),
+    }, 200 if job['status'] == 'succeeded' else 202
 
 @app.route('/api/sync-all', methods=['POST'])
 def sync_all():
-    """Sync all nodes to WireGuard server"""
+    """Rewrite central server address of nodes that still point to an old one"""
     try:
-        headers = {'Authorization': f'Bearer {API_TOKEN}'}
-        response = requests.post(f'{API_URL_INTERNAL}/api/nodes/sync-all', headers=headers, timeout=30)
-        
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
+        data, status = _refresh_node_configs(force=False)
+        if 'updated' in data:
+            data['synced'] = data['updated']
+        return jsonify(data), status
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/refresh-configs', methods=['POST'])
 def refresh_configs():
     """Refresh all node configs with correct server IP"""
     try:
-        headers = {'Authorization': f'Bearer {API_TOKEN}'}
-        response = requests.post(f'{API_URL_INTERNAL}/api/nodes/refresh-configs', headers=headers, timeout=30)
-        
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
+        data, status = _refresh_node_configs(force=True)
+        return jsonify(data), status
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/node/<node_id>/sync', methods=['POST'])
 def sync_node(node_id):
     """Sync specific node to WireGuard server"""
     try:
         headers = {'Authorization': f'Bearer {API_TOKEN}'}
-        response = requests.post(f'{API_URL_INTERNAL}/api/nodes/{node_id}/sync', headers=headers, timeout=10)
+        response = _http.post(f'{API_URL_INTERNAL}/api/nodes/{node_id}/sync', headers=headers, timeout=10)
         
         if response.status_code == 200:
             return jsonify(response.json())
@@ -1423,7 +1834,32 @@ def sync_node(node_id):
             return jsonify({'error': f'API returned {response.status_code}'}), response.status_code
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
+
+# 파일 응답을 그대로 전달할 때 복사하는 헤더
+_DOWNLOAD_HEADERS = ('content-type', 'content-disposition', 'content-encoding', 'content-length',
+                     'vary', 'etag', 'last-modified', 'cache-control', 'pragma', 'expires')
+
+def _download_headers(headers):
+    """백엔드 요청 헤더에 클라이언트의 Accept-Encoding / If-None-Match를 그대로 전달
+    (gzip 응답을 압축된 채로, ETag 재검증은 304 그대로 중계)"""
+    headers['Accept-Encoding'] = request.headers.get('Accept-Encoding', 'identity')
+    if 'If-None-Match' in request.headers:
+        headers['If-None-Match'] = request.headers['If-None-Match']
+    return headers
+
+def _stream_download(response):
+    """백엔드 파일 응답(stream=True)을 버퍼링 없이 그대로 전달"""
+    def generate():
+        try:
+            # decode_content=False: gzip 등 인코딩을 풀지 않고 원본 바이트 전달
+            for chunk in response.raw.stream(64 * 1024, decode_content=False):
+                yield chunk
+        finally:
+            response.close()
+
+    headers = {key: value for key, value in response.headers.items() if key.lower() in _DOWNLOAD_HEADERS}
+    return Response(generate(), status=response.status_code, headers=headers)
 
 @app.route('/worker/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def worker_proxy(path):
@@ -1443,34 +1879,28 @@ def worker_proxy(path):
 
         # 요청 전달 (stream=True로 파일 다운로드 지원)
         if request.method == 'GET':
-            response = requests.get(url, headers=headers, params=request.args, timeout=10, stream=True)
+            response = _http.get(url, headers=_download_headers(headers), params=request.args, timeout=10, stream=True)
         elif request.method == 'POST':
             if request.is_json:
-                response = requests.post(url, headers=headers, json=request.get_json(), timeout=10)
+                response = _http.post(url, headers=headers, json=request.get_json(), timeout=10)
             else:
-                response = requests.post(url, headers=headers, data=request.data, timeout=10)
+                response = _http.post(url, headers=headers, data=request.data, timeout=10)
         elif request.method == 'PUT':
-            response = requests.put(url, headers=headers, json=request.get_json(), timeout=10)
+            response = _http.put(url, headers=headers, json=request.get_json(), timeout=10)
         elif request.method == 'DELETE':
-            response = requests.delete(url, headers=headers, timeout=10)
+            response = _http.delete(url, headers=headers, timeout=10)
 
-        # HTML 응답 처리
-        if 'text/html' in response.headers.get('Content-Type', ''):
+        # HTML 응답 처리 (GET은 ETag/304, gzip 인코딩을 그대로 전달)
+        is_html = 'text/html' in response.headers.get('Content-Type', '')
+        if request.method == 'GET' and (is_html or response.status_code == 304):
+            return _stream_download(response)
+        if is_html:
             return response.text, response.status_code
 
-        # 파일 다운로드 응답 처리 (application/octet-stream, application/x-exe 등)
+        # 파일 다운로드 응답 처리 (application/octet-stream, application/x-exe 등) - 스트리밍 전달
         content_type = response.headers.get('Content-Type', '')
         if 'application/' in content_type and 'json' not in content_type:
-            from flask import Response
-            flask_response = Response(
-                response.content,
-                status=response.status_code,
-                content_type=content_type
-            )
-            # Content-Disposition 헤더 복사 (파일명 포함)
-            if 'Content-Disposition' in response.headers:
-                flask_response.headers['Content-Disposition'] = response.headers['Content-Disposition']
-            return flask_response
+            return _stream_download(response)
 
         # JSON 응답 처리
         try:
@@ -1478,7 +1908,7 @@ def worker_proxy(path):
         except:
             return response.text, response.status_code
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/central/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def central_proxy(path):
@@ -1498,34 +1928,28 @@ def central_proxy(path):
 
         # 요청 전달 (stream=True로 파일 다운로드 지원)
         if request.method == 'GET':
-            response = requests.get(url, headers=headers, params=request.args, timeout=10, stream=True)
+            response = _http.get(url, headers=_download_headers(headers), params=request.args, timeout=10, stream=True)
         elif request.method == 'POST':
             if request.is_json:
-                response = requests.post(url, headers=headers, json=request.get_json(), timeout=10)
+                response = _http.post(url, headers=headers, json=request.get_json(), timeout=10)
             else:
-                response = requests.post(url, headers=headers, data=request.data, timeout=10)
+                response = _http.post(url, headers=headers, data=request.data, timeout=10)
         elif request.method == 'PUT':
-            response = requests.put(url, headers=headers, json=request.get_json(), timeout=10)
+            response = _http.put(url, headers=headers, json=request.get_json(), timeout=10)
         elif request.method == 'DELETE':
-            response = requests.delete(url, headers=headers, timeout=10)
+            response = _http.delete(url, headers=headers, timeout=10)
 
-        # HTML 응답 처리
-        if 'text/html' in response.headers.get('Content-Type', ''):
+        # HTML 응답 처리 (GET은 ETag/304, gzip 인코딩을 그대로 전달)
+        is_html = 'text/html' in response.headers.get('Content-Type', '')
+        if request.method == 'GET' and (is_html or response.status_code == 304):
+            return _stream_download(response)
+        if is_html:
             return response.text, response.status_code
 
-        # 파일 다운로드 응답 처리 (application/octet-stream, application/x-bat 등)
+        # 파일 다운로드 응답 처리 (application/octet-stream, application/x-bat 등) - 스트리밍 전달
         content_type = response.headers.get('Content-Type', '')
         if 'application/' in content_type and 'json' not in content_type:
-            from flask import Response
-            flask_response = Response(
-                response.content,
-                status=response.status_code,
-                content_type=content_type
-            )
-            # Content-Disposition 헤더 복사 (파일명 포함)
-            if 'Content-Disposition' in response.headers:
-                flask_response.headers['Content-Disposition'] = response.headers['Content-Disposition']
-            return flask_response
+            return _stream_download(response)
 
         # JSON 응답 처리
         try:
@@ -1533,7 +1957,7 @@ def central_proxy(path):
         except:
             return response.text, response.status_code
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def api_proxy(path):
@@ -1549,14 +1973,18 @@ def api_proxy(path):
         url = f"{API_URL_INTERNAL}/api/{path}"
 
         # 요청 전달 (timeout 추가)
-        if request.method == 'GET':
-            response = requests.get(url, headers=headers, params=request.args, timeout=60)
+        if request.method == 'GET' and path.startswith('download/'):
+            # 설치 파일 다운로드는 받는 대로 클라이언트에 전달
+            response = _http.get(url, headers=_download_headers(headers), params=request.args, timeout=60, stream=True)
+            return _stream_download(response)
+        elif request.method == 'GET':
+            response = _http.get(url, headers=headers, params=request.args, timeout=60)
         elif request.method == 'POST':
-            response = requests.post(url, headers=headers, json=request.get_json(), timeout=30)
+            response = _http.post(url, headers=headers, json=request.get_json(), timeout=30)
         elif request.method == 'PUT':
-            response = requests.put(url, headers=headers, json=request.get_json(), timeout=30)
+            response = _http.put(url, headers=headers, json=request.get_json(), timeout=30)
         elif request.method == 'DELETE':
-            response = requests.delete(url, headers=headers, timeout=30)
+            response = _http.delete(url, headers=headers, timeout=30)
 
         # 파일 다운로드 응답인 경우 바이너리 데이터 그대로 전달
         content_type = response.headers.get('Content-Type', '')
@@ -1584,7 +2012,7 @@ def api_proxy(path):
         print(f"[ERROR] api_proxy failed for path: {path}")
         print(f"[ERROR] Exception: {str(e)}")
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
-        return jsonify({'error': str(e)}), 500
+        return _error_response(e)
 
 @app.errorhandler(404)
 def not_found(e):